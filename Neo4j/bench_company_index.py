@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""bench_company_index.py — lookups/sec of CompanyIndex vs the old linear scan
+
+Builds a synthetic company registry (slugged names shaped like the MAS / SGX
+organisations), then times `_fuzzy_find_company`-style lookups with a mix of
+exact hits, near-misses (typos) and unseen names.
+
+    python bench_company_index.py                        # 10k / 100k / 1M
+    python bench_company_index.py --sizes 10000 --linear # also time the linear scan
+"""
+
+import argparse, random, time
+
+from rapidfuzz import distance
+from rapidfuzz.fuzz import token_set_ratio
+
+from entity_index import CompanyIndex
+
+FUZZ_THRESHOLD = 93
+LEV_DIST       = 2
+
+WORDS = ("asia", "pacific", "capital", "holdings", "global", "investment", "asset", "management",
+         "securities", "trust", "partners", "wealth", "venture", "tech", "marine", "energy",
+         "properties", "resources", "insurance", "bank", "fund", "group", "international", "singapore")
+SUFFIX = ("pte_ltd", "ltd", "limited", "inc", "llp", "corporation", "bhd")
+
+
+def make_name(rng: random.Random) -> str:
+    head = "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(3, 8)))
+    words = rng.sample(WORDS, rng.randint(1, 3))
+    return "_".join([head, *words, rng.choice(SUFFIX)])
+
+
+def typo(rng: random.Random, s: str) -> str:
+    i = rng.randrange(len(s))
+    return s[:i] + rng.choice("abcdefghijklmnopqrstuvwxyz") + s[i + 1:]
+
+
+def linear(keys, s):
+    for k in keys:
+        if token_set_ratio(k, s) >= FUZZ_THRESHOLD or distance.Levenshtein.distance(k, s) <= LEV_DIST:
+            return k
+    return None
+
+
+def run(size: int, n_queries: int, check_linear: bool, seed: int):
+    rng = random.Random(seed)
+    keys = list(dict.fromkeys(make_name(rng) for _ in range(size)))
+
+    t0 = time.perf_counter()
+    idx = CompanyIndex(FUZZ_THRESHOLD, token_set_ratio, distance.Levenshtein.distance, LEV_DIST)
+    idx.update(keys)
+    build = time.perf_counter() - t0
+
+    queries = []
+    for _ in range(n_queries):
+        r = rng.random()
+        k = rng.choice(keys)
+        queries.append(k if r < 0.4 else typo(rng, k) if r < 0.7 else make_name(rng))
+
+    t0 = time.perf_counter()
+    found = [idx.find(q) for q in queries]
+    elapsed = time.perf_counter() - t0
+    print(f"{len(keys):>9,} companies | build {build:7.1f}s | {n_queries / elapsed:9,.0f} lookups/s "
+          f"| {idx.scored / idx.lookups:6.1f} scored/lookup")
+
+    if check_linear:
+        sample = queries[: min(200, n_queries)]
+        t0 = time.perf_counter()
+        expect = [linear(keys, q) for q in sample]
+        lin = time.perf_counter() - t0
+        assert expect == found[: len(sample)], "index disagrees with linear scan"
+        print(f"{'':>9}   linear scan        | {len(sample) / lin:9,.0f} lookups/s (results identical)")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark CompanyIndex lookups")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    ap.add_argument("--queries", type=int, default=2_000)
+    ap.add_argument("--linear", action="store_true", help="Also time (and cross-check) the linear scan")
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+    for n in args.sizes:
+        run(n, args.queries, args.linear, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""bench_registry_memory.py — loader memory per entity: dict-based layout vs compact
+
+Fills both layouts with the same synthetic entities (Wikidata-style QID persons
+and generated-id persons with a few mention aliases each, plus companies) and
+reports the bytes allocated while building each one (`tracemalloc`).  Every
+string is built freshly per record, as the parsers produce them, so the
+numbers include what the alias pool saves.
+
+The compact run builds everything `preload_registries` keeps per entity, and
+breaks it down by structure:
+
+* registry      — `PersonEntry` records, `CompanyRegistry`, QID map, alias pool;
+* person index  — the `FuzzyKeyIndex` segment postings over person keys;
+* company index — `CompanyIndex` postings plus its per-length BK-trees;
+* alias index   — `person_alias_index` / `company_alias_index`;
+* write cache   — the `EntityWriteCache` state seeded for every node.
+
+    python bench_registry_memory.py                    # 100k / 1M persons
+    python bench_registry_memory.py --sizes 200000
+"""
+
+import argparse, gc, random, re, time, tracemalloc
+
+from rapidfuzz import distance
+from rapidfuzz.fuzz import token_set_ratio
+
+from compact_registry import CompanyRegistry, PersonEntry, StringPool
+from entity_index import CompanyIndex, FuzzyKeyIndex
+from graph_writer import EntityWriteCache
+from load_graph_v_5 import FUZZ_THRESHOLD, LEV_DIST, MIN_ALIAS_TOKENS, company_row, person_row
+
+SURNAMES = ("tan", "lim", "lee", "ng", "ong", "wong", "goh", "chua", "chan", "koh", "teo", "ang", "yeo", "tay",
+            "ho", "low", "toh", "sim", "chong", "chia", "smith", "kumar", "singh", "nair", "rahman")
+TITLES = ("Mr", "Mrs", "Ms", "Dr", "Madam")
+WORDS = ("asia", "pacific", "capital", "holdings", "global", "investment", "securities", "trust", "partners",
+         "wealth", "venture", "marine", "energy", "properties", "resources", "bank", "fund", "group")
+SLUG_RE = re.compile(r"[^a-z0-9]+")
+
+
+def slug(txt: str) -> str:
+    return SLUG_RE.sub("_", txt.lower()).strip("_")
+
+
+def people(n: int, seed: int):
+    """(id, name, aliases, qid) tuples; ~60% carry a QID that is also their id."""
+    rng = random.Random(seed)
+    for i in range(n):
+        sur = rng.choice(SURNAMES).title()
+        given = "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(3, 9))).title()
+        name = f"{sur} {given} {i:x}"
+        aliases = [f"{rng.choice(TITLES)} {sur}", f"{given} {sur}", sur][: rng.randint(0, 3)]
+        if rng.random() < 0.6:
+            qid = f"Q{rng.randint(1, 120_000_000)}"
+            yield qid, name, aliases, qid
+        else:
+            yield f"person:{rng.getrandbits(48):012x}", name, aliases, None
+
+
+def companies(n: int, seed: int):
+    rng = random.Random(seed + 1)
+    for i in range(n):
+        name = " ".join(w.title() for w in rng.sample(WORDS, rng.randint(1, 3))) + f" {i:x} Pte Ltd"
+        yield f"company:{rng.getrandbits(48):012x}", name
+
+
+def build_dicts(persons, comps, stage=lambda name: None):
+    person_registry, qid_registry, company_registry, company_names = {}, {}, {}, {}
+    for pid, name, aliases, qid in persons:
+        s = slug(name)
+        person_registry[s] = {"id": pid, "canonical": name, "aliases": set(aliases), "qid": qid}
+        if qid:
+            qid_registry[qid] = s
+    for cid, name in comps:
+        s = slug(name)
+        company_registry[s] = cid
+        company_names.setdefault(cid, name)
+    stage("registry")                   # the dict-based loader had no indexes: it scanned the registry
+    return person_registry, qid_registry, company_registry, company_names
+
+
+def build_compact(persons, comps, stage=lambda name: None):
+    """Everything the loader holds per entity; *stage(name)* is called after each structure."""
+    pool = StringPool()
+    person_registry, qid_registry = {}, {}
+    company_registry = CompanyRegistry()
+    for pid, name, aliases, qid in persons:
+        s = slug(name)
+        person_registry[s] = PersonEntry(pid, name, tuple(pool(a) for a in aliases), qid)
+        if qid:
+            qid_registry[qid] = s
+    for cid, name in comps:
+        company_registry.register(slug(name), cid, name)
+    stage("registry")
+
+    person_index = FuzzyKeyIndex(FUZZ_THRESHOLD, token_set_ratio)
+    person_index.update(person_registry)
+    stage("person index")
+
+    company_index = CompanyIndex(FUZZ_THRESHOLD, token_set_ratio, distance.Levenshtein.distance, LEV_DIST)
+    company_index.update(s for s, _ in company_registry.items())
+    stage("company index")
+
+    # Same rule as load_graph_v_5._add_person_aliases; for companies, one memoised
+    # fuzzy match per registered name (its slug without the trailing "_ltd").
+    person_alias_index, company_alias_index = {}, {}
+    for key, entry in person_registry.items():
+        for a in entry.aliases:
+            sa = slug(a)
+            if sa.count("_") + 1 >= MIN_ALIAS_TOKENS and sa not in person_registry:
+                if person_alias_index.setdefault(sa, key) != key:
+                    person_alias_index[sa] = ""
+    for s, _ in company_registry.items():
+        company_alias_index[s[:-4]] = s
+    stage("alias index")
+
+    cache = EntityWriteCache({"person": ("name", "alias", "qid"), "company": ("name",)})
+    for entry in person_registry.values():
+        cache.seed("person", entry.id, person_row(entry, "", ""))
+    for cid, _, name in company_registry.rows():
+        cache.seed("company", cid, company_row(cid, name, "", ""))
+    stage("write cache")
+    return (pool, person_registry, qid_registry, company_registry, person_index, company_index,
+            person_alias_index, company_alias_index, cache)
+
+
+def measure(label: str, build, n_persons: int, n_companies: int, seed: int) -> int:
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    stages, last = [], [0]
+
+    def stage(name):
+        gc.collect()
+        size = tracemalloc.get_traced_memory()[0]
+        stages.append((name, size - last[0]))
+        last[0] = size
+
+    kept = build(people(n_persons, seed), companies(n_companies, seed), stage)
+    elapsed = time.perf_counter() - t0
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    print(f"{n_persons:>9,} persons | {label:<8} | {size / 2**20:9.1f} MiB | {size / n_persons:6.0f} B/person "
+          f"| build {elapsed:5.1f}s")
+    for name, part in stages if len(stages) > 1 else ():
+        print(f"{'':>9}   {name:<15} {part / 2**20:9.1f} MiB | {part / n_persons:6.0f} B/person")
+    return size
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Compare registry memory: dict-based vs compact")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000], help="Person counts")
+    ap.add_argument("--companies-ratio", type=float, default=0.25, help="Companies per person")
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+    for n in args.sizes:
+        n_comp = int(n * args.companies_ratio)
+        old = measure("dicts", build_dicts, n, n_comp, args.seed)
+        new = measure("compact", build_compact, n, n_comp, args.seed)
+        print(f"{'':>9}   compact (with indexes and write cache) uses {100 * new / old:.0f}% of the dict-based "
+              f"registry alone")
+
+
+if __name__ == "__main__":
+    main()
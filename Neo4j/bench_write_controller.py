@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""bench_write_controller.py — WriteController against a throttling fake session
+
+`ThrottledSession` stands in for an Aura Free session: commit latency is a
+fixed round trip plus a per-row cost, a batch slower than `--kill-after`
+seconds is terminated with a transient error (as Aura does with long
+transactions), and `--error-rate` of commits fail at random.  No time is
+actually slept; the fake advances a virtual clock shared with the controller.
+
+    python bench_write_controller.py                       # adaptive vs fixed 500 / 3000
+    python bench_write_controller.py --rows 200000 --error-rate 0.05
+"""
+
+import argparse, logging, random
+
+from write_controller import WriteController
+
+
+class TransientError(Exception):
+    def is_retryable(self) -> bool:
+        return True
+
+
+class VirtualClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+
+class ThrottledSession:
+    """`execute_write(fn, *args)` with injected latency and transient failures."""
+
+    def __init__(self, clock: VirtualClock, rtt: float, per_row: float, kill_after: float, error_rate: float, seed: int):
+        self.clock = clock
+        self.rtt = rtt
+        self.per_row = per_row
+        self.kill_after = kill_after
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.committed = []
+
+    def execute_write(self, fn, batch):
+        latency = self.rtt + self.per_row * len(batch) * self.rng.uniform(0.8, 1.5)
+        if latency > self.kill_after:
+            self.clock.sleep(self.kill_after)
+            raise TransientError(f"transaction terminated after {self.kill_after:.0f}s")
+        self.clock.sleep(latency)
+        if self.rng.random() < self.error_rate:
+            raise TransientError("throttled")
+        fn(self, batch)
+        self.committed.extend(batch)
+
+
+def run(label: str, controller: WriteController, session: ThrottledSession, clock: VirtualClock, rows: int):
+    items = list(range(rows))
+    controller.run(items, lambda batch: session.execute_write(lambda tx, b: None, batch))
+    assert session.committed == items, "rows lost, duplicated or reordered"
+    print(f"{label:<18} | {rows / clock.now:8,.0f} rows/s | {controller.batches:6} commits | final size {controller.size:5} "
+          f"| {controller.errors:4} errors, {controller.splits} splits")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Exercise WriteController against a fake throttled session")
+    ap.add_argument("--rows", type=int, default=100_000)
+    ap.add_argument("--rtt", type=float, default=0.25, help="Seconds per commit regardless of size")
+    ap.add_argument("--per-row", type=float, default=0.002, help="Seconds per row")
+    ap.add_argument("--kill-after", type=float, default=8.0, help="Transactions slower than this fail")
+    ap.add_argument("--error-rate", type=float, default=0.02, help="Probability of a random transient failure")
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.ERROR)        # silence the per-retry warnings
+
+    for label, adaptive in (("adaptive", True), ("fixed 500", False), ("fixed 3000", False)):
+        clock = VirtualClock()
+        session = ThrottledSession(clock, args.rtt, args.per_row, args.kill_after, args.error_rate, args.seed)
+        size = int(label.split()[-1]) if not adaptive else 500
+        kw = dict(target_latency=2.0, clock=clock, sleep=clock.sleep, min_size=1)
+        if not adaptive:            # pin the size; failures still split and retry
+            kw.update(min_size=size, max_size=size, backoff=1.0)
+        run(label, WriteController(initial=size, **kw), session, clock, args.rows)
+
+
+if __name__ == "__main__":
+    main()
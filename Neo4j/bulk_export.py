@@ -0,0 +1,142 @@
+"""bulk_export.py — neo4j-admin import / LOAD CSV files from an in-memory load
+
+`load_graph_v_5.py --export-bulk DIR` runs every ingester into a
+`MemoryGraphSink` (graph_sink.py), which already applies the loader's MERGE
+rules, so its nodes and relationships are deduplicated exactly as Neo4j would
+have stored them.  `write_bulk` turns that graph into:
+
+* ``persons.csv`` / ``companies.csv`` — node files (``id:ID(Label)`` headers);
+* ``has_role_at.csv`` / ``family.csv`` — relationship files
+  (``:START_ID`` / ``:END_ID`` / ``:TYPE``);
+* ``import.sh``      — the matching `neo4j-admin database import full` call;
+* ``load_csv.cypher`` — the same load as LOAD CSV, for Aura (no neo4j-admin):
+  constraints first, then batched `CREATE`s.  Both targets expect an empty
+  database.
+
+Array properties (`aliases`) use `ARRAY_DELIMITER`; empty cells mean "no
+property", as in the MERGE statements' null `SET`s.
+"""
+
+from __future__ import annotations
+
+import csv
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+from graph_sink import MemoryGraphSink
+from write_profile import REQUIRED_CONSTRAINTS
+
+ARRAY_DELIMITER = "|"
+
+# (file, header, property keys in the same order); `None` marks the :LABEL / :TYPE column.
+PERSON_COLUMNS = ("persons.csv",
+                  ["id:ID(Person)", "name", "aliases:string[]", "wikidata_qid", "updated", "reference_type", "reference_file", ":LABEL"],
+                  ["id", "name", "aliases", "wikidata_qid", "updated", "reference_type", "reference_file", None])
+COMPANY_COLUMNS = ("companies.csv",
+                   ["id:ID(Company)", "name", "lastUpdated:datetime", "reference_type", "reference_file", ":LABEL"],
+                   ["id", "name", "lastUpdated", "reference_type", "reference_file", None])
+ROLE_COLUMNS = ("has_role_at.csv",
+                [":START_ID(Person)", ":END_ID(Company)", "role", "startDate", "endDate", "reference_type", "reference_file", ":TYPE"],
+                ["role", "startDate", "endDate", "reference_type", "reference_file", None])
+FAMILY_COLUMNS = ("family.csv",
+                  [":START_ID(Person)", ":END_ID(Person)", "relation", "reference_type", "reference_file", ":TYPE"],
+                  ["relation", "reference_type", "reference_file", None])
+
+# Same constraint names as `--profile` creates, so reruns and SHOW CONSTRAINTS agree.
+CONSTRAINT_DDL = "\n".join(f"CREATE CONSTRAINT {name} IF NOT EXISTS FOR (n:{label}) REQUIRE n.{prop} IS UNIQUE;"
+                           for label, prop, name in REQUIRED_CONSTRAINTS)
+
+LOAD_CSV = """\
+// Companion to the neo4j-admin CSVs for databases without neo4j-admin (Aura).
+// Set the folder the CSVs are served from, then run with :auto (IN TRANSACTIONS):
+//   :param base => 'file:///'
+{constraints}
+
+LOAD CSV WITH HEADERS FROM $base + 'persons.csv' AS row
+CALL {{
+    WITH row
+    CREATE (:Person {{id: row.`id:ID(Person)`, name: row.name, aliases: split(row.`aliases:string[]`, '{delim}'),
+                     wikidata_qid: row.wikidata_qid, updated: row.updated,
+                     reference_type: row.reference_type, reference_file: row.reference_file}})
+}} IN TRANSACTIONS OF {batch} ROWS;
+
+LOAD CSV WITH HEADERS FROM $base + 'companies.csv' AS row
+CALL {{
+    WITH row
+    CREATE (:Company {{id: row.`id:ID(Company)`, name: row.name, lastUpdated: datetime(row.`lastUpdated:datetime`),
+                      reference_type: row.reference_type, reference_file: row.reference_file}})
+}} IN TRANSACTIONS OF {batch} ROWS;
+
+LOAD CSV WITH HEADERS FROM $base + 'has_role_at.csv' AS row
+CALL {{
+    WITH row
+    MATCH (p:Person {{id: row.`:START_ID(Person)`}})
+    MATCH (c:Company {{id: row.`:END_ID(Company)`}})
+    CREATE (p)-[:HAS_ROLE_AT {{role: row.role, startDate: row.startDate, endDate: row.endDate,
+                               reference_type: row.reference_type, reference_file: row.reference_file}}]->(c)
+}} IN TRANSACTIONS OF {batch} ROWS;
+
+LOAD CSV WITH HEADERS FROM $base + 'family.csv' AS row
+CALL {{
+    WITH row
+    MATCH (a:Person {{id: row.`:START_ID(Person)`}})
+    MATCH (b:Person {{id: row.`:END_ID(Person)`}})
+    CREATE (a)-[:FAMILY {{relation: row.relation, reference_type: row.reference_type, reference_file: row.reference_file}}]->(b)
+}} IN TRANSACTIONS OF {batch} ROWS;
+"""
+
+IMPORT_SH = """\
+#!/bin/sh
+# Offline bulk import into an empty database (stop it first); run from this directory.
+neo4j-admin database import full "${{1:-neo4j}}" \\
+    --array-delimiter='{delim}' \\
+    --nodes=Person=persons.csv \\
+    --nodes=Company=companies.csv \\
+    --relationships=HAS_ROLE_AT=has_role_at.csv \\
+    --relationships=FAMILY=family.csv \\
+    --overwrite-destination
+"""
+
+
+def _cell(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, (list, tuple)):
+        return ARRAY_DELIMITER.join(v.replace(ARRAY_DELIMITER, " ") for v in value)
+    return value
+
+
+def _write_csv(path: Path, header: Sequence[str], rows: Iterable[List[Any]]) -> int:
+    n = 0
+    with path.open("w", newline="", encoding="utf-8") as fh:
+        out = csv.writer(fh)
+        out.writerow(header)
+        for row in rows:
+            out.writerow([_cell(v) for v in row])
+            n += 1
+    return n
+
+
+def _node_rows(nodes: Dict[str, Dict[str, Any]], keys: Sequence[str], label: str):
+    for props in nodes.values():
+        yield [label if k is None else props.get(k) for k in keys]
+
+
+def _rel_rows(rels: Dict[Tuple[str, str, str, str], Dict[str, Any]], rel_type: str, keys: Sequence[str]):
+    for (t, src, dst, _), props in rels.items():
+        if t == rel_type:
+            yield [src, dst] + [rel_type if k is None else props.get(k) for k in keys]
+
+
+def write_bulk(graph: MemoryGraphSink, out_dir: Path, batch: int = 10_000) -> Dict[str, int]:
+    """Write the node / relationship CSVs and both import scripts; returns row counts per file."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    counts = {}
+    for (name, header, keys), label in ((PERSON_COLUMNS, "Person"), (COMPANY_COLUMNS, "Company")):
+        counts[name] = _write_csv(out_dir / name, header, _node_rows(graph.nodes[label], keys, label))
+    for (name, header, keys), rel_type in ((ROLE_COLUMNS, "HAS_ROLE_AT"), (FAMILY_COLUMNS, "FAMILY")):
+        counts[name] = _write_csv(out_dir / name, header, _rel_rows(graph.rels, rel_type, keys))
+    (out_dir / "load_csv.cypher").write_text(LOAD_CSV.format(delim=ARRAY_DELIMITER, batch=batch, constraints=CONSTRAINT_DDL), encoding="utf-8")
+    (out_dir / "import.sh").write_text(IMPORT_SH.format(delim=ARRAY_DELIMITER), encoding="utf-8")
+    return counts
@@ -0,0 +1,128 @@
+"""change_plan.py — what a load would change, computed offline
+
+`load_graph_v_5.py --plan FILE` resolves every input against the local
+registry snapshot (no Aura connection) and routes the writer's output into a
+`PlanSink`.  The writer has already dropped node upserts identical to the
+snapshot (`EntityWriteCache`) and edge rows identical to the last write
+(`EdgeFingerprints`, opened read-only), so every row reaching the sink is a
+change.  The sink classifies it:
+
+* persons   — new, aliases merged into a known person, or otherwise updated
+  (name / Wikidata QID);
+* companies — new or renamed;
+* edges     — new (key never written) or changed (same key, other properties);
+  unchanged edges are the writer's skip count.
+
+The rows go to a gzip-compressed `JsonlSink` log, which
+`load_graph_v_5.py --apply-plan FILE` later replays into Neo4j.  The plan reads
+the ingest manifest read-only, so annual reports already loaded are skipped as
+in a real run; the planned files are logged as `MANIFEST_KIND` rows (filename,
+digest, size, mtime) that `--apply-plan` records once the replay has committed.
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Set, Tuple
+
+from edge_fingerprints import EDGE_FIELDS, EdgeFingerprints
+from graph_sink import GraphSink, JsonlSink, Row
+
+MANIFEST_KIND = "manifest"      # plan-log rows naming the ingested files, not graph writes
+
+
+class PlanSink(GraphSink):
+    """Classify and log every row of a planned load.
+
+    *persons* maps the snapshot's person ids to their aliases, *companies* is
+    the set of snapshot company ids; both are taken before the run starts.
+    """
+
+    def __init__(self, path: Path, persons: Dict[str, Iterable[str]], companies: Set[str],
+                 fingerprints: EdgeFingerprints):
+        self.log = JsonlSink(path, mode="w")
+        self.persons = persons
+        self.companies = companies
+        self.fingerprints = fingerprints
+        self.counts: Dict[str, int] = defaultdict(int)
+        self._planned_persons: Dict[str, List[str]] = {}       # id → aliases of its last planned row
+        self._had_fingerprints = len(fingerprints) > 0
+        self._seen: Dict[str, Set[Tuple]] = defaultdict(set)
+        self.files = 0
+
+    def _first(self, kind: str, key: Tuple) -> bool:
+        """True the first time *key* is planned (later rows for it are the same change, refined)."""
+        seen = self._seen[kind]
+        if key in seen:
+            return False
+        seen.add(key)
+        return True
+
+    def write(self, kind: str, rows: List[Row]) -> None:
+        classify = getattr(self, f"_{kind}")
+        for row in rows:
+            classify(row)
+        self.log.write(kind, rows)
+
+    def record_files(self, entries: Iterable[Tuple[str, str, int, float]]) -> None:
+        """Log the manifest entries (`IngestManifest.recorded`) of the files this plan ingests."""
+        rows = [{"filename": f, "sha256": d, "size": n, "mtime": m} for f, d, n, m in entries]
+        self.log.write(MANIFEST_KIND, rows)
+        self.files += len(rows)
+
+    def _person(self, row: Row) -> None:
+        self._planned_persons[row["id"]] = row["alias"]
+
+    def _company(self, row: Row) -> None:
+        if self._first("company", (row["id"],)):
+            self.counts["new companies" if row["id"] not in self.companies else "renamed companies"] += 1
+
+    def _edge(self, kind: str, row: Row) -> None:
+        key = tuple(row[f] for f in EDGE_FIELDS[kind][0])
+        # Fingerprints are recorded after the write, so a first sighting that is
+        # already known was in the store before this run.
+        if self._first(kind, key):
+            self.counts[f"{'changed' if self.fingerprints.known(kind, row) else 'new'} {kind} edges"] += 1
+
+    def _role(self, row: Row) -> None:
+        self._edge("role", row)
+
+    def _family(self, row: Row) -> None:
+        self._edge("family", row)
+
+    def close(self) -> None:
+        self.log.close()
+
+    def _person_counts(self) -> Tuple[int, int, int, int]:
+        """(new, with merged aliases, merged alias count, otherwise updated), from each person's final row."""
+        new = merged = n_aliases = updated = 0
+        for pid, aliases in self._planned_persons.items():
+            known = self.persons.get(pid)
+            if known is None:
+                new += 1
+                continue
+            added = set(aliases) - set(known)
+            if added:
+                merged += 1
+                n_aliases += len(added)
+            else:
+                updated += 1
+        return new, merged, n_aliases, updated
+
+    def summary(self, clean: Dict[str, int]) -> str:
+        """*clean* is the writer's count of node upserts skipped as unchanged."""
+        c = self.counts
+        unchanged = self.fingerprints.skipped
+        new, merged, n_aliases, updated = self._person_counts()
+        lines = [f"[PLAN] Change set written to {self.log.path} ({self.log.rows} rows, {self.files} annual reports)",
+                 f"  persons:      {new} new, {merged} with {n_aliases} merged aliases, {updated} updated, "
+                 f"{clean.get('person', 0)} unchanged upserts",
+                 f"  companies:    {c['new companies']} new, {c['renamed companies']} renamed, "
+                 f"{clean.get('company', 0)} unchanged upserts"]
+        for kind in EDGE_FIELDS:
+            lines.append(f"  {kind + ' edges:':<14}{c[f'new {kind} edges']} new, {c[f'changed {kind} edges']} changed, "
+                         f"{unchanged.get(kind, 0)} unchanged rows")
+        if not self._had_fingerprints:
+            lines.append(f"  (no edge fingerprints at {self.fingerprints.path}: every edge counts as new)")
+        return "\n".join(lines)
@@ -0,0 +1,169 @@
+"""compact_registry.py — memory-lean registry records for million-entity loads
+
+The loader used to keep one plain dict per person (`{"id", "canonical",
+"aliases": set(), "qid"}`) plus `slug → id` / `id → name` dicts for companies.
+After the Wikidata crawl that is well over a million persons, and the per-entry
+dict + set overhead alone runs to several GB.  The structures below hold the
+same information:
+
+* `PersonEntry` — a `__slots__` record; aliases are a tuple (the empty tuple is
+  shared) instead of a set;
+* `StringPool` — one shared pool for alias strings, which repeat heavily
+  across people (surname-only and "Mr Tan"-style mentions).  Slugs and
+  canonical names are mostly unique, so pooling them would cost a dict slot
+  each and save nothing;
+* `IdTable` — generated ids (``person:<12 hex>`` / ``company:<12 hex>``) packed
+  into one 64-bit integer each, in an `array('Q')`; anything else goes to a
+  small overflow dict;
+* `CompanyRegistry` — `slug → row` plus array/list columns for id and name.
+
+`bench_registry_memory.py` compares them with the dict-based layout.
+"""
+
+from __future__ import annotations
+
+import re
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+_GENERATED = re.compile(r"(person|company):([0-9a-f]{12})\Z")
+_PREFIXES = ("person", "company")
+_LOW = (1 << 48) - 1
+_OVERFLOW = 1 << 63             # IdTable marker: id kept in the overflow dict
+
+
+def pack_id(node_id: str) -> Union[int, str]:
+    """Generated ids → 50-bit int (prefix tag + 48-bit hex); anything else unchanged."""
+    m = _GENERATED.match(node_id)
+    if m is None:
+        return node_id
+    return (_PREFIXES.index(m[1]) << 48) | int(m[2], 16)
+
+
+def unpack_id(packed: Union[int, str]) -> str:
+    if isinstance(packed, str):
+        return packed
+    return f"{_PREFIXES[packed >> 48]}:{packed & _LOW:012x}"
+
+
+class StringPool:
+    """Hands out one shared object per distinct string."""
+
+    def __init__(self):
+        self._strings: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._strings)
+
+    def __call__(self, s: Optional[str]) -> Optional[str]:
+        if s is None:
+            return None
+        return self._strings.setdefault(s, s)
+
+
+class PersonEntry:
+    """One registry person.  `id` is stored packed (see `pack_id`)."""
+
+    __slots__ = ("_id", "canonical", "aliases", "qid")
+
+    def __init__(self, pid: str, canonical: str, aliases: Tuple[str, ...] = (), qid: Optional[str] = None):
+        self._id = pack_id(pid)
+        self.canonical = canonical
+        self.aliases = aliases
+        self.qid = qid
+
+    @property
+    def id(self) -> str:
+        return unpack_id(self._id)
+
+    def add_aliases(self, names: Iterable[str], pool: StringPool) -> bool:
+        """Append the names not already known; True if any were added."""
+        new = [n for n in dict.fromkeys(names) if n not in self.aliases]
+        if new:
+            self.aliases = self.aliases + tuple(pool(n) for n in new)
+        return bool(new)
+
+    def __repr__(self) -> str:
+        return f"PersonEntry({self.id!r}, {self.canonical!r}, aliases={len(self.aliases)}, qid={self.qid!r})"
+
+
+class IdTable:
+    """Append-only column of node ids, packed into an `array('Q')`."""
+
+    def __init__(self):
+        self._packed = array("Q")
+        self._overflow: Dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._packed)
+
+    def append(self, node_id: str) -> int:
+        row = len(self._packed)
+        packed = pack_id(node_id)
+        if isinstance(packed, str):
+            self._overflow[row] = packed
+            packed = _OVERFLOW
+        self._packed.append(packed)
+        return row
+
+    def __getitem__(self, row: int) -> str:
+        packed = self._packed[row]
+        return self._overflow[row] if packed == _OVERFLOW else unpack_id(packed)
+
+    def set(self, row: int, node_id: str) -> None:
+        packed = pack_id(node_id)
+        self._overflow.pop(row, None)
+        if isinstance(packed, str):
+            self._overflow[row] = packed
+            packed = _OVERFLOW
+        self._packed[row] = packed
+
+
+class CompanyRegistry:
+    """`slug → company id` mapping with the display name kept alongside.
+
+    Reads like the old `company_registry` dict (`in`, `[]`, `get`, `items`,
+    `len`); rows stay in insertion order.
+    """
+
+    def __init__(self):
+        self._row: Dict[str, int] = {}
+        self._slugs: List[str] = []
+        self._ids = IdTable()
+        self._names: List[str] = []
+
+    def register(self, s: str, cid: str, name: str, refresh: bool = False) -> None:
+        """Map *s* to *cid*.  The name is kept as first seen unless *refresh* (graph
+        data overriding the snapshot)."""
+        row = self._row.get(s)
+        if row is None:
+            self._row[s] = len(self._slugs)
+            self._slugs.append(s)
+            self._ids.append(cid)
+            self._names.append(name)
+        else:
+            self._ids.set(row, cid)
+            if refresh:
+                self._names[row] = name
+
+    def __len__(self) -> int:
+        return len(self._row)
+
+    def __contains__(self, s: str) -> bool:
+        return s in self._row
+
+    def __getitem__(self, s: str) -> str:
+        return self._ids[self._row[s]]
+
+    def get(self, s: str, default: Optional[str] = None) -> Optional[str]:
+        row = self._row.get(s)
+        return default if row is None else self._ids[row]
+
+    def items(self) -> Iterator[Tuple[str, str]]:
+        for row, s in enumerate(self._slugs):
+            yield s, self._ids[row]
+
+    def rows(self) -> Iterator[Tuple[str, str, str]]:
+        """(id, slug, name) in insertion order — the snapshot's company row shape."""
+        for row, s in enumerate(self._slugs):
+            yield self._ids[row], s, self._names[row]
@@ -0,0 +1,135 @@
+"""edge_fingerprints.py — skip relationship writes that would change nothing
+
+`MERGE_ROLE` always runs its `ON MATCH SET` branch, so re-ingesting a source
+(the MAS CSV, an annual report re-export) rewrites every HAS_ROLE_AT edge with
+the same values.  `EdgeFingerprints` keeps, per edge key — `(pid, cid, role)`
+for HAS_ROLE_AT, `(src, dst, rel)` for FAMILY — a 64-bit hash of the
+properties last written, in a local SQLite file.  `BatchedGraphWriter` drops
+queued edge rows whose fingerprint matches and records the rest as they are
+written; `save()` persists them once the run's writes have all committed.
+
+Rows for the same edge queued in one flush are first collapsed into the one
+row that leaves the same end state (`collapse`: last non-null `start` / `end`,
+last reference), so an edge seen in thirty annual reports is fingerprinted —
+and written — once per flush rather than thirty times.
+
+Only rows identical to the last write are skipped; a row that differs in any
+property (even one `coalesce` would ignore, such as a null `start`) is written.
+
+`readonly=True` (used by `--plan`) loads the file if it exists and never
+writes it: `record` still updates the in-memory view, `save` does nothing.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS edges (
+    kind TEXT NOT NULL,
+    a    TEXT NOT NULL,
+    b    TEXT NOT NULL,
+    k    TEXT NOT NULL,
+    fp   INTEGER NOT NULL,
+    PRIMARY KEY (kind, a, b, k)
+) WITHOUT ROWID;
+"""
+
+# kind → (key fields, property fields)
+EDGE_FIELDS = {
+    "role":   (("pid", "cid", "role"), ("start", "end", "source_type", "source_file")),
+    "family": (("src", "dst", "rel"), ("source_type", "source_file")),
+}
+# Properties the statements only overwrite with non-null values (ON MATCH SET x = coalesce($x, x)).
+COALESCED = {"role": ("start", "end")}
+
+Key = Tuple[str, str, str]
+
+
+def fingerprint(values) -> int:
+    digest = hashlib.blake2b(json.dumps(values, separators=(",", ":")).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)          # fits SQLite INTEGER
+
+
+class EdgeFingerprints:
+    def __init__(self, path: Path, readonly: bool = False):
+        self.path = Path(path)
+        self.readonly = readonly
+        self._fp: Dict[str, Dict[Key, int]] = defaultdict(dict)
+        if readonly:
+            self.db = sqlite3.connect(f"{self.path.resolve().as_uri()}?mode=ro", uri=True) if self.path.exists() else None
+        else:
+            self.db = sqlite3.connect(self.path)
+            self.db.executescript(SCHEMA)
+        if self.db is not None:
+            for kind, a, b, k, fp in self.db.execute("SELECT kind, a, b, k, fp FROM edges"):
+                self._fp[kind][(a, b, k)] = fp
+        self._dirty: Dict[str, Dict[Key, int]] = defaultdict(dict)
+        self.skipped: Dict[str, int] = defaultdict(int)
+
+    @property
+    def kinds(self) -> Iterable[str]:
+        return EDGE_FIELDS.keys()
+
+    def __len__(self) -> int:
+        return sum(len(v) for v in self._fp.values())
+
+    def _split(self, kind: str, row) -> Tuple[Key, int]:
+        key_fields, prop_fields = EDGE_FIELDS[kind]
+        return tuple(row[f] for f in key_fields), fingerprint([row[f] for f in prop_fields])
+
+    def unchanged(self, kind: str, row) -> bool:
+        key, fp = self._split(kind, row)
+        return self._fp[kind].get(key) == fp
+
+    def known(self, kind: str, row) -> bool:
+        """Whether an edge with *row*'s key has been recorded (with any properties)."""
+        return tuple(row[f] for f in EDGE_FIELDS[kind][0]) in self._fp[kind]
+
+    def collapse(self, kind: str, rows: Iterable[dict]) -> List[dict]:
+        """One row per edge key with the same net effect as writing *rows* in order."""
+        key_fields = EDGE_FIELDS[kind][0]
+        coalesced = COALESCED.get(kind, ())
+        merged: Dict[Key, dict] = {}
+        for row in rows:
+            key = tuple(row[f] for f in key_fields)
+            prev = merged.get(key)
+            if prev is not None:
+                row = {**row, **{f: prev[f] for f in coalesced if row[f] is None}}
+            merged[key] = row
+        return list(merged.values())
+
+    def record(self, kind: str, rows) -> None:
+        """Note *rows* as written (call after the write succeeded)."""
+        current, dirty = self._fp[kind], self._dirty[kind]
+        for row in rows:
+            key, fp = self._split(kind, row)
+            current[key] = dirty[key] = fp
+
+    def save(self) -> None:
+        if self.readonly:
+            return
+        with self.db:
+            for kind, entries in self._dirty.items():
+                self.db.executemany(
+                    "INSERT INTO edges(kind, a, b, k, fp) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT(kind, a, b, k) DO UPDATE SET fp = excluded.fp",
+                    ((kind, a, b, k, fp) for (a, b, k), fp in entries.items()),
+                )
+        self._dirty.clear()
+
+    def reset(self) -> None:
+        """Forget every fingerprint (used by `--full-resync`)."""
+        with self.db:
+            self.db.execute("DELETE FROM edges")
+        self._fp.clear()
+        self._dirty.clear()
+
+    def close(self) -> None:
+        if self.db is not None:
+            self.db.close()
@@ -0,0 +1,287 @@
+"""entity_index.py — candidate-blocking indexes for the loader's fuzzy matchers
+
+`load_graph_v_5.py` used to resolve every mention by scanning the whole registry
+with `token_set_ratio`, which makes a full load O(N²).  The indexes below only
+score the handful of registry keys that *can* reach the threshold.
+
+Registry keys are slugs (`[a-z0-9_]+`), so they never contain whitespace and
+`token_set_ratio(a, b)` collapses to the plain Indel ratio
+`100 * (1 - d / (len(a) + len(b)))`.  That gives two lossless filters:
+
+* **length**  – `d >= |len(a) - len(b)|`, so only a narrow band of lengths qualifies;
+* **segments** – each key is cut into `2·d_max + 1` contiguous n-gram blocks;
+  `d` insertions/deletions can touch at most `d` of them, so the other
+  `blocks - d` appear verbatim in the query, shifted by at most `d` characters
+  (pigeonhole).
+
+Candidates are verified with the real scorer in registry insertion order, so
+`find` returns exactly what the old linear scan returned.
+
+Companies additionally match on raw Levenshtein distance (`LEV_DIST`), which is
+a true metric; `CompanyIndex` answers that half of the predicate with BK-trees.
+`bench_company_index.py` measures lookups/sec against the linear scan.
+
+Both indexes hold a few entries per registry key, so they are laid out for
+size (see `bench_registry_memory.py`): a posting is keyed by an int hash
+(`_posting_key`) and holds a bare sequence number until a second key shares
+it, then an `array('I')`; BK-tree nodes are sequence numbers, with all child
+links of a tree in one flat `int → int` dict.
+"""
+
+from __future__ import annotations
+
+from array import array
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+Scorer = Callable[[str, str], float]
+Metric = Callable[[str, str], int]
+
+
+def _posting_key(length: int, block: int, sub: str) -> int:
+    # A hash, not the (length, block, substring) tuple: a collision only adds a
+    # candidate, and every candidate is verified with the real scorer.
+    return hash((length, block, sub))
+
+
+def segments(length: int, parts: int) -> List[Tuple[int, int]]:
+    """Split `range(length)` into *parts* contiguous (start, size) blocks, longer ones last."""
+    base, extra = divmod(length, parts)
+    out, pos = [], 0
+    for i in range(parts):
+        size = base + (1 if i >= parts - extra else 0)
+        out.append((pos, size))
+        pos += size
+    return out
+
+
+class FuzzyKeyIndex:
+    """Pigeonhole segment index answering `scorer(key, query) >= threshold` lookups.
+
+    Keys are remembered in insertion order; `add` is idempotent so callers can
+    re-register a slug whose registry entry was replaced.
+    """
+
+    def __init__(self, threshold: float, scorer: Scorer):
+        self.threshold = threshold
+        self.scorer = scorer
+        self._slack = (100.0 - threshold) / 100.0
+        self._keys: List[str] = []                      # seq → key
+        self._seq: Dict[str, int] = {}                  # key → seq
+        self._by_len: Dict[int, array] = defaultdict(lambda: array("I"))
+        self._layout: Dict[int, Optional[List[Tuple[int, int]]]] = {}   # len → segments (None = unsegmentable)
+        self._postings: Dict[int, Union[int, array]] = {}               # _posting_key → seq | array of seqs
+        self.lookups = 0
+        self.scored = 0
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._seq
+
+    def add(self, key: str) -> None:
+        if key in self._seq:
+            return
+        seq = len(self._keys)
+        self._keys.append(key)
+        self._seq[key] = seq
+        length = len(key)
+        self._by_len[length].append(seq)
+        layout = self._segment_layout(length)
+        if layout:
+            postings = self._postings
+            for i, (pos, size) in enumerate(layout):
+                pk = _posting_key(length, i, key[pos:pos + size])
+                hit = postings.get(pk)
+                if hit is None:
+                    postings[pk] = seq
+                elif isinstance(hit, int):
+                    postings[pk] = array("I", (hit, seq))
+                else:
+                    hit.append(seq)
+
+    def update(self, keys: Iterable[str]) -> None:
+        for k in keys:
+            self.add(k)
+
+    def clear(self) -> None:
+        self._keys.clear()
+        self._seq.clear()
+        self._by_len.clear()
+        self._postings.clear()
+
+    # ------------------------------------------------------------------
+    def _max_dist(self, la: int, lb: int) -> int:
+        # Small epsilon keeps the bound conservative against float rounding.
+        return int(self._slack * (la + lb) + 1e-9)
+
+    def _segment_layout(self, length: int) -> Optional[List[Tuple[int, int]]]:
+        """Segments for keys of *length*, sized for the longest query that can still match."""
+        if length not in self._layout:
+            lq = length
+            while (lq + 1 - length) <= self._max_dist(lq + 1, length):
+                lq += 1
+            parts = 2 * self._max_dist(length, lq) + 1
+            self._layout[length] = segments(length, parts) if length >= parts else None
+        return self._layout[length]
+
+    def candidates(self, query: str) -> List[int]:
+        """Sequence numbers of every key that may satisfy the threshold, ascending."""
+        lq = len(query)
+        out: Set[int] = set()
+        postings = self._postings
+        for length, seqs in self._by_len.items():
+            d = self._max_dist(lq, length)
+            delta = lq - length
+            if abs(delta) > d:
+                continue
+            layout = self._layout[length]
+            if layout is None:
+                out.update(seqs)          # too short to segment; score the whole bucket
+                continue
+            # A block shifted by s needs >= |s| edits on its left and >= |delta - s|
+            # on its right, which bounds the shift; and with d edits at least
+            # len(layout) - d blocks survive, so that many must hit.
+            lo, hi = -((d - delta) // 2), (d + delta) // 2
+            need = len(layout) - d
+            probes = []               # (posting volume, block no., {substring: postings})
+            for i, (pos, size) in enumerate(layout):
+                subs = {}
+                for start in range(max(0, pos + lo), min(lq - size, pos + hi) + 1):
+                    sub = query[start:start + size]
+                    hit = postings.get(hash((length, i, sub)))          # inlined _posting_key
+                    if hit is not None:
+                        subs[sub] = (hit,) if isinstance(hit, int) else hit
+                probes.append((sum(map(len, subs.values())), i, subs))
+            probes.sort(key=lambda p: p[0])
+            # Any survivor must hit one of the (len - need + 1) sparsest blocks, so
+            # only those posting lists are walked; the denser blocks are checked
+            # per candidate by slicing the key.
+            split = len(layout) - need + 1
+            counts: Dict[int, int] = defaultdict(int)
+            for _, _, subs in probes[:split]:
+                for seq in set().union(*subs.values()):
+                    counts[seq] += 1
+            rest = probes[split:]
+            for seq, n in counts.items():
+                if rest:
+                    key = self._keys[seq]
+                    for _, i, subs in rest:
+                        pos, size = layout[i]
+                        if key[pos:pos + size] in subs:
+                            n += 1
+                if n >= need:
+                    out.add(seq)
+        return sorted(out)
+
+    def _match(self, key: str, query: str) -> bool:
+        return self.scorer(key, query, score_cutoff=self.threshold) >= self.threshold
+
+    def find(self, query: str) -> Optional[str]:
+        """First key (in insertion order) whose score against *query* passes."""
+        self.lookups += 1
+        for seq in self.candidates(query):
+            self.scored += 1
+            key = self._keys[seq]
+            if self._match(key, query):
+                return key
+        return None
+
+
+class BKTree:
+    """Burkhard–Keller tree over an integer metric.
+
+    Nodes are the sequence numbers of the stored keys (*key_of* maps one back
+    to its key); the child of node `seq` at distance `d` is `_children[seq << 16 | d]`.
+    """
+
+    def __init__(self, metric: Metric, key_of: Callable[[int], str]):
+        self.metric = metric
+        self.key_of = key_of
+        self._root: Optional[int] = None
+        self._children: Dict[int, int] = {}
+
+    def add(self, key: str, seq: int) -> None:
+        if self._root is None:
+            self._root = seq
+            return
+        node = self._root
+        while True:
+            d = self.metric(key, self.key_of(node))
+            if d == 0:
+                return
+            link = node << 16 | d
+            child = self._children.get(link)
+            if child is None:
+                self._children[link] = seq
+                return
+            node = child
+
+    def search(self, query: str, radius: int) -> List[int]:
+        """Sequence numbers of every stored key within *radius* of *query*."""
+        out: List[int] = []
+        if self._root is None:
+            return out
+        get, metric, key_of = self._children.get, self.metric, self.key_of
+        stack = [self._root]
+        while stack:
+            seq = stack.pop()
+            d = metric(query, key_of(seq))
+            if d <= radius:
+                out.append(seq)
+            base = seq << 16
+            for link in range(base + max(d - radius, 1), base + d + radius + 1):
+                child = get(link)
+                if child is not None:
+                    stack.append(child)
+        return out
+
+
+class CompanyIndex(FuzzyKeyIndex):
+    """`FuzzyKeyIndex` whose predicate is `ratio >= threshold OR metric <= max_dist`.
+
+    The segment filter yields the ratio candidates and the BK-trees the metric
+    candidates; their union is verified in insertion order, which reproduces the
+    linear scan in `_fuzzy_find_company`.  Levenshtein distance is at least the
+    length difference, so there is one small tree per key length and a lookup
+    only walks the `2·max_dist + 1` trees in reach.
+    """
+
+    def __init__(self, threshold: float, scorer: Scorer, metric: Metric, max_dist: int):
+        super().__init__(threshold, scorer)
+        self.metric = metric
+        self.max_dist = max_dist
+        self._bk: Dict[int, BKTree] = {}
+
+    def add(self, key: str) -> None:
+        if key in self._seq:
+            return
+        super().add(key)
+        tree = self._bk.get(len(key))
+        if tree is None:
+            tree = self._bk[len(key)] = BKTree(self.metric, self._keys.__getitem__)
+        tree.add(key, self._seq[key])
+
+    def clear(self) -> None:
+        super().clear()
+        self._bk.clear()
+
+    def candidates(self, query: str) -> List[int]:
+        seqs = super().candidates(query)
+        # metric <= k implies Indel <= 2k; once the ratio filter's own distance
+        # budget covers that for every length in reach, the segment candidates
+        # already contain every metric match and the tree walk can be skipped.
+        lq = len(query)
+        if self._max_dist(lq, max(lq - self.max_dist, 0)) >= 2 * self.max_dist:
+            return seqs
+        merged = set(seqs)
+        for length in range(lq - self.max_dist, lq + self.max_dist + 1):
+            tree = self._bk.get(length)
+            if tree is not None:
+                merged.update(tree.search(query, self.max_dist))
+        return sorted(merged)
+
+    def _match(self, key: str, query: str) -> bool:
+        return (self.scorer(key, query, score_cutoff=self.threshold) >= self.threshold
+                or self.metric(key, query, score_cutoff=self.max_dist) <= self.max_dist)
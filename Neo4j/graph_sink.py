@@ -0,0 +1,218 @@
+"""graph_sink.py — where the loader's rows end up
+
+`BatchedGraphWriter` (fed by the loader's `queue_*` helpers) hands batches of rows, per kind
+(``"person"``, ``"company"``, ``"role"``, ``"family"``), to a sink:
+
+* `Neo4jSink`       — one `UNWIND $rows` transaction per batch (the normal load);
+* `MemoryGraphSink` — an in-process property graph applying the same MERGE /
+  SET / coalesce rules as the Cypher in `load_graph_v_5.py`, for profiling
+  the loader's CPU path and for checks without a database;
+* `JsonlSink`       — an append-only change log, one row per line, which
+  `replay` later pushes into any other sink in large batches (gzip-compressed
+  when the file name ends in ``.gz``).
+
+Rows are the dicts built by `person_row` / `company_row` / `role_row` /
+`family_row`; a sink never sees anything else.
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+from write_controller import run_in_transaction
+
+Row = Dict[str, Any]
+
+
+class GraphSink:
+    """Base class: `write(kind, rows)` applies one batch, `flush()` returns once everything
+    written so far is durable, `close()` flushes and releases resources.
+
+    Kinds listed in `self_batching` are buffered and batched by the sink itself, so
+    writers hand it their rows as they come instead of sizing batches for them.
+    """
+
+    self_batching: Tuple[str, ...] = ()
+
+    def write(self, kind: str, rows: List[Row]) -> None:
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "GraphSink":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class Neo4jSink(GraphSink):
+    """Run each batch as its kind's UNWIND statement in one write transaction.
+
+    With *driver_retries* the transaction goes through `execute_write` and the
+    driver retries transient errors itself; without, it is one explicit
+    transaction, for callers whose `WriteController` does the retrying.
+    """
+
+    def __init__(self, driver, statements: Dict[str, str], driver_retries: bool = True):
+        self.driver = driver
+        self.statements = statements
+        self.driver_retries = driver_retries
+        self._session = None
+
+    def write(self, kind: str, rows: List[Row]) -> None:
+        if self._session is None:
+            self._session = self.driver.session()
+        work = lambda tx: tx.run(self.statements[kind], rows=rows).consume()
+        if self.driver_retries:
+            self._session.execute_write(work)
+        else:
+            run_in_transaction(self._session, work)
+
+    def close(self) -> None:
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+
+def _set(props: Dict[str, Any], **values) -> None:
+    """Cypher `SET n.k = v`: a null value removes the property."""
+    for k, v in values.items():
+        if v is None:
+            props.pop(k, None)
+        else:
+            props[k] = v
+
+
+class MemoryGraphSink(GraphSink):
+    """Property graph in dicts, mirroring MERGE_PERSON / _COMPANY / _ROLE / _FAMILY.
+
+    Edge rows whose endpoints do not exist are dropped, as the statements'
+    `MATCH` clauses would drop them; `dropped` counts them per kind.
+    """
+
+    def __init__(self):
+        self.nodes: Dict[str, Dict[str, Dict[str, Any]]] = {"Person": {}, "Company": {}}
+        self.rels: Dict[Tuple[str, str, str, str], Dict[str, Any]] = {}     # (type, src, dst, key) → props
+        self.rows: Dict[str, int] = defaultdict(int)
+        self.dropped: Dict[str, int] = defaultdict(int)
+
+    def write(self, kind: str, rows: List[Row]) -> None:
+        apply = getattr(self, f"_{kind}")
+        for row in rows:
+            apply(row)
+        self.rows[kind] += len(rows)
+
+    def _node(self, label: str, node_id: str) -> Dict[str, Any]:
+        return self.nodes[label].setdefault(node_id, {"id": node_id})
+
+    def _person(self, row: Row) -> None:
+        _set(self._node("Person", row["id"]), name=row["name"], aliases=row["alias"], wikidata_qid=row["qid"],
+             updated=row["today"], reference_type=row["source_type"], reference_file=row["source_file"])
+
+    def _company(self, row: Row) -> None:
+        _set(self._node("Company", row["id"]), name=row["name"], lastUpdated=row["today"],
+             reference_type=row["source_type"], reference_file=row["source_file"])
+
+    def _role(self, row: Row) -> None:
+        if row["pid"] not in self.nodes["Person"] or row["cid"] not in self.nodes["Company"]:
+            self.dropped["role"] += 1
+            return
+        props = self.rels.get(("HAS_ROLE_AT", row["pid"], row["cid"], row["role"]))
+        if props is None:
+            props = self.rels[("HAS_ROLE_AT", row["pid"], row["cid"], row["role"])] = {"role": row["role"]}
+            _set(props, startDate=row["start"], endDate=row["end"])
+        else:
+            _set(props, startDate=row["start"] if row["start"] is not None else props.get("startDate"),
+                 endDate=row["end"] if row["end"] is not None else props.get("endDate"))
+        _set(props, reference_type=row["source_type"], reference_file=row["source_file"])
+
+    def _family(self, row: Row) -> None:
+        persons = self.nodes["Person"]
+        if row["src"] not in persons or row["dst"] not in persons:
+            self.dropped["family"] += 1
+            return
+        props = self.rels.setdefault(("FAMILY", row["src"], row["dst"], row["rel"]), {"relation": row["rel"]})
+        _set(props, reference_type=row["source_type"], reference_file=row["source_file"])
+
+    def summary(self) -> str:
+        by_type = defaultdict(int)
+        for rel_type, *_ in self.rels:
+            by_type[rel_type] += 1
+        dropped = ", ".join(f"{k}={n}" for k, n in self.dropped.items() if n)
+        return (f"[INFO] In-memory graph: {len(self.nodes['Person'])} Person, {len(self.nodes['Company'])} Company, "
+                + ", ".join(f"{n} {t}" for t, n in sorted(by_type.items()))
+                + (f"; edges with missing endpoints dropped: {dropped}" if dropped else ""))
+
+
+def _open_log(path: Path, mode: str):
+    if path.suffix == ".gz":
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return path.open(mode, encoding="utf-8")
+
+
+class JsonlSink(GraphSink):
+    """Append every row to *path* as ``{"kind": …, "row": …}``; flushed once per batch.
+
+    *mode* ``"w"`` starts a fresh log instead of appending.
+    """
+
+    def __init__(self, path: Path, mode: str = "a"):
+        self.path = Path(path)
+        self._fh = _open_log(self.path, mode)
+        self.rows = 0
+
+    def write(self, kind: str, rows: List[Row]) -> None:
+        self._fh.writelines(json.dumps({"kind": kind, "row": row}, ensure_ascii=False) + "\n" for row in rows)
+        self._fh.flush()
+        self.rows += len(rows)
+
+    def close(self) -> None:
+        self._fh.close()
+
+
+def read_log(path: Path) -> Iterator[Tuple[str, Row]]:
+    with _open_log(Path(path), "r") as fh:
+        for line in fh:
+            if line.strip():
+                rec = json.loads(line)
+                yield rec["kind"], rec["row"]
+
+
+def replay(path: Path, sink: GraphSink, batch_size: int = 5000, controller=None, skip: Sequence[str] = ()) -> int:
+    """Push a `JsonlSink` log into *sink*, in log order, as runs of same-kind batches.
+
+    A `WriteController` (write_controller.py), if given, re-batches each run adaptively.
+    Rows of the kinds in *skip* are not graph writes and are left out.
+    """
+    def write(kind: str, batch: List[Row]) -> None:
+        if controller is None:
+            sink.write(kind, batch)
+        else:
+            controller.run(batch, lambda b: sink.write(kind, b))
+
+    t0 = time.monotonic()
+    n = 0
+    kind, batch = None, []
+    for k, row in read_log(path):
+        if k in skip:
+            continue
+        if (k != kind or len(batch) >= batch_size) and batch:
+            write(kind, batch)
+            batch = []
+        kind = k
+        batch.append(row)
+        n += 1
+    if batch:
+        write(kind, batch)
+    print(f"[INFO] Replayed {n} rows from {Path(path).name} in {time.monotonic() - t0:.1f}s")
+    return n
@@ -0,0 +1,234 @@
+"""graph_writer.py — buffered UNWIND writer for the UHNW loader
+
+`load_graph_v_5.py` used to issue one `execute_write` per entity and per edge,
+i.e. one Aura round trip per row.  `BatchedGraphWriter` queues the rows instead
+and hands them to a `GraphSink` (graph_sink.py) `batch_size` rows at a time —
+for Neo4j, one `UNWIND $rows AS row …` transaction per batch.
+
+Rows are flushed kind by kind in the order the kinds were given, so listing
+nodes before edges guarantees that the `MATCH`es in the edge statements see
+every node queued earlier.  Within a kind the row order is kept,
+which preserves the sequential `SET` / `coalesce` semantics of the single-row
+statements.
+
+Node kinds can instead be sent through `upsert`, which coalesces repeated
+writes of the same entity: the row is built once, at flush time, and only if
+its identifying state differs from what `EntityWriteCache` says was last
+written (or pre-loaded from the graph).
+"""
+
+from __future__ import annotations
+
+import re
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from compact_registry import pack_id
+from graph_sink import GraphSink
+from write_controller import WriteController
+from edge_fingerprints import EdgeFingerprints
+
+Row = Dict[str, Any]
+
+PARAM_RE = re.compile(r"\$(\w+)")
+
+
+def unwind(cypher: str) -> str:
+    """Turn a single-row statement using `$param`s into an `UNWIND $rows` batch statement."""
+    return "UNWIND $rows AS row\n" + PARAM_RE.sub(r"row.\1", cypher.strip())
+
+
+class EntityWriteCache:
+    """Last-written state of every node written (or pre-loaded) during a run.
+
+    *state_fields* names, per kind, the row fields whose change makes an entity
+    dirty; volatile fields such as timestamps or the referencing file are not
+    part of the state.
+
+    One entry per node in the graph, so it is kept small: a dict per kind, keyed
+    by the packed id (`pack_id`), holding only the hash of the state tuple.  A
+    hash collision would skip one write; at 64 bits that is not a practical concern.
+    """
+
+    def __init__(self, state_fields: Dict[str, Sequence[str]]):
+        self.state_fields = state_fields
+        self._written: Dict[str, Dict[Hashable, int]] = defaultdict(dict)
+        self.clean = defaultdict(int)       # kind → upserts dropped as unchanged
+
+    def state(self, kind: str, row: Row) -> int:
+        return hash(tuple(tuple(v) if isinstance(v, list) else v for v in (row[f] for f in self.state_fields[kind])))
+
+    @staticmethod
+    def _key(key: Hashable) -> Hashable:
+        return pack_id(key) if isinstance(key, str) else key
+
+    def seed(self, kind: str, key: Hashable, row: Row) -> None:
+        """Record *row* as already present in the graph."""
+        self._written[kind][self._key(key)] = self.state(kind, row)
+
+    def is_dirty(self, kind: str, key: Hashable, row: Row) -> bool:
+        return self._written[kind].get(self._key(key)) != self.state(kind, row)
+
+    def known(self, kind: str, key: Hashable) -> bool:
+        """Whether the entity was pre-loaded or written."""
+        return self._key(key) in self._written[kind]
+
+    def mark_written(self, kind: str, key: Hashable, row: Row) -> None:
+        self._written[kind][self._key(key)] = self.state(kind, row)
+
+    def forget(self) -> None:
+        """Drop all recorded state, e.g. when writing to an empty (in-memory) graph."""
+        self._written.clear()
+
+
+class BatchedGraphWriter:
+    """Accumulate rows per kind and write them to *sink* in batches.
+
+    *kinds* (``"person"``, ``"role"`` …) is the flush order.  A flush happens
+    when any kind has a batch of rows pending, when `flush_interval` seconds
+    have passed since the last one, or on `close()`, which also closes the sink.
+
+    With a *controller* (write_controller.py) the batch size adapts to commit
+    latency and failed batches are split and retried; otherwise every batch is
+    `batch_size` rows.  Kinds the sink batches itself (`sink.self_batching`) are
+    handed over whole.  `flush()` ends with the sink's own `flush()`, so when it
+    returns every row queued so far is committed.  With *fingerprints*
+    (edge_fingerprints.py) edge rows identical to what was last written are
+    dropped.  A flush's edge rows are fingerprinted only once the sink's flush
+    has returned (a self-batching sink may still hold them before), and are
+    forgotten if any part of the flush fails; the fingerprints are saved on
+    `close()` once the sink has committed everything.
+    """
+
+    def __init__(self, sink: GraphSink, kinds: Sequence[str], batch_size: int = 500, flush_interval: float = 5.0,
+                 cache: Optional[EntityWriteCache] = None, controller: Optional[WriteController] = None,
+                 fingerprints: Optional[EdgeFingerprints] = None):
+        self.sink = sink
+        self.kinds = tuple(kinds)
+        self.batch_size = batch_size
+        self.controller = controller
+        self.fingerprints = fingerprints
+        self.flush_interval = flush_interval
+        self.cache = cache or EntityWriteCache({})
+        self._pending: Dict[str, List[Row]] = {k: [] for k in self.kinds}
+        self._upserts: Dict[str, Dict[Hashable, Callable[[], Row]]] = {k: {} for k in self.kinds}
+        self._n_pending = 0
+        self._staged: List[Tuple[str, List[Row]]] = []      # edge rows awaiting the sink's flush
+        self._last_flush = time.monotonic()
+        self._started = time.monotonic()
+        self.rows: Dict[str, int] = defaultdict(int)
+        self.transactions = 0
+        self.write_seconds = 0.0
+
+    # ------------------------------------------------------------------
+    def __enter__(self) -> "BatchedGraphWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def add(self, kind: str, row: Row) -> None:
+        pending = self._pending[kind]
+        pending.append(row)
+        self._n_pending += 1
+        self._maybe_flush(len(pending))
+
+    def upsert(self, kind: str, key: Hashable, make_row: Callable[[], Row]) -> None:
+        """Queue a coalesced node write; *make_row* is called once, at flush time."""
+        pending = self._upserts[kind]
+        if key not in pending:
+            self._n_pending += 1
+        pending[key] = make_row              # last caller wins (latest source_file)
+        self._maybe_flush(len(pending))
+
+    def _maybe_flush(self, n_kind: int) -> None:
+        size = self.controller.size if self.controller is not None else self.batch_size
+        if n_kind >= size or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def _collect(self, kind: str) -> List[Tuple[Optional[Hashable], Row]]:
+        out: List[Tuple[Optional[Hashable], Row]] = []
+        for key, make_row in self._upserts[kind].items():
+            row = make_row()
+            if self.cache.is_dirty(kind, key, row):
+                out.append((key, row))
+            else:
+                self.cache.clean[kind] += 1
+        self._upserts[kind].clear()
+        fps = self.fingerprints
+        if fps is not None and kind in fps.kinds:
+            for row in fps.collapse(kind, self._pending[kind]):
+                if fps.unchanged(kind, row):
+                    fps.skipped[kind] += 1
+                else:
+                    out.append((None, row))
+        else:
+            out.extend((None, row) for row in self._pending[kind])
+        self._pending[kind].clear()
+        return out
+
+    def flush(self) -> None:
+        """Write everything pending; returns once the sink has committed it."""
+        if self._n_pending:
+            try:
+                for kind in self.kinds:
+                    keyed = self._collect(kind)
+                    if kind in self.sink.self_batching:
+                        if keyed:
+                            self._write_keyed(kind, keyed)      # the sink batches (and times) these itself
+                        continue
+                    if self.controller is not None:
+                        self.controller.run(keyed, lambda chunk, kind=kind: self._write_keyed(kind, chunk))
+                        continue
+                    for i in range(0, len(keyed), self.batch_size):
+                        self._write_keyed(kind, keyed[i:i + self.batch_size])
+                self._n_pending = 0
+                t0 = time.monotonic()
+                self.sink.flush()
+                self.write_seconds += time.monotonic() - t0
+            except BaseException:
+                self._staged.clear()            # not known to be committed: written again next time
+                raise
+            for kind, rows in self._staged:
+                self.fingerprints.record(kind, rows)
+            self._staged.clear()
+        self._last_flush = time.monotonic()
+
+    def close(self) -> None:
+        try:
+            self.flush()
+        finally:
+            self.sink.close()
+        if self.fingerprints is not None:
+            self.fingerprints.save()            # only reached when every write went through
+
+    def _write_keyed(self, kind: str, chunk: Sequence[Tuple[Optional[Hashable], Row]]) -> None:
+        rows = [row for _, row in chunk]
+        self._write(kind, rows)
+        for key, row in chunk:
+            if key is not None:
+                self.cache.mark_written(kind, key, row)
+        if self.fingerprints is not None and kind in self.fingerprints.kinds:
+            self._staged.append((kind, rows))
+
+    def _write(self, kind: str, batch: List[Row]) -> None:
+        t0 = time.monotonic()
+        self.sink.write(kind, batch)
+        self.write_seconds += time.monotonic() - t0
+        if kind not in self.sink.self_batching:
+            self.transactions += 1
+        self.rows[kind] += len(batch)
+
+    # ------------------------------------------------------------------
+    def report(self) -> str:
+        total = sum(self.rows.values())
+        wall = max(time.monotonic() - self._started, 1e-9)
+        busy = max(self.write_seconds, 1e-9)
+        per_kind = ", ".join(f"{k}={self.rows[k]}" for k in self.kinds if self.rows[k])
+        skipped = ", ".join(f"{k}={n}" for k, n in self.cache.clean.items() if n)
+        edges = ", ".join(f"{k}={n}" for k, n in self.fingerprints.skipped.items() if n) if self.fingerprints else ""
+        return (f"[INFO] Wrote {total} rows ({per_kind or 'none'}) in {self.transactions} transactions — "
+                f"{total / busy:,.0f} rows/s while writing, {total / wall:,.0f} rows/s overall"
+                + (f"; unchanged upserts skipped: {skipped}" if skipped else "")
+                + (f"; unchanged edges skipped: {edges}" if edges else ""))
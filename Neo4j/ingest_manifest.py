@@ -0,0 +1,95 @@
+"""ingest_manifest.py — record of annual-report files already loaded into the graph
+
+Replaces the old "is `reference_file` anywhere in the graph?" check, which
+needed a scan over every node and relationship and could not tell an edited
+re-export from the original.  Each successfully ingested file gets one row
+(filename, SHA-256, size, mtime, loader version, ingest timestamp); a file is
+skipped only when its content hash and the loader version both match.
+
+Rows are committed one file at a time (SQLite transaction), after that file's
+graph writes have been flushed, so an interrupted directory run resumes at the
+first file that was not fully written.
+
+`readonly=True` (used by `--plan`) reads the manifest without ever writing it:
+`record` only collects the entries in `recorded`, which the plan log carries
+to `--apply-plan` (`put`, once the planned rows are committed).
+"""
+
+from __future__ import annotations
+
+import datetime
+import hashlib
+import sqlite3
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+Entry = Tuple[str, str, int, float]      # filename, sha256, size, mtime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS manifest (
+    filename       TEXT PRIMARY KEY,
+    sha256         TEXT NOT NULL,
+    size           INTEGER NOT NULL,
+    mtime          REAL NOT NULL,
+    loader_version TEXT NOT NULL,
+    ingested_at    TEXT NOT NULL
+);
+"""
+
+
+def sha256_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class IngestManifest:
+    def __init__(self, path: Path, loader_version: str, readonly: bool = False):
+        self.path = Path(path)
+        self.loader_version = loader_version
+        self.readonly = readonly
+        self.recorded: List[Entry] = []
+        if readonly and self.path.exists():
+            self.db = sqlite3.connect(f"{self.path.resolve().as_uri()}?mode=ro", uri=True)
+        else:
+            self.db = sqlite3.connect(":memory:" if readonly else self.path)
+            self.db.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.db.close()
+
+    def __len__(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM manifest").fetchone()[0]
+
+    def _row(self, filename: str) -> Optional[tuple]:
+        return self.db.execute(
+            "SELECT sha256, size, mtime, loader_version FROM manifest WHERE filename = ?", (filename,)).fetchone()
+
+    def unchanged_by_stat(self, path: Path) -> bool:
+        """Cheap check: same size and mtime as recorded (no need to read the file)."""
+        row = self._row(path.name)
+        if row is None or row[3] != self.loader_version:
+            return False
+        st = path.stat()
+        return row[1] == st.st_size and row[2] == st.st_mtime
+
+    def is_current(self, path: Path, digest: str) -> bool:
+        """True when *path* was already ingested with the same content and loader version."""
+        row = self._row(path.name)
+        return row is not None and row[0] == digest and row[3] == self.loader_version
+
+    def record(self, path: Path, digest: str) -> None:
+        st = path.stat()
+        entry = (path.name, digest, st.st_size, st.st_mtime)
+        if self.readonly:
+            self.recorded.append(entry)
+        else:
+            self.put(entry)
+
+    def put(self, entry: Entry) -> None:
+        with self.db:
+            self.db.execute(
+                "INSERT INTO manifest(filename, sha256, size, mtime, loader_version, ingested_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(filename) DO UPDATE SET sha256 = excluded.sha256, size = excluded.size, "
+                "mtime = excluded.mtime, loader_version = excluded.loader_version, ingested_at = excluded.ingested_at",
+                (*entry, self.loader_version, datetime.datetime.utcnow().isoformat()),
+            )
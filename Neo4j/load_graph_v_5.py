@@ -14,103 +14,232 @@ Any additional discrepancies between *modified* and *v4* have been annotated wit
 `TODO:` comments so you can decide on the preferred logic.
 """
 
-import os, re, json, csv, argparse, uuid, datetime
-from collections import defaultdict
+import os, re, json, csv, argparse, uuid, datetime, logging, contextlib, itertools
+import concurrent.futures
+from collections import defaultdict, deque
 from pathlib import Path
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Dict, Any, Deque, List, Optional, Tuple
 
 from rapidfuzz.fuzz import token_set_ratio
 from rapidfuzz import distance
 from neo4j import GraphDatabase
 
+from compact_registry import CompanyRegistry, PersonEntry, StringPool
+from entity_index import CompanyIndex, FuzzyKeyIndex
+from graph_sink import GraphSink, JsonlSink, MemoryGraphSink, Neo4jSink, read_log, replay
+from graph_writer import BatchedGraphWriter, EntityWriteCache, unwind
+from bulk_export import write_bulk
+from write_controller import WriteController
+from write_profile import SampleSink, run_profile
+from parallel_edges import ParallelEdgeSink
+from edge_fingerprints import EdgeFingerprints
+from change_plan import MANIFEST_KIND, PlanSink
+from registry_store import RegistrySnapshot
+from ingest_manifest import IngestManifest, sha256_bytes
+
 # ─────────────────────────────── Config ───────────────────────────────
 NEO4J_URI      = os.getenv("NEO4J_URI",      "neo4j+s://8f6e6423.databases.neo4j.io")
 NEO4J_USER     = os.getenv("NEO4J_USER",     "neo4j")
 NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "TUOx-U2EDDDXXNAteOqarP3aEj7XxMcsoilyEtL7NLI")
 
-driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+_driver = None
+
+def get_driver():
+    """The Aura driver, created on first use so offline sinks never need a database."""
+    global _driver
+    if _driver is None:
+        _driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+    return _driver
 
 TODAY = datetime.datetime.utcnow().isoformat()
 
+# Bump when a change to parsing/resolution should make ingest_annual reload files it already saw.
+LOADER_VERSION = "5.1"
+
 # ───────────────────── Registry & canonical helpers ─────────────────────
 SLUG_RE = re.compile(r"[^a-z0-9]+")
 
 def slug(txt: str) -> str:
     return SLUG_RE.sub("_", txt.lower()).strip("_")
 
-PersonEntry = Dict[str, Any]  # {id, canonical, aliases:set[str]}
-
+# Compact records (see compact_registry.py); aliases go through `alias_pool`
+# so a mention shared by many people is stored once.
+alias_pool = StringPool()
 person_registry: Dict[str, PersonEntry] = {}
-company_registry: Dict[str, str]        = {}  # slug → id
+company_registry = CompanyRegistry()          # slug → id (+ display name)
 qid_registry: Dict[str, str]            = {}  # qid → slug
-processed_annual_reports: set[str]      = set()
 
 FUZZ_THRESHOLD = 93
 LEV_DIST       = 2
 
+# Blocking indexes over the registry keys; they must see every insert
+# (see _register_person / _register_company).
+person_index  = FuzzyKeyIndex(FUZZ_THRESHOLD, token_set_ratio)
+company_index = CompanyIndex(FUZZ_THRESHOLD, token_set_ratio, distance.Levenshtein.distance, LEV_DIST)
+
+# Exact fast path ahead of fuzzy matching: slug(alias) → registry key.  Person
+# aliases need at least two slug tokens (initials and bare surnames are too
+# ambiguous) and an alias claimed by two different people is dropped.  Company
+# "aliases" are the raw names already resolved to a key — keys are only ever
+# appended, so a fuzzy result never changes once found and can be memoised.
+MIN_ALIAS_TOKENS = 2
+_AMBIGUOUS = ""
+person_alias_index: Dict[str, str]  = {}
+company_alias_index: Dict[str, str] = {}
+resolution_stats: Dict[str, Dict[str, int]] = {"person": defaultdict(int), "company": defaultdict(int)}
+
 # ---------------- Person / Company registry APIs ----------------
 
+def _new_person(pid: str, name: str, aliases=(), qid: Optional[str] = None) -> PersonEntry:
+    return PersonEntry(pid, name, tuple(alias_pool(a) for a in dict.fromkeys(aliases)), qid)
+
+def _person_key(name: str, s: str) -> str:
+    """Registry key of *name* with slug *s*.
+
+    A name whose slug is empty (CJK script …) is keyed on the name itself,
+    ``#<name>``: keyed on ``""`` every such name would resolve to one person.
+    Those keys match exactly or not at all — they are never fuzzy-indexed.
+    """
+    if s:
+        return s
+    name = " ".join((name or "").split())
+    return "#" + name if name else ""
+
+def _register_person(s: str, entry: PersonEntry) -> str:
+    """Register *entry* under key *s* (see `_person_key`); returns the registry key used.
+
+    Only a missing name leaves *s* empty; it gets a key of its own, ``#<id>``.
+    """
+    if not s:
+        s = "#" + entry.id
+    elif not s.startswith("#"):
+        person_index.add(s)
+    person_registry[s] = entry
+    if entry.qid:
+        qid_registry[entry.qid] = s
+    _add_person_aliases(s, entry, ())
+    return s
+
+def _add_person_aliases(key: str, entry: PersonEntry, names) -> None:
+    """Add *names* to the entry's aliases and index every alias under *key*."""
+    entry.add_aliases(names, alias_pool)
+    for a in entry.aliases:
+        sa = slug(a)
+        if sa.count("_") + 1 < MIN_ALIAS_TOKENS or sa in person_registry:
+            continue
+        prev = person_alias_index.setdefault(sa, key)
+        if prev != key and person_registry.get(prev) is not entry:
+            person_alias_index[sa] = _AMBIGUOUS
+
+def _find_person(s: str) -> Optional[str]:
+    """Registry key for slug *s*: exact slug, then alias hash, then fuzzy."""
+    stats = resolution_stats["person"]
+    if not s:
+        stats["new"] += 1
+        return None
+    if s in person_registry:
+        stats["exact"] += 1
+        return s
+    if s.startswith("#"):
+        stats["new"] += 1
+        return None
+    key = person_alias_index.get(s)
+    if key:
+        stats["alias"] += 1
+        return key
+    key = _fuzzy_find_person(s)
+    stats["fuzzy" if key else "new"] += 1
+    return key
+
 def _fuzzy_find_person(s: str) -> Optional[str]:
     """Return slug key from registry that fuzzy‑matches *s*"""
-    for k in person_registry:
-        if token_set_ratio(k, s) >= FUZZ_THRESHOLD:
-            return k
-    return None
+    return person_index.find(s)
+
+def _register_company(s: str, cid: str, name: str, refresh: bool = False) -> None:
+    company_registry.register(s, cid, name, refresh)
+    company_index.add(s)
+
+def _find_company(s: str) -> Optional[str]:
+    """Registry key for slug *s*: exact slug, then memoised earlier match, then fuzzy."""
+    stats = resolution_stats["company"]
+    if s in company_registry:
+        stats["exact"] += 1
+        return s
+    key = company_alias_index.get(s)
+    if key:
+        stats["alias"] += 1
+        return key
+    key = _fuzzy_find_company(s)
+    if key:
+        stats["fuzzy"] += 1
+        company_alias_index[s] = key
+    else:
+        stats["new"] += 1
+    return key
 
 def _fuzzy_find_company(s: str) -> Optional[str]:
     """Return slug key from registry that fuzzy‑matches *s*"""
-    for k in company_registry:
-        if token_set_ratio(k, s) >= FUZZ_THRESHOLD or distance.Levenshtein.distance(k, s) <= LEV_DIST:
-            return k
-    return None
+    return company_index.find(s)
+
+def resolution_report() -> str:
+    parts = []
+    for kind, st in resolution_stats.items():
+        total = sum(st.values())
+        if total:
+            fast = st["exact"] + st["alias"]
+            parts.append(f"{kind}: {total} lookups, {fast} fast-path ({100 * fast / total:.1f}%: "
+                         f"{st['exact']} exact, {st['alias']} alias), {st['fuzzy']} fuzzy, {st['new']} new")
+    return "[INFO] Resolution — " + ("; ".join(parts) or "no lookups")
 
 
-def get_or_create_person(raw_name: str, canonical: Optional[str] = None, extras: Optional[List[str]] = None, qid: Optional[str] = None) -> Tuple[str, PersonEntry]:
-    """Get or create a person entry. If qid is provided, it's the authoritative ID."""
+def get_or_create_person(raw_name: str, canonical: Optional[str] = None, extras: Optional[List[str]] = None, qid: Optional[str] = None, key: Optional[str] = None) -> Tuple[str, PersonEntry]:
+    """Get or create a person entry. If qid is provided, it's the authoritative ID.
+
+    *key* is an already computed `slug(canonical or raw_name)` (see `normalise_docs`).
+    """
     name = canonical or raw_name
-    s = slug(name)
+    s = _person_key(name, key or slug(name))
 
     # If qid is given, it's the source of truth. The node ID *is* the QID.
     if qid:
         if qid in qid_registry:
             key = qid_registry[qid]
             entry = person_registry[key]
-            if name not in entry['aliases'] and name != entry['canonical']:
-                entry['aliases'].add(name)
-            return entry['id'], entry
+            if name not in entry.aliases and name != entry.canonical:
+                _add_person_aliases(key, entry, (name,))
+            return entry.id, entry
         else:
             pid = qid  # Use QID as the primary node ID
-            entry = {"id": pid, "canonical": name, "aliases": set(), "qid": qid}
-            person_registry[s] = entry
-            qid_registry[qid] = s
+            entry = _new_person(pid, name, qid=qid)
+            key = _register_person(s, entry)
             if extras:
-                entry['aliases'].update(extras)
+                _add_person_aliases(key, entry, extras)
             return pid, entry
 
     # Fallback for non-Wikidata sources without a QID
-    key = _fuzzy_find_person(s)
+    key = _find_person(s)
     if key is None:
         pid = f"person:{uuid.uuid4().hex[:12]}"
-        entry = {"id": pid, "canonical": name, "aliases": set(), "qid": None}
-        person_registry[s] = entry
-        key = s
+        entry = _new_person(pid, name)
+        key = _register_person(s, entry)
     else:
         entry = person_registry[key]
 
-    if extras:
-        entry['aliases'].update(extras)
-    if raw_name not in entry['aliases'] and raw_name != entry['canonical']:
-        entry['aliases'].add(raw_name)
+    new_aliases = list(extras or ())
+    if raw_name not in entry.aliases and raw_name != entry.canonical:
+        new_aliases.append(raw_name)
+    if new_aliases:
+        _add_person_aliases(key, entry, new_aliases)
 
-    return entry['id'], entry
+    return entry.id, entry
 
 
-def get_or_create_company(raw_name: str) -> str:
-    s = slug(raw_name)
-    key = _fuzzy_find_company(s)
+def get_or_create_company(raw_name: str, key: Optional[str] = None) -> str:
+    s = key or slug(raw_name)
+    key = _find_company(s)
     if key is None:
         cid = f"company:{uuid.uuid4().hex[:12]}"
-        company_registry[s] = cid
+        _register_company(s, cid, raw_name)
         return cid
     else:
         return company_registry[key]
@@ -158,55 +287,87 @@ SET r.reference_type=$source_type,
     r.reference_file=$source_file
 """
 
+UNWIND_STATEMENTS = {   # flush order (WRITE_KINDS): nodes before the edges that MATCH them
+    "person":  unwind(MERGE_PERSON),
+    "company": unwind(MERGE_COMPANY),
+    "role":    unwind(MERGE_ROLE),
+    "family":  unwind(MERGE_FAMILY),
+}
+WRITE_KINDS = tuple(UNWIND_STATEMENTS)
+
+# Node state that makes a re-write worthwhile; seeded by preload_registries so
+# entities already in the graph are only rewritten when they actually change.
+write_cache = EntityWriteCache({"person": ("name", "alias", "qid"), "company": ("name",)})
+
 # ---------------- Write helpers ----------------
 
-def write_person(tx, entry: PersonEntry, source_type: str, source_file: str):
-    tx.run(MERGE_PERSON, id=entry["id"], name=entry["canonical"], alias=sorted(entry["aliases"]), qid=entry.get("qid"), today=TODAY, source_type=source_type, source_file=source_file)
+def person_row(entry: PersonEntry, source_type: str, source_file: str) -> Dict[str, Any]:
+    return dict(id=entry.id, name=entry.canonical, alias=sorted(entry.aliases), qid=entry.qid, today=TODAY, source_type=source_type, source_file=source_file)
+
 
+def company_row(cid: str, name: str, source_type: str, source_file: str) -> Dict[str, Any]:
+    return dict(id=cid, name=name, today=TODAY, source_type=source_type, source_file=source_file)
 
-def write_company(tx, cid: str, name: str, source_type: str, source_file: str):
-    tx.run(MERGE_COMPANY, id=cid, name=name, today=TODAY, source_type=source_type, source_file=source_file)
 
+def role_row(pid: str, cid: str, role: str, start: Optional[str], end: Optional[str], source_type: str, source_file: str) -> Dict[str, Any]:
+    return dict(pid=pid, cid=cid, role=role, start=start, end=end, source_type=source_type, source_file=source_file)
 
-def write_role(tx, pid: str, cid: str, role: str, start: Optional[str], end: Optional[str], source_type: str, source_file: str):
-    tx.run(MERGE_ROLE, pid=pid, cid=cid, role=role, start=start, end=end, source_type=source_type, source_file=source_file)
 
+def family_row(sid: str, did: str, rel: str, source_type: str, source_file: str) -> Dict[str, Any]:
+    return dict(src=sid, dst=did, rel=rel, source_type=source_type, source_file=source_file)
 
-def write_family(tx, sid: str, did: str, rel: str, source_type: str, source_file: str):
-    """Create a person‑to‑person FAMILY edge **unless** it is a self‑loop."""
+
+# Rows are queued on a BatchedGraphWriter, which hands them to a GraphSink (graph_sink.py).
+# Person/company writes are coalesced per id: the row reflects the entry as of the
+# flush and is skipped when name/aliases/qid match what was last written.
+
+def queue_person(w: BatchedGraphWriter, entry: PersonEntry, source_type: str, source_file: str):
+    w.upsert("person", entry.id, lambda: person_row(entry, source_type, source_file))
+
+
+def queue_company(w: BatchedGraphWriter, cid: str, name: str, source_type: str, source_file: str):
+    w.upsert("company", cid, lambda: company_row(cid, name, source_type, source_file))
+
+
+def queue_role(w: BatchedGraphWriter, pid: str, cid: str, role: str, start: Optional[str], end: Optional[str], source_type: str, source_file: str):
+    if role is None:
+        return  # MERGE on a null property would fail the whole UNWIND batch
+    w.add("role", role_row(pid, cid, role, start, end, source_type, source_file))
+
+
+def queue_family(w: BatchedGraphWriter, sid: str, did: str, rel: str, source_type: str, source_file: str):
     if sid == did:
         return  # ← self‑loop detected; skip
-    tx.run(MERGE_FAMILY, src=sid, dst=did, rel=rel, source_type=source_type, source_file=source_file)
+    w.add("family", family_row(sid, did, rel, source_type, source_file))
 
 # ───────────────────────────── Parsers ─────────────────────────────
 
-def ingest_neo4j_query(path: Path):
+def ingest_neo4j_query(path: Path, w: BatchedGraphWriter):
     if not path.exists():
         print(f"[WARN] {path} missing, skip neo4j_export")
         return
     data = json.loads(path.read_text())
     source_type = "neo4j_export"
     source_file = path.name
-    with driver.session() as s:
-        for rec in data:
-            if not rec.get("n") or not rec.get("m"):
-                continue
-            pn = rec["n"]["properties"].get("name", "")
-            cn = rec["m"]["properties"].get("name", "")
-            pid, pentry = get_or_create_person(pn)
-            cid = get_or_create_company(cn)
-            s.execute_write(write_person, pentry, source_type, source_file)
-            s.execute_write(write_company, cid, cn, source_type, source_file)
-            rel = rec.get("r")
-            if rel:
-                rp = rel["properties"]
-                if pid != cid:  # Defensive — person id will never equal company id but keep check
-                    s.execute_write(write_role, pid, cid, rp.get("role"), rp.get("startDate"), rp.get("endDate"), source_type, source_file)
+    for rec in data:
+        if not rec.get("n") or not rec.get("m"):
+            continue
+        pn = rec["n"]["properties"].get("name", "")
+        cn = rec["m"]["properties"].get("name", "")
+        pid, pentry = get_or_create_person(pn)
+        cid = get_or_create_company(cn)
+        queue_person(w, pentry, source_type, source_file)
+        queue_company(w, cid, cn, source_type, source_file)
+        rel = rec.get("r")
+        if rel:
+            rp = rel["properties"]
+            if pid != cid:  # Defensive — person id will never equal company id but keep check
+                queue_role(w, pid, cid, rp.get("role"), rp.get("startDate"), rp.get("endDate"), source_type, source_file)
 
 
 # ✸ NEW unified Wikidata ingester — merges the two competing definitions from v4 ✸
 
-def ingest_wikidata(path: Path):
+def ingest_wikidata(path: Path, w: BatchedGraphWriter):
     """Ingest simplified Wikidata JSON dump (nodes + family + business roles)."""
     if not path.exists():
         print(f"[WARN] {path} missing, skip wikidata_json")
@@ -218,58 +379,57 @@ def ingest_wikidata(path: Path):
     source_type = "wikidata"
     source_file = path.name
 
-    with driver.session() as s:
-        # Pass 1: Create/update all person nodes using their QID as the primary ID.
-        for p in persons:
-            qid = p.get("id")
-            if not qid:
-                continue
-            name = p.get("props", {}).get("name") or qid
-            pid, entry = get_or_create_person(name, qid=qid)
-            s.execute_write(write_person, entry, source_type, source_file)
+    # Pass 1: Create/update all person nodes using their QID as the primary ID.
+    for p in persons:
+        qid = p.get("id")
+        if not qid:
+            continue
+        name = p.get("props", {}).get("name") or qid
+        pid, entry = get_or_create_person(name, qid=qid)
+        queue_person(w, entry, source_type, source_file)
 
-        # Pass 2: Create family relationships from the 'edges' list using QIDs.
-        for edge in edges:
-            src_qid = edge.get("seed")
-            dst_qid = edge.get("rel")
-            rel_type = edge.get("relType")
+    # Pass 2: Create family relationships from the 'edges' list using QIDs.
+    for edge in edges:
+        src_qid = edge.get("seed")
+        dst_qid = edge.get("rel")
+        rel_type = edge.get("relType")
 
-            if not all([src_qid, dst_qid, rel_type]):
-                continue
+        if not all([src_qid, dst_qid, rel_type]):
+            continue
 
-            if src_qid == dst_qid:
-                continue
+        if src_qid == dst_qid:
+            continue
 
-            # The node IDs are the QIDs themselves, so this will match correctly.
-            s.execute_write(write_family, src_qid, dst_qid, rel_type, source_type, source_file)
+        # The node IDs are the QIDs themselves, so this will match correctly.
+        queue_family(w, src_qid, dst_qid, rel_type, source_type, source_file)
 
-        # Pass 3: Create business roles (if present).
-        for p in persons:
-            qid = p.get("id")
-            if not qid:
-                continue
+    # Pass 3: Create business roles (if present).
+    for p in persons:
+        qid = p.get("id")
+        if not qid:
+            continue
 
-            for rel in p.get("business", []):
-                company_name = rel["company"]
-                cid = get_or_create_company(company_name)
-                s.execute_write(write_company, cid, company_name, source_type, source_file)
-                # The person ID is the QID
-                if qid != cid:
-                    s.execute_write(write_role, qid, cid, rel["role"], rel.get("start"), rel.get("end"), source_type, source_file)
+        for rel in p.get("business", []):
+            company_name = rel["company"]
+            cid = get_or_create_company(company_name)
+            queue_company(w, cid, company_name, source_type, source_file)
+            # The person ID is the QID
+            if qid != cid:
+                queue_role(w, qid, cid, rel["role"], rel.get("start"), rel.get("end"), source_type, source_file)
 
 
 # NOTE: `ingest_mas` in v4 expected a **non‑existent** `relationships` column and would crash.
 # The logic below reverts to the safer behaviour from *load_graph_modified.py* while still using
 # the dedup registry infrastructure.  Any MAS‑specific person‑to‑person edges can be added later.
 
-def ingest_mas(csv_path: Path):
+def ingest_mas(csv_path: Path, w: BatchedGraphWriter):
     if not csv_path.exists():
         print(f"[WARN] {csv_path} missing, skip MAS CSV")
         return
 
     source_type = "MAS_csv"
     source_file = csv_path.name
-    with csv_path.open(newline="", encoding="utf-8-sig") as f, driver.session() as s:
+    with csv_path.open(newline="", encoding="utf-8-sig") as f:
         rdr = csv.DictReader(f)
         for row in rdr:
             pn = row.get("Person Name") or row.get("person name")
@@ -279,106 +439,239 @@ def ingest_mas(csv_path: Path):
                 continue
             pid, pentry = get_or_create_person(pn)
             cid = get_or_create_company(cn)
-            s.execute_write(write_person, pentry, source_type, source_file)
-            s.execute_write(write_company, cid, cn, source_type, source_file)
-            s.execute_write(write_role, pid, cid, role, None, None, source_type, source_file)
+            queue_person(w, pentry, source_type, source_file)
+            queue_company(w, cid, cn, source_type, source_file)
+            queue_role(w, pid, cid, role, None, None, source_type, source_file)
+
+
+# Annual‑report (NER/RED) parser is unchanged apart from the self‑loop guard living in queue_family
+
+def _read_annual_file(path: Path) -> Tuple[str, Optional[List[tuple]], Optional[str]]:
+    """Hash, parse and pre-normalise one NER/RED file → (sha256, docs, error).
+
+    Pure function of the file contents, so it can run in a worker process.
+    """
+    raw = path.read_bytes()
+    digest = sha256_bytes(raw)
+    try:
+        return digest, normalise_docs(json.loads(raw.decode('utf-8'))), None
+    except json.JSONDecodeError as e:
+        return digest, None, f"Error decoding JSON from {path}: {e}"
+    except Exception as e:
+        return digest, None, f"Error reading file {path}: {e}"
 
 
-# Annual‑report (NER/RED) parser is unchanged apart from the self‑loop guard living in write_role
+def ingest_annual(path: Path, w: BatchedGraphWriter, manifest: IngestManifest, workers: int = 1):
+    """Ingest annual reports from a json file (or a directory of them).
 
-def ingest_annual(path: Path):
-    """Ingest annual reports from a json file"""
-    # logging.info(f"Ingesting annual reports from {path}")
-    # connect to the database
-    driver = GraphDatabase.driver(
-        NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+    Files whose content hash is already in *manifest* are skipped; a file is
+    recorded only after its rows have been flushed to the graph.
 
-    # Ingest documents
-    docs = []
+    With *workers* > 1 a process pool reads, parses and slug-normalises files
+    ahead of time, at most `2 * workers` files in flight.  Registry resolution
+    and writing stay on this thread and consume the results in file order, so
+    the graph ends up exactly as with the sequential run.
+    """
     files_to_process = []
     if path.is_dir():
-        files_to_process.extend(path.glob("*.json"))
+        files_to_process.extend(sorted(path.glob("*.json")))
     elif path.is_file():
         files_to_process.append(path)
     else:
         logging.error(f"Path {path} is not a valid file or directory.")
         return
 
-    for file_path in files_to_process:
-        if file_path.name in processed_annual_reports:
-            print(f"[INFO] Skipping already processed annual report: {file_path.name}")
-            continue
-        try:
-            docs = json.loads(file_path.read_text(encoding='utf-8'))
-            process_docs(docs, file_path.name)
-        except json.JSONDecodeError as e:
-            logging.error(f"Error decoding JSON from {file_path}: {e}")
-        except Exception as e:
-            logging.error(f"Error reading file {file_path}: {e}")
-
-def process_docs(docs: List[Dict[str, Any]], source_file: str):
+    pending = [f for f in files_to_process if not manifest.unchanged_by_stat(f)]
+    skipped = len(files_to_process) - len(pending)
+
+    if workers > 1 and len(pending) > 1:
+        pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+        window: Deque[Tuple[Path, concurrent.futures.Future]] = deque()
+        todo = iter(pending)
+
+        def results():
+            for f in itertools.islice(todo, 2 * workers):
+                window.append((f, pool.submit(_read_annual_file, f)))
+            while window:
+                f, fut = window.popleft()
+                nxt = next(todo, None)
+                if nxt is not None:
+                    window.append((nxt, pool.submit(_read_annual_file, nxt)))
+                yield f, fut.result()
+        parsed = results()
+    else:
+        pool = None
+        parsed = ((f, _read_annual_file(f)) for f in pending)
+
+    try:
+        for file_path, (digest, docs, error) in parsed:
+            if manifest.is_current(file_path, digest):
+                manifest.record(file_path, digest)      # touched but identical: refresh size/mtime
+                skipped += 1
+                continue
+            if error:
+                logging.error(error)
+                continue
+            try:
+                process_normalised(docs, file_path.name, w)
+                w.flush()
+                manifest.record(file_path, digest)
+            except Exception as e:
+                logging.error(f"Error loading file {file_path}: {e}")
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    print(f"[INFO] Skipped {skipped} of {len(files_to_process)} annual reports already in the manifest")
+
+
+def normalise_docs(docs: List[Dict[str, Any]]) -> List[tuple]:
+    """Reduce NER/RED docs to what `process_normalised` needs, with slugs precomputed.
+
+    Each doc becomes `(nodes, roles)`:
+        nodes: ("Person", name, slug, mentions) | ("Company", name, slug)
+        roles: (person_name, person_slug, company_name, company_slug, role, start)
+    """
+    out = []
+    for doc in docs:
+        ents = {e["entityId"]: e for e in doc["original"]["entities"]}
+        nodes = []
+        for e in ents.values():
+            if e["type"] == "Person":
+                nodes.append(("Person", e["canonicalName"], slug(e["canonicalName"]), tuple(e.get("mentions", []))))
+            elif e["type"] == "Company":
+                nodes.append(("Company", e["canonicalName"], slug(e["canonicalName"])))
+        roles = []
+        for rel in doc["original"]["relationships"]:
+            src = ents.get(rel["sourceEntityId"])
+            tgt = ents.get(rel["targetEntityId"])
+            if not src or not tgt:
+                continue
+            if src["type"] == "Person" and tgt["type"] == "Company":
+                role = rel["role"]["details"] if rel.get("role") else None
+                roles.append((src["canonicalName"], slug(src["canonicalName"]),
+                              tgt["canonicalName"], slug(tgt["canonicalName"]),
+                              role, rel.get("effectiveDate")))
+        out.append((nodes, roles))
+    return out
+
+
+def process_normalised(docs: List[tuple], source_file: str, w: BatchedGraphWriter):
     source_type = "annual_report"
-    with driver.session() as s:
-        for doc in docs:
-            ents = {e["entityId"]: e for e in doc["original"]["entities"]}
-            # Nodes
-            for e in ents.values():
-                if e["type"] == "Person":
-                    pid, entry = get_or_create_person(e["canonicalName"], canonical=e["canonicalName"], extras=e.get("mentions", []))
-                    s.execute_write(write_person, entry, source_type, source_file)
-                elif e["type"] == "Company":
-                    cid = get_or_create_company(e["canonicalName"])
-                    s.execute_write(write_company, cid, e["canonicalName"], source_type, source_file)
-            # Roles
-            for rel in doc["original"]["relationships"]:
-                src = ents.get(rel["sourceEntityId"])
-                tgt = ents.get(rel["targetEntityId"])
-                if not src or not tgt:
-                    continue
-                if src["type"] == "Person" and tgt["type"] == "Company":
-                    pid, _ = get_or_create_person(src["canonicalName"], canonical=src["canonicalName"])
-                    cid = get_or_create_company(tgt["canonicalName"])
-                    role = rel["role"]["details"] if rel.get("role") else None
-                    start = rel.get("effectiveDate")
-                    if pid != cid:
-                        s.execute_write(write_role, pid, cid, role, start, None, source_type, source_file)
+    for nodes, roles in docs:
+        pids: Dict[str, str] = {}           # canonical name → pid resolved (and queued) in the node pass
+        # Nodes
+        for node in nodes:
+            if node[0] == "Person":
+                _, name, key, mentions = node
+                pid, entry = get_or_create_person(name, canonical=name, extras=list(mentions), key=key)
+                queue_person(w, entry, source_type, source_file)
+                pids[name] = pid
+            else:
+                _, name, key = node
+                cid = get_or_create_company(name, key=key)
+                queue_company(w, cid, name, source_type, source_file)
+        # Roles
+        for pname, pkey, cname, ckey, role, start in roles:
+            pid = pids.get(pname)
+            if pid is None:
+                pid, entry = get_or_create_person(pname, canonical=pname, key=pkey)
+                queue_person(w, entry, source_type, source_file)
+                pids[pname] = pid
+            cid = get_or_create_company(cname, key=ckey)
+            if pid != cid:
+                queue_role(w, pid, cid, role, start, None, source_type, source_file)
 
 # ───────────────────────── Pre-load Registry ──────────────────────────
 
-def preload_registries():
-    """Pre-load existing Person and Company data from Neo4j for fuzzy matching."""
-    print("[INFO] Pre-loading existing entities from Neo4j...")
-    with driver.session() as s:
-        # Pre-load persons
-        person_records = s.run("MATCH (p:Person) RETURN p.id, p.name, p.aliases, p.qid")
-        for rec in person_records:
-            pid, name, aliases, qid = rec.values()
-            s_name = slug(name)
-            entry = {"id": pid, "canonical": name, "aliases": set(aliases or []), "qid": qid}
-            person_registry[s_name] = entry
-            if qid:
-                qid_registry[qid] = s_name
-
-        # Pre-load companies
-        company_records = s.run("MATCH (c:Company) RETURN c.id, c.name")
-        for rec in company_records:
-            cid, name = rec.values()
-            company_registry[slug(name)] = cid
-
-        # Pre-load processed annual report filenames
-        report_files_records = s.run("""
-            MATCH (n) WHERE n.reference_type = 'annual_report'
-            RETURN DISTINCT n.reference_file AS file
-            UNION
-            MATCH ()-[r]-() WHERE r.reference_type = 'annual_report'
-            RETURN DISTINCT r.reference_file AS file
-        """)
-        for rec in report_files_records:
-            if rec["file"]:
-                processed_annual_reports.add(rec["file"])
-
-    print(f"[INFO] Pre-loaded {len(person_registry)} persons and {len(company_registry)} companies.")
-    print(f"[INFO] Found {len(processed_annual_reports)} previously processed annual reports.")
+PRELOAD_PERSONS = """
+MATCH (p:Person) WHERE $since IS NULL OR p.updated > $since
+RETURN p.id AS id, p.name AS name, p.aliases AS aliases, coalesce(p.wikidata_qid, p.qid) AS qid,
+       toString(p.updated) AS stamp
+"""
+
+PRELOAD_COMPANIES = """
+MATCH (c:Company) WHERE $since IS NULL OR c.lastUpdated > datetime($since)
+RETURN c.id AS id, c.name AS name, toString(c.lastUpdated) AS stamp
+"""
+
+def _load_person(pid: str, name: str, aliases, qid: Optional[str], by_id: Dict[str, PersonEntry]) -> PersonEntry:
+    """Register (or refresh in place) a person coming from the snapshot or the graph."""
+    entry = by_id.get(pid)
+    if entry is None:
+        entry = by_id[pid] = _new_person(pid, name, aliases or (), qid)
+    else:
+        fresh = _new_person(pid, name, aliases or (), qid)
+        entry.canonical, entry.aliases, entry.qid = fresh.canonical, fresh.aliases, fresh.qid
+    _register_person(_person_key(name, slug(name)), entry)
+    write_cache.seed("person", pid, person_row(entry, "", ""))
+    return entry
+
+
+def preload_registries(snapshot: RegistrySnapshot, full_resync: bool = False, offline: bool = False):
+    """Pre-load Person and Company data for fuzzy matching.
+
+    The local snapshot is loaded first; only nodes whose `updated` / `lastUpdated`
+    is newer than the snapshot's watermark are then fetched from Neo4j
+    (skipped when *offline*).
+    """
+    if full_resync:
+        snapshot.reset()
+    p_since, c_since = snapshot.watermark("Person"), snapshot.watermark("Company")
+
+    by_id: Dict[str, PersonEntry] = {}
+    for pid, _, name, aliases, qid in snapshot.persons():
+        _load_person(pid, name, aliases, qid, by_id)
+    for cid, s_name, name in snapshot.companies():
+        _register_company(s_name, cid, name)
+        write_cache.seed("company", cid, company_row(cid, name, "", ""))
+    key_of = {cid: k for k, cid in company_registry.items()}
+    for s_alias, cid in snapshot.company_aliases():   # names merged away by resolve_entities.py
+        if cid in key_of and s_alias not in company_registry:
+            company_alias_index[s_alias] = key_of[cid]
+    print(f"[INFO] Snapshot {snapshot.path.name}: {len(person_registry)} persons, {len(company_registry)} companies "
+          f"(watermarks Person={p_since}, Company={c_since})")
+    if offline:
+        return
+
+    print("[INFO] Fetching entities changed since the snapshot from Neo4j...")
+    n_persons = n_companies = 0
+    p_mark, c_mark = p_since, c_since
+    with get_driver().session() as s:
+        fresh_persons = []
+        for rec in s.run(PRELOAD_PERSONS, since=p_since):
+            if not rec["name"]:
+                continue
+            entry = _load_person(rec["id"], rec["name"], rec["aliases"], rec["qid"], by_id)
+            fresh_persons.append((entry.id, slug(entry.canonical), entry.canonical, entry.aliases, entry.qid))
+            p_mark = max(filter(None, (p_mark, rec["stamp"])), default=None)
+        n_persons = len(fresh_persons)
+        snapshot.put_persons(fresh_persons)
+
+        fresh_companies = []
+        for rec in s.run(PRELOAD_COMPANIES, since=c_since):
+            if not rec["name"]:
+                continue
+            cid, name = rec["id"], rec["name"]
+            _register_company(slug(name), cid, name, refresh=True)
+            write_cache.seed("company", cid, company_row(cid, name, "", ""))
+            fresh_companies.append((cid, slug(name), name))
+            c_mark = max(filter(None, (c_mark, rec["stamp"])), default=None)
+        n_companies = len(fresh_companies)
+        snapshot.put_companies(fresh_companies)
+
+    snapshot.set_watermark("Person", p_mark)
+    snapshot.set_watermark("Company", c_mark)
+
+    print(f"[INFO] Pre-loaded {len(person_registry)} persons and {len(company_registry)} companies "
+          f"({n_persons} persons / {n_companies} companies fetched from Neo4j).")
+
+
+def save_registries(snapshot: RegistrySnapshot):
+    """Write the in-memory registries back to the snapshot: pre-loaded entities and
+    those this run wrote — an entity resolved but never written is not in the graph."""
+    snapshot.put_persons((e.id, k, e.canonical, e.aliases, e.qid) for k, e in person_registry.items()
+                         if write_cache.known("person", e.id))
+    snapshot.put_companies(row for row in company_registry.rows() if write_cache.known("company", row[0]))
 
 # ───────────────────────────── Entrypoint ─────────────────────────────
 
@@ -388,20 +681,148 @@ def main():
     ap.add_argument("--wikidata_json", default="C:/Users/22601/Downloads/downloads/wikiData/data.json", help="Simplified Wikidata JSON")
     ap.add_argument("--mas_csv", default="G:/My Drive/NUS MSBA SEM2/UOB/MAS/MAS_Personnel_merged.csv", help="MAS personnel merged CSV")
     ap.add_argument("--annual_json", default="C:/Users/22601/Downloads/downloads/files/NER_RED", help="Annual‑report NER/RED JSON (authoritative)")
+    ap.add_argument("--batch-size", type=int, default=500, help="Rows per UNWIND transaction (default 500)")
+    ap.add_argument("--flush-interval", type=float, default=5.0, help="Max seconds rows stay buffered before a flush (default 5)")
+    ap.add_argument("--fixed-batch", action="store_true", help="Disable adaptive batch sizing / split-and-retry for Neo4j writes")
+    ap.add_argument("--target-latency", type=float, default=2.0, help="Commit latency the adaptive batch size aims for (seconds)")
+    ap.add_argument("--edge-sessions", type=int, default=1,
+                    help="Write HAS_ROLE_AT / FAMILY edges on this many sessions, partitioned so they cannot deadlock (default 1)")
+    ap.add_argument("--registry-db", type=Path, default=Path(__file__).with_name("registry_snapshot.sqlite"), help="Local registry snapshot (SQLite)")
+    ap.add_argument("--full-resync", action="store_true", help="Ignore the snapshot and edge fingerprints; re-read every Person/Company from Neo4j")
+    ap.add_argument("--manifest", type=Path, default=Path(__file__).with_name("ingest_manifest.sqlite"), help="Processed annual-report manifest (SQLite)")
+    ap.add_argument("--edge-fingerprints", type=Path, default=Path(__file__).with_name("edge_fingerprints.sqlite"),
+                    help="Hashes of the edge properties last written; unchanged edges are not rewritten (SQLite)")
+    ap.add_argument("--workers", type=int, default=1, help="Processes parsing annual-report JSON ahead of the resolver (default 1 = sequential)")
+    ap.add_argument("--sink", choices=("neo4j", "memory", "jsonl"), default="neo4j",
+                    help="Write to Neo4j, to an in-memory graph (no database), or to a JSONL change log")
+    ap.add_argument("--sink-path", type=Path, default=Path("graph_changes.jsonl"), help="Change log for --sink jsonl")
+    ap.add_argument("--replay", type=Path, help="Replay a JSONL change log into Neo4j and exit")
+    ap.add_argument("--export-bulk", type=Path, metavar="DIR",
+                    help="Cold rebuild: run every ingester in memory and write neo4j-admin / LOAD CSV files to DIR")
+    ap.add_argument("--profile", action="store_true",
+                    help="Run every ingester, PROFILE each MERGE statement on sample rows (rolled back), "
+                         "check id constraints, write a report")
+    ap.add_argument("--profile-sample", type=int, default=200, help="Rows per statement for --profile (default 200)")
+    ap.add_argument("--profile-report", type=Path, default=Path("write_profile.md"), help="Report written by --profile")
+    ap.add_argument("--plan", type=Path, metavar="FILE",
+                    help="Dry run: resolve the annual reports not yet in the manifest (like a normal load, the "
+                         "annual reports only — not --mas_csv / --wikidata_json / --neo4j_export) against the "
+                         "registry snapshot, summarise the change set and write it to FILE (e.g. plan.jsonl.gz) "
+                         "without connecting to Neo4j")
+    ap.add_argument("--apply-plan", type=Path, metavar="FILE", help="Write a change set produced by --plan to Neo4j and exit")
     args = ap.parse_args()
+    if args.plan and args.full_resync:
+        ap.error("--plan works against the existing snapshot; it cannot be combined with --full-resync")
+
+    if args.replay or args.apply_plan:
+        log = args.apply_plan or args.replay
+        with Neo4jSink(get_driver(), UNWIND_STATEMENTS, driver_retries=args.fixed_batch) as sink:
+            if args.fixed_batch:
+                replay(log, sink, args.batch_size, skip=(MANIFEST_KIND,))
+            else:
+                controller = WriteController(initial=args.batch_size, target_latency=args.target_latency)
+                replay(log, sink, controller=controller, skip=(MANIFEST_KIND,))
+                print(controller.report())
+        if args.apply_plan:
+            # The planned rows are now in the graph: later loads and plans should start from them.
+            with contextlib.closing(EdgeFingerprints(args.edge_fingerprints)) as fingerprints, \
+                    contextlib.closing(RegistrySnapshot(args.registry_db)) as snapshot, \
+                    contextlib.closing(IngestManifest(args.manifest, LOADER_VERSION)) as manifest:
+                persons, companies, files = {}, {}, []
+                for kind, row in read_log(log):
+                    if kind == "person":
+                        persons[row["id"]] = (row["id"], slug(row["name"]), row["name"], row["alias"], row["qid"])
+                    elif kind == "company":
+                        companies[row["id"]] = (row["id"], slug(row["name"]), row["name"])
+                    elif kind == MANIFEST_KIND:
+                        files.append((row["filename"], row["sha256"], row["size"], row["mtime"]))
+                    else:
+                        fingerprints.record(kind, [row])
+                snapshot.put_persons(persons.values())
+                snapshot.put_companies(companies.values())
+                fingerprints.save()
+                for entry in files:
+                    manifest.put(entry)
+                print(f"[INFO] Recorded {len(files)} planned annual reports in {args.manifest}")
+        get_driver().close()
+        return
 
-    preload_registries()
-
-    # if args.neo4j_export:
-    #     ingest_neo4j_query(Path(args.neo4j_export))
-    # if args.wikidata_json:
-    #     ingest_wikidata(Path(args.wikidata_json))
-    if args.annual_json:
-        ingest_annual(Path(args.annual_json))
-    # if args.mas_csv:
-    #     ingest_mas(Path(args.mas_csv))
-
-    driver.close()
+    # Offline sinks never touch Aura, and leave the snapshot and manifest
+    # alone: nothing they produce is in the graph yet.
+    online = args.sink == "neo4j" and not (args.export_bulk or args.profile or args.plan)
+    snapshot = RegistrySnapshot(args.registry_db)
+    preload_registries(snapshot, args.full_resync, offline=not online)
+    controller = fingerprints = None
+    if args.plan:
+        fingerprints = EdgeFingerprints(args.edge_fingerprints, readonly=True)
+        sink = PlanSink(args.plan, {e.id: e.aliases for e in person_registry.values()},
+                        {cid for _, cid in company_registry.items()}, fingerprints)
+    elif online:
+        fingerprints = EdgeFingerprints(args.edge_fingerprints)
+        if args.full_resync:
+            fingerprints.reset()
+        sink: GraphSink = Neo4jSink(get_driver(), UNWIND_STATEMENTS, driver_retries=args.fixed_batch)
+        if not args.fixed_batch:
+            controller = WriteController(initial=args.batch_size, target_latency=args.target_latency)
+        if args.edge_sessions > 1:
+            # Edge transactions run concurrently and commit at their own pace: they get their own controller.
+            edge_controller = None if args.fixed_batch else \
+                WriteController(initial=args.batch_size, target_latency=args.target_latency)
+            sink = ParallelEdgeSink(sink, get_driver(), UNWIND_STATEMENTS, sessions=args.edge_sessions,
+                                    batch_size=args.batch_size, controller=edge_controller)
+    elif args.profile:
+        sink = SampleSink(args.profile_sample)
+        write_cache.forget()            # sample node rows too, not only changed ones
+    elif args.sink == "memory" or args.export_bulk:
+        sink = MemoryGraphSink()
+        write_cache.forget()            # the in-memory graph starts empty
+    else:
+        sink = JsonlSink(args.sink_path)
+
+    # The bulk export is a full rebuild and the profile covers every write statement,
+    # so both run every source; a normal load only ingests the annual reports.
+    all_sources = bool(args.export_bulk or args.profile)
+    with BatchedGraphWriter(sink, WRITE_KINDS, args.batch_size, args.flush_interval, write_cache, controller,
+                            fingerprints) as w:
+        if args.neo4j_export and all_sources:
+            ingest_neo4j_query(Path(args.neo4j_export), w)
+        if args.wikidata_json and all_sources:
+            ingest_wikidata(Path(args.wikidata_json), w)
+        if args.annual_json:
+            # A plan skips what is already loaded, but leaves recording its files to --apply-plan.
+            manifest_path = args.manifest if online or args.plan else Path(":memory:")
+            with contextlib.closing(IngestManifest(manifest_path, LOADER_VERSION, readonly=bool(args.plan))) as manifest:
+                ingest_annual(Path(args.annual_json), w, manifest, args.workers)
+                if args.plan:
+                    sink.record_files(manifest.recorded)
+        if args.mas_csv and all_sources:
+            ingest_mas(Path(args.mas_csv), w)
+    print(w.report())
+    if controller is not None:
+        print(controller.report())
+    if isinstance(sink, ParallelEdgeSink):
+        print(sink.report())
+        if sink.controller is not None:
+            print(sink.controller.report("Edge write controller"))
+    print(resolution_report())
+    if isinstance(sink, MemoryGraphSink):
+        print(sink.summary())
+    if args.plan:
+        print(sink.summary(w.cache.clean))
+        fingerprints.close()
+    if args.profile:
+        print(run_profile(get_driver(), UNWIND_STATEMENTS, sink, WRITE_KINDS, args.profile_report))
+        get_driver().close()
+    if args.export_bulk:
+        counts = write_bulk(sink, args.export_bulk)
+        print(f"[✓] Bulk import files written to {args.export_bulk}: "
+              + ", ".join(f"{name}={n}" for name, n in counts.items()))
+
+    if online:
+        save_registries(snapshot)
+        fingerprints.close()
+        get_driver().close()
+    snapshot.close()
     print("[✓] Graph load complete")
 
 
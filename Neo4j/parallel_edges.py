@@ -0,0 +1,173 @@
+"""parallel_edges.py — deadlock-free concurrent writes of relationship batches
+
+`MERGE (a)-[r]->(b)` locks both endpoints, so two transactions whose edges
+share nodes can deadlock when run side by side — the reason the loader used a
+single session.  `ParallelEdgeSink` schedules edges so that concurrent
+transactions never share an endpoint ("mix and batch"):
+
+* every node id is hashed into one of `buckets` partitions; an edge belongs to
+  the cell (bucket of start node, bucket of end node);
+* cells are grouped into rounds in which no two cells use the same partition
+  of the same label — so no node can appear in two concurrently running cells;
+* rounds run one after the other; the cells of a round run on `sessions`
+  threads, each with its own session, one batch per transaction.
+
+For edges between different labels (HAS_ROLE_AT: Person → Company) round `k`
+holds the cells (i, i+k mod P).  For Person → Person edges (FAMILY) a cell is
+keyed on its unordered bucket pair, and rounds are a round-robin
+(circle-method) pairing of the partitions plus one round for the diagonal.
+
+Rows of the same edge always land in the same cell and keep their original
+order, so the statements' `SET` / `coalesce` semantics are unchanged.
+
+With a *controller* (write_controller.py, shared by the session threads) each
+cell's transactions are sized by it — AIMD on their real commit latency, and
+transient failures (deadlocks included) split and retried — and run through
+`run_in_transaction`, without driver retries.  Without one, cells are cut into
+`batch_size` rows and transient errors that escape the driver's own retries
+are retried `max_retries` times with backoff.
+
+Node kinds pass straight through to the wrapped sink; edge rows are buffered
+(`self_batching`) until `buffer_rows` accumulate or the writer calls `flush()`
+/ `close()`, which also guarantees that the nodes they `MATCH` were committed
+first.  `flush()` returns only once every buffered edge is committed.  Rows
+are taken out of the buffer as their flush starts; if it fails they are not
+retried here — the writer has not fingerprinted them, and the file they came
+from is not recorded as ingested, so the next run writes them again.
+"""
+
+from __future__ import annotations
+
+import random
+import threading
+import time
+import zlib
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from graph_sink import GraphSink, Row
+from write_controller import WriteController, is_transient, run_in_transaction
+
+# kind → (start-id field, end-id field, both endpoints share a label)
+EDGE_ENDPOINTS = {"role": ("pid", "cid", False), "family": ("src", "dst", True)}
+
+
+def _bucket(node_id: str, buckets: int) -> int:
+    return zlib.crc32(node_id.encode("utf-8")) % buckets
+
+
+def round_robin(n: int) -> List[List[Tuple[int, int]]]:
+    """Rounds of disjoint unordered pairs covering every pair of `range(n)` once (circle method)."""
+    ids = list(range(n)) + ([None] if n % 2 else [])
+    m = len(ids)
+    rounds = []
+    for _ in range(m - 1):
+        pairs = [(ids[i], ids[m - 1 - i]) for i in range(m // 2)]
+        rounds.append([(min(a, b), max(a, b)) for a, b in pairs if a is not None and b is not None])
+        ids = [ids[0], ids[-1], *ids[1:-1]]
+    return rounds
+
+
+def schedule(kind: str, rows: Sequence[Row], buckets: int) -> List[List[List[Row]]]:
+    """Rounds → cells → rows; cells within a round share no endpoint partition."""
+    start, end, same_label = EDGE_ENDPOINTS[kind]
+    cells: Dict[Tuple[int, int], List[Row]] = defaultdict(list)
+    for row in rows:
+        a, b = _bucket(row[start], buckets), _bucket(row[end], buckets)
+        cells[(min(a, b), max(a, b)) if same_label else (a, b)].append(row)
+
+    if same_label:
+        layout = [[(i, i) for i in range(buckets)]] + round_robin(buckets)
+    else:
+        layout = [[(i, (i + k) % buckets) for i in range(buckets)] for k in range(buckets)]
+    rounds = [[cells[c] for c in cell_keys if cells.get(c)] for cell_keys in layout]
+    return [r for r in rounds if r]
+
+
+class ParallelEdgeSink(GraphSink):
+    def __init__(self, base: GraphSink, driver, statements: Dict[str, str], kinds: Sequence[str] = ("role", "family"),
+                 sessions: int = 4, batch_size: int = 500, buffer_rows: int = 50_000, max_retries: int = 5,
+                 controller: Optional[WriteController] = None):
+        self.base = base
+        self.driver = driver
+        self.statements = statements
+        self.kinds = self.self_batching = tuple(kinds)
+        self.sessions = sessions
+        self.buckets = 2 * sessions
+        self.batch_size = batch_size
+        self.buffer_rows = buffer_rows
+        self.max_retries = max_retries
+        self.controller = controller
+        self._buffer: Dict[str, List[Row]] = {k: [] for k in self.kinds}
+        self._lock = threading.Lock()
+        self.rows = 0
+        self.rounds = 0
+        self.transactions = 0
+        self.retries = 0
+        self.seconds = 0.0
+
+    def write(self, kind: str, rows: List[Row]) -> None:
+        if kind not in self._buffer:
+            self.base.write(kind, rows)
+            return
+        self._buffer[kind].extend(rows)
+        if sum(len(b) for b in self._buffer.values()) >= self.buffer_rows:
+            self.flush_edges()
+
+    def flush(self) -> None:
+        self.flush_edges()
+        self.base.flush()
+
+    def flush_edges(self) -> None:
+        if not any(self._buffer.values()):
+            return
+        t0 = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.sessions) as pool:
+            for kind in self.kinds:
+                rows, self._buffer[kind] = self._buffer[kind], []
+                for cells in schedule(kind, rows, self.buckets):
+                    # Barrier per round: every cell of this round commits before the next round starts.
+                    list(pool.map(lambda cell: self._write_cell(kind, cell), cells))
+                    self.rounds += 1
+                self.rows += len(rows)
+        self.seconds += time.monotonic() - t0
+
+    def _write_cell(self, kind: str, rows: List[Row]) -> None:
+        start, end, _ = EDGE_ENDPOINTS[kind]
+        rows = sorted(rows, key=lambda r: min(r[start], r[end]))     # stable: same-edge rows keep their order
+        cypher = self.statements[kind]
+        with self.driver.session() as session:
+            if self.controller is not None:
+                self.controller.run(rows, lambda batch: self._commit(session, cypher, batch))
+                return
+            for i in range(0, len(rows), self.batch_size):
+                batch = rows[i:i + self.batch_size]
+                for attempt in range(self.max_retries + 1):
+                    try:
+                        session.execute_write(lambda tx: tx.run(cypher, rows=batch).consume())
+                        break
+                    except Exception as exc:
+                        if not is_transient(exc) or attempt == self.max_retries:
+                            raise
+                        with self._lock:
+                            self.retries += 1
+                        time.sleep(0.2 * 2 ** attempt * random.uniform(0.5, 1.0))
+                with self._lock:
+                    self.transactions += 1
+
+    def _commit(self, session, cypher: str, batch: Sequence[Row]) -> None:
+        run_in_transaction(session, lambda tx: tx.run(cypher, rows=list(batch)).consume())
+        with self._lock:
+            self.transactions += 1
+
+    def close(self) -> None:
+        try:
+            self.flush_edges()
+        finally:
+            self.base.close()
+
+    def report(self) -> str:
+        return (f"[INFO] Parallel edges: {self.rows} rows in {self.transactions} transactions over {self.rounds} rounds "
+                f"on {self.sessions} sessions ({self.rows / max(self.seconds, 1e-9):,.0f} rows/s); "
+                f"{self.retries} transient retries")
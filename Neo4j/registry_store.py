@@ -0,0 +1,145 @@
+"""registry_store.py — on-disk snapshot of the loader registries (SQLite)
+
+`preload_registries` used to pull every `Person` / `Company` node from Aura on
+every run.  The snapshot keeps the last known registry state locally together
+with a per-label watermark: the highest `Person.updated` / `Company.lastUpdated`
+seen so far.  A run then only fetches nodes whose timestamp is past the
+watermark and writes its own additions back when it finishes.
+
+Rows keep their first-insert `rowid`, and `persons()` / `companies()` return
+them in that order, so the registries (and therefore first-match fuzzy
+resolution) are rebuilt in the same order they were originally filled.
+
+Companies have no alias list in the graph, so names merged into a survivor by
+`resolve_entities.py` are kept in `company_aliases` (slug → surviving id) and
+loaded into the loader's `company_alias_index`.
+"""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS persons (
+    id        TEXT PRIMARY KEY,
+    slug      TEXT NOT NULL,
+    canonical TEXT NOT NULL,
+    aliases   TEXT NOT NULL,          -- JSON list
+    qid       TEXT
+);
+CREATE TABLE IF NOT EXISTS companies (
+    id   TEXT PRIMARY KEY,
+    slug TEXT NOT NULL,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS company_aliases (
+    slug TEXT PRIMARY KEY,            -- slug of a company merged away by resolve_entities.py
+    id   TEXT NOT NULL                -- the surviving company
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+PersonRow = Tuple[str, str, str, list, Optional[str]]   # id, slug, canonical, aliases, qid
+CompanyRow = Tuple[str, str, str]                        # id, slug, name
+
+
+class RegistrySnapshot:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.db = sqlite3.connect(self.path)
+        self.db.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.db.close()
+
+    def __enter__(self) -> "RegistrySnapshot":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def reset(self) -> None:
+        """Drop everything (used by `--full-resync`)."""
+        with self.db:
+            for table in ("persons", "companies", "company_aliases", "meta"):
+                self.db.execute(f"DELETE FROM {table}")
+
+    # ---------------- watermarks ----------------
+    def watermark(self, label: str) -> Optional[str]:
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (f"watermark:{label}",)).fetchone()
+        return row[0] if row else None
+
+    def set_watermark(self, label: str, value: Optional[str]) -> None:
+        if value is None:
+            return
+        with self.db:
+            self.db.execute(
+                "INSERT INTO meta(key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value WHERE excluded.value > meta.value",
+                (f"watermark:{label}", value),
+            )
+
+    # ---------------- rows ----------------
+    def persons(self) -> Iterator[PersonRow]:
+        for pid, s, canonical, aliases, qid in self.db.execute(
+                "SELECT id, slug, canonical, aliases, qid FROM persons ORDER BY rowid"):
+            yield pid, s, canonical, json.loads(aliases), qid
+
+    def companies(self) -> Iterator[CompanyRow]:
+        yield from self.db.execute("SELECT id, slug, name FROM companies ORDER BY rowid")
+
+    def company_aliases(self) -> Iterator[Tuple[str, str]]:
+        yield from self.db.execute("SELECT slug, id FROM company_aliases ORDER BY rowid")
+
+    def put_persons(self, rows: Iterable[PersonRow]) -> None:
+        # ON CONFLICT … DO UPDATE keeps the original rowid (INSERT OR REPLACE would not).
+        with self.db:
+            self.db.executemany(
+                "INSERT INTO persons(id, slug, canonical, aliases, qid) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET slug = excluded.slug, canonical = excluded.canonical, "
+                "aliases = excluded.aliases, qid = excluded.qid",
+                ((pid, s, c, json.dumps(sorted(a), ensure_ascii=False), q) for pid, s, c, a, q in rows),
+            )
+
+    def put_companies(self, rows: Iterable[CompanyRow]) -> None:
+        with self.db:
+            self.db.executemany(
+                "INSERT INTO companies(id, slug, name) VALUES (?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET slug = excluded.slug, name = excluded.name",
+                rows,
+            )
+
+    def apply_merges(self, plan: dict) -> None:
+        """Reflect a `resolve_entities.py` merge plan: drop merged ids, fold their names into survivors
+        (person aliases; `company_aliases` rows for companies)."""
+        with self.db:
+            for cluster in plan.get("persons", []):
+                row = self.db.execute("SELECT aliases, canonical FROM persons WHERE id = ?", (cluster["keep"],)).fetchone()
+                if row is not None:
+                    aliases = set(json.loads(row[0]))
+                    for dup in cluster["merge"]:
+                        d = self.db.execute("SELECT canonical, aliases FROM persons WHERE id = ?", (dup,)).fetchone()
+                        if d is not None:
+                            aliases.update([d[0], *json.loads(d[1])])
+                    aliases.discard(row[1])
+                    self.db.execute("UPDATE persons SET aliases = ? WHERE id = ?",
+                                    (json.dumps(sorted(aliases), ensure_ascii=False), cluster["keep"]))
+                self.db.executemany("DELETE FROM persons WHERE id = ?", ((d,) for d in cluster["merge"]))
+            for cluster in plan.get("companies", []):
+                keep, merged = cluster["keep"], cluster["merge"]
+                keep_slug = self.db.execute("SELECT slug FROM companies WHERE id = ?", (keep,)).fetchone()
+                for dup in merged:
+                    d = self.db.execute("SELECT slug FROM companies WHERE id = ?", (dup,)).fetchone()
+                    if d is not None and (keep_slug is None or d[0] != keep_slug[0]):
+                        self.db.execute(
+                            "INSERT INTO company_aliases(slug, id) VALUES (?, ?) "
+                            "ON CONFLICT(slug) DO UPDATE SET id = excluded.id", (d[0], keep))
+                    # Aliases of a company merged earlier follow it to the new survivor.
+                    self.db.execute("UPDATE company_aliases SET id = ? WHERE id = ?", (keep, dup))
+                self.db.executemany("DELETE FROM companies WHERE id = ?", ((d,) for d in merged))
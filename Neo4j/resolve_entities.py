@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""resolve_entities.py — offline batch entity resolution over the registry snapshot
+
+`get_or_create_person` resolves greedily at insert time: a name attaches to the
+first registry key that passes `FUZZ_THRESHOLD`, so the outcome depends on
+ingest order and two clusters that a later mention bridges are never merged.
+This script re-resolves the whole registry in one pass:
+
+1. load every person / company with its aliases from the local registry
+   snapshot (`registry_snapshot.sqlite`, see registry_store.py);
+2. block names on their slug tokens (oversized blocks are cut into
+   overlapping length-sorted windows);
+3. score each block with rapidfuzz's vectorised `cdist` (multi-threaded);
+4. cluster with union-find — never joining two different Wikidata QIDs;
+5. write a merge plan (JSON) that `apply` replays against Neo4j in UNWIND
+   batches, re-pointing edges to the surviving node and deleting duplicates.
+
+Usage
+-----
+    python resolve_entities.py plan  --out merge_plan.json [--workers -1]
+    python resolve_entities.py apply merge_plan.json [--batch-size 200]
+"""
+
+import argparse, json
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from rapidfuzz import distance
+from rapidfuzz.fuzz import token_set_ratio
+from rapidfuzz.process import cdist
+
+from load_graph_v_5 import FUZZ_THRESHOLD, LEV_DIST, get_driver, slug
+from registry_store import RegistrySnapshot
+
+# Tokens too common to say anything about identity; they never form a block.
+STOP_TOKENS = {"pte", "ltd", "limited", "inc", "llp", "bhd", "corp", "corporation", "co", "the", "and",
+               "of", "group", "holdings", "mr", "mrs", "ms", "dr", "madam"}
+
+
+# ───────────────────────────── Union-find ─────────────────────────────
+
+class UnionFind:
+    """Union-find with path halving; refuses to join two sets holding different QIDs."""
+
+    def __init__(self, qids: Sequence[Optional[str]]):
+        self.parent = list(range(len(qids)))
+        self.qid = list(qids)
+        self.conflicts = set()          # QID pairs a match tried to join
+
+    def find(self, x: int) -> int:
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a: int, b: int) -> None:
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return
+        qa, qb = self.qid[ra], self.qid[rb]
+        if qa and qb and qa != qb:
+            self.conflicts.add((min(qa, qb), max(qa, qb)))
+            return
+        if rb < ra:
+            ra, rb = rb, ra             # lowest index (earliest registry entry) stays root
+        self.parent[rb] = ra
+        self.qid[ra] = qa or qb
+
+    def clusters(self) -> List[List[int]]:
+        groups: Dict[int, List[int]] = defaultdict(list)
+        for i in range(len(self.parent)):
+            groups[self.find(i)].append(i)
+        return [g for g in groups.values() if len(g) > 1]
+
+
+# ───────────────────────────── Blocking / scoring ─────────────────────────────
+
+def blocks(names: Sequence[str], max_block: int) -> Iterable[List[int]]:
+    """Candidate blocks of name indices sharing a slug token.
+
+    A block larger than *max_block* is sorted by length and cut into windows
+    overlapping by half — names that can pass the ratio threshold have nearly
+    equal lengths, so they land in a common window.
+    """
+    by_token: Dict[str, List[int]] = defaultdict(list)
+    for i, n in enumerate(names):
+        for tok in set(n.split("_")):
+            if len(tok) >= 2 and tok not in STOP_TOKENS:
+                by_token[tok].append(i)
+    step = max(max_block // 2, 1)
+    for members in by_token.values():
+        if len(members) < 2:
+            continue
+        if len(members) <= max_block:
+            yield members
+            continue
+        members = sorted(members, key=lambda i: len(names[i]))
+        for start in range(0, len(members) - step, step):
+            yield members[start:start + max_block]
+
+
+def score_pairs(names: Sequence[str], owner: Sequence[int], is_canonical: Sequence[bool],
+                use_levenshtein: bool, max_block: int, workers: int) -> Iterable[Tuple[int, int]]:
+    """Yield (entity_a, entity_b) pairs whose names match like the loader's matcher.
+
+    Rows of each block are the canonical names only, so an entity is linked
+    through its own name, never through an alias-to-alias coincidence.
+    """
+    for members in blocks(names, max_block):
+        rows = [i for i in members if is_canonical[i]]
+        if not rows:
+            continue
+        q = [names[i] for i in rows]
+        c = [names[i] for i in members]
+        hit = cdist(q, c, scorer=token_set_ratio, score_cutoff=FUZZ_THRESHOLD, workers=workers) >= FUZZ_THRESHOLD
+        if use_levenshtein:
+            lev = cdist(q, c, scorer=distance.Levenshtein.distance, score_cutoff=LEV_DIST, dtype=np.int32, workers=workers)
+            hit |= lev <= LEV_DIST
+        for r, col in zip(*np.nonzero(hit)):
+            a, b = owner[rows[r]], owner[members[col]]
+            if a != b:
+                yield a, b
+
+
+def resolve(entities: List[dict], use_levenshtein: bool, max_block: int, workers: int,
+            min_alias_tokens: int) -> Tuple[List[List[int]], UnionFind]:
+    names: List[str] = []
+    owner: List[int] = []
+    is_canonical: List[bool] = []
+    for idx, e in enumerate(entities):
+        seen = set()
+        for n, canonical in [(e["canonical"], True)] + [(a, False) for a in e.get("aliases", ())]:
+            s = slug(n)
+            if not s or s in seen:
+                continue
+            if not canonical and len(s.split("_")) < min_alias_tokens:
+                continue                 # initials / bare surnames link unrelated people
+            seen.add(s)
+            names.append(s)
+            owner.append(idx)
+            is_canonical.append(canonical)
+
+    uf = UnionFind([e.get("qid") for e in entities])
+    for a, b in score_pairs(names, owner, is_canonical, use_levenshtein, max_block, workers):
+        uf.union(a, b)
+    return uf.clusters(), uf
+
+
+def _plan_for(entities: List[dict], clusters: List[List[int]]) -> List[dict]:
+    plan = []
+    for members in clusters:
+        # Survivor: the QID-bearing node if any, else the earliest registry entry.
+        keep = next((i for i in members if entities[i].get("qid")), members[0])
+        plan.append({
+            "keep": entities[keep]["id"],
+            "name": entities[keep]["canonical"],
+            "merge": [entities[i]["id"] for i in members if i != keep],
+            "names": sorted({entities[i]["canonical"] for i in members if i != keep}),
+        })
+    return plan
+
+
+# ───────────────────────────── Apply ─────────────────────────────
+
+DEDUP = "reduce(acc = [], x IN {list} | CASE WHEN x IS NULL OR x IN acc THEN acc ELSE acc + x END)"
+
+# Edges moved onto the survivor take the duplicate's properties only where the
+# survivor's own edge (if it already had one) lacks them: `n += kept` restores
+# its source / year / reference_file after the duplicate's are copied in.
+MERGE_PERSONS = """
+UNWIND $rows AS row
+MATCH (keep:Person {id: row.keep})
+MATCH (dup:Person {id: row.dup})
+CALL {
+    WITH keep, dup
+    MATCH (dup)-[r:HAS_ROLE_AT]->(c:Company)
+    MERGE (keep)-[n:HAS_ROLE_AT {role: r.role}]->(c)
+    WITH r, n, properties(n) AS kept
+    SET n += properties(r)
+    SET n += kept
+    DELETE r
+}
+CALL {
+    WITH keep, dup
+    MATCH (dup)-[r:FAMILY]->(o:Person) WHERE o <> keep
+    MERGE (keep)-[n:FAMILY {relation: r.relation}]->(o)
+    WITH r, n, properties(n) AS kept
+    SET n += properties(r)
+    SET n += kept
+    DELETE r
+}
+CALL {
+    WITH keep, dup
+    MATCH (o:Person)-[r:FAMILY]->(dup) WHERE o <> keep
+    MERGE (o)-[n:FAMILY {relation: r.relation}]->(keep)
+    WITH r, n, properties(n) AS kept
+    SET n += properties(r)
+    SET n += kept
+    DELETE r
+}
+SET keep.aliases = [x IN %s WHERE x <> keep.name],
+    keep.wikidata_qid = coalesce(keep.wikidata_qid, dup.wikidata_qid)
+DETACH DELETE dup
+""" % DEDUP.format(list="coalesce(keep.aliases, []) + coalesce(dup.aliases, []) + [dup.name]")
+
+MERGE_COMPANIES = """
+UNWIND $rows AS row
+MATCH (keep:Company {id: row.keep})
+MATCH (dup:Company {id: row.dup})
+CALL {
+    WITH keep, dup
+    MATCH (p:Person)-[r:HAS_ROLE_AT]->(dup)
+    MERGE (p)-[n:HAS_ROLE_AT {role: r.role}]->(keep)
+    WITH r, n, properties(n) AS kept
+    SET n += properties(r)
+    SET n += kept
+    DELETE r
+}
+DETACH DELETE dup
+"""
+
+
+def apply_plan(plan: dict, batch_size: int, snapshot: Optional[RegistrySnapshot]) -> None:
+    with get_driver().session() as s:
+        for kind, cypher in (("persons", MERGE_PERSONS), ("companies", MERGE_COMPANIES)):
+            rows = [{"keep": c["keep"], "dup": d} for c in plan.get(kind, []) for d in c["merge"]]
+            for i in range(0, len(rows), batch_size):
+                batch = rows[i:i + batch_size]
+                s.execute_write(lambda tx: tx.run(cypher, rows=batch).consume())
+            print(f"[INFO] Merged {len(rows)} duplicate {kind} into {len(plan.get(kind, []))} survivors")
+    if snapshot is not None:
+        snapshot.apply_merges(plan)
+
+
+# ───────────────────────────── CLI ─────────────────────────────
+
+def main():
+    ap = argparse.ArgumentParser(description="Batch entity resolution over the loader's registry snapshot")
+    ap.add_argument("--registry-db", type=Path, default=Path(__file__).with_name("registry_snapshot.sqlite"))
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("plan", help="Cluster the registry and write a merge plan")
+    p.add_argument("--out", type=Path, default=Path("merge_plan.json"))
+    p.add_argument("--workers", type=int, default=-1, help="cdist threads (-1 = all cores)")
+    p.add_argument("--max-block", type=int, default=2000, help="Max names scored together in one cdist call")
+    p.add_argument("--min-alias-tokens", type=int, default=2, help="Ignore aliases with fewer slug tokens")
+
+    a = sub.add_parser("apply", help="Apply a merge plan to Neo4j (and the local snapshot)")
+    a.add_argument("plan", type=Path)
+    a.add_argument("--batch-size", type=int, default=200)
+    args = ap.parse_args()
+
+    with RegistrySnapshot(args.registry_db) as snap:
+        if args.cmd == "plan":
+            persons = [{"id": pid, "canonical": c, "aliases": al, "qid": q} for pid, _, c, al, q in snap.persons()]
+            companies = [{"id": cid, "canonical": n} for cid, _, n in snap.companies()]
+            plan = {}
+            for kind, entities, lev in (("persons", persons, False), ("companies", companies, True)):
+                clusters, uf = resolve(entities, lev, args.max_block, args.workers, args.min_alias_tokens)
+                plan[kind] = _plan_for(entities, clusters)
+                print(f"[INFO] {kind}: {len(entities)} entities → {len(clusters)} clusters, "
+                      f"{sum(len(c) - 1 for c in clusters)} merges ({len(uf.conflicts)} QID conflicts refused)")
+            args.out.write_text(json.dumps(plan, indent=1, ensure_ascii=False), encoding="utf-8")
+            print(f"[✓] Merge plan written to {args.out}")
+        else:
+            apply_plan(json.loads(args.plan.read_text(encoding="utf-8")), args.batch_size, snap)
+            get_driver().close()
+            print("[✓] Merge plan applied")
+
+
+if __name__ == "__main__":
+    main()
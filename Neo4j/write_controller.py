@@ -0,0 +1,151 @@
+"""write_controller.py — adaptive batch sizing and backpressure for Aura writes
+
+Aura Free throttles heavy writers and kills long transactions, so a fixed batch
+size is either too timid or periodically fails.  `WriteController` sits between
+a writer and its write callback (an `execute_write`, a sink's `write` …):
+
+* it cuts the rows into batches of its current `size` and times each commit;
+* AIMD sizing — a batch that commits within `target_latency` grows the size by
+  `step` rows, a slow batch or a transient error multiplies it by `backoff`;
+* a batch that fails with a transient error is split in half and each half
+  retried (after a short, growing pause) until single rows are left, which are
+  retried up to `max_retries` times before the error is raised;
+* `throughput` is rows/s of commit time over the last `window` batches.
+
+Non-transient errors propagate immediately.  A failed write must not have
+committed anything (one transaction per call), so retries never double-apply.
+One controller may be shared by several writer threads (`ParallelEdgeSink`):
+its bookkeeping is locked, the writes themselves run outside the lock.
+
+The write must also not retry on its own: `session.execute_write` re-runs a
+failing transaction for up to 30 s, so the controller would time the driver's
+backoff and see an error only once the driver gave up.  Controller-managed
+writes therefore go through `run_in_transaction` (one explicit transaction,
+no driver retries).
+
+Used by `BatchedGraphWriter` (load_graph_v_5.py) and by
+Ranking/Bloomberg/sync_billionaires.py.  `bench_write_controller.py` drives it
+against a fake session with injected latency and transient errors.
+"""
+
+from __future__ import annotations
+
+import logging
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+
+log = logging.getLogger(__name__)
+
+
+def run_in_transaction(session, work: Callable[[Any], T]) -> T:
+    """Run *work(tx)* in one explicit transaction of *session* and commit it; nothing is retried."""
+    with session.begin_transaction() as tx:
+        result = work(tx)
+        tx.commit()
+        return result
+
+
+def is_transient(exc: BaseException) -> bool:
+    """Neo4j driver errors know whether they are retryable; otherwise only connection/timeouts are."""
+    retryable = getattr(exc, "is_retryable", None)
+    if callable(retryable):
+        return bool(retryable())
+    return isinstance(exc, (ConnectionError, TimeoutError))
+
+
+class WriteController:
+    def __init__(self, initial: int = 500, min_size: int = 10, max_size: int = 5000, target_latency: float = 2.0,
+                 step: Optional[int] = None, backoff: float = 0.5, max_retries: int = 5, retry_delay: float = 0.5,
+                 window: int = 20, transient: Callable[[BaseException], bool] = is_transient,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        self.size = max(min_size, min(initial, max_size))
+        self.min_size = min_size
+        self.max_size = max_size
+        self.target_latency = target_latency
+        self.step = step or max(initial // 10, 1)
+        self.backoff = backoff
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.transient = transient
+        self.clock = clock
+        self.sleep = sleep
+        self._recent: Deque[Tuple[int, float]] = deque(maxlen=window)    # (rows, seconds) per committed batch
+        self._streak = 0                                                 # consecutive failures
+        self._lock = threading.Lock()
+        self.rows = 0
+        self.batches = 0
+        self.errors = 0
+        self.splits = 0
+        self.retries = 0
+        self.commit_seconds = 0.0
+
+    # ------------------------------------------------------------------
+    def run(self, items: Sequence[T], write: Callable[[Sequence[T]], Any]) -> None:
+        """Write all *items*, in order, through *write* (called once per batch)."""
+        i = 0
+        while i < len(items):
+            batch = items[i:i + self.size]
+            self._write(batch, write, 0)
+            i += len(batch)
+
+    def _write(self, batch: Sequence[T], write: Callable[[Sequence[T]], Any], attempt: int) -> None:
+        t0 = self.clock()
+        try:
+            write(batch)
+        except Exception as exc:
+            if not self.transient(exc):
+                raise
+            with self._lock:
+                self.errors += 1
+                self._streak += 1
+                streak = self._streak
+                self._shrink()
+            if len(batch) == 1 and attempt >= self.max_retries:
+                raise
+            pause = self.retry_delay * min(2 ** (streak - 1), 32) * random.uniform(0.5, 1.0)
+            log.warning("Transient write error on %d rows (%s); retrying in %.1fs", len(batch), exc, pause)
+            self.sleep(pause)
+            if len(batch) > 1:
+                with self._lock:
+                    self.splits += 1
+                mid = len(batch) // 2
+                self._write(batch[:mid], write, 0)
+                self._write(batch[mid:], write, 0)
+            else:
+                with self._lock:
+                    self.retries += 1
+                self._write(batch, write, attempt + 1)
+            return
+
+        latency = self.clock() - t0
+        with self._lock:
+            self._streak = 0
+            self._recent.append((len(batch), latency))
+            self.rows += len(batch)
+            self.batches += 1
+            self.commit_seconds += latency
+            if latency > self.target_latency:
+                self._shrink()
+            elif len(batch) >= self.size:          # only a full batch says the size itself is fine
+                self.size = min(self.max_size, self.size + self.step)
+
+    def _shrink(self) -> None:
+        self.size = max(self.min_size, int(self.size * self.backoff))
+
+    # ------------------------------------------------------------------
+    @property
+    def throughput(self) -> float:
+        """Rows per second of commit time over the recent window."""
+        rows = sum(n for n, _ in self._recent)
+        seconds = sum(s for _, s in self._recent)
+        return rows / seconds if seconds > 0 else 0.0
+
+    def report(self, label: str = "Write controller") -> str:
+        return (f"[INFO] {label}: {self.rows} rows in {self.batches} batches, batch size now {self.size}, "
+                f"{self.throughput:,.0f} rows/s recent; {self.errors} transient errors, "
+                f"{self.splits} splits, {self.retries} single-row retries")
@@ -0,0 +1,196 @@
+"""write_profile.py — PROFILE the loader's MERGE statements on sample rows
+
+`load_graph_v_5.py --profile` runs every configured ingester into a
+`SampleSink`, which keeps about `n` rows of each kind (edges only together with
+their endpoint nodes), then:
+
+1. checks that `Person.id` and `Company.id` carry a uniqueness constraint (the
+   MERGEs and the edge statements' `MATCH … {id: …}` rely on its index) and
+   creates any that are missing;
+2. runs each kind's UNWIND statement with `PROFILE` on its sample — nodes
+   before edges, all in one transaction that is rolled back, so the edge
+   `MATCH`es see the sampled nodes and the graph is left untouched;
+3. aggregates db hits, rows and planner operators per statement and writes a
+   Markdown report, flagging label / all-node scans.
+"""
+
+from __future__ import annotations
+
+import datetime
+import re
+from collections import Counter, OrderedDict, defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from graph_sink import GraphSink, Row
+
+SCAN_OPERATORS = {"NodeByLabelScan", "AllNodesScan", "UndirectedRelationshipTypeScan", "DirectedRelationshipTypeScan"}
+
+# (label, property, constraint name)
+REQUIRED_CONSTRAINTS = (("Person", "id", "person_id_unique"), ("Company", "id", "company_id_unique"))
+
+
+# edge kind → ((row field, node kind), …) of its endpoints
+EDGE_ENDPOINT_KINDS = {"role": (("pid", "person"), ("cid", "company")),
+                       "family": (("src", "person"), ("dst", "person"))}
+
+
+class SampleSink(GraphSink):
+    """Sample up to *n* rows of each kind for PROFILE.
+
+    An edge row is sampled only while both its endpoints are among the last
+    *keep* node rows of their kind (nodes are flushed just before the edges that
+    use them), and those endpoint rows join the node samples — so the edge
+    `MATCH`es find their nodes in the rolled-back transaction.  Node samples are
+    topped up to *n* with the first node rows written.
+    """
+
+    def __init__(self, n: int, keep: Optional[int] = None):
+        self.n = n
+        self.keep = keep or 50 * n
+        self.seen: Dict[str, int] = defaultdict(int)
+        self._edges: Dict[str, List[Row]] = defaultdict(list)
+        self._first: Dict[str, List[Row]] = defaultdict(list)                    # node kind → first n rows
+        self._recent: Dict[str, "OrderedDict[str, Row]"] = defaultdict(OrderedDict)  # node kind → id → row
+        self._pinned: Dict[str, Dict[str, Row]] = defaultdict(dict)              # endpoints of sampled edges
+
+    def write(self, kind: str, rows: List[Row]) -> None:
+        self.seen[kind] += len(rows)
+        endpoints = EDGE_ENDPOINT_KINDS.get(kind)
+        if endpoints is None:
+            first, recent = self._first[kind], self._recent[kind]
+            first.extend(rows[: max(self.n - len(first), 0)])
+            for row in rows:
+                recent[row["id"]] = row
+                recent.move_to_end(row["id"])
+                if len(recent) > self.keep:
+                    recent.popitem(last=False)
+            return
+        sample = self._edges[kind]
+        for row in rows:
+            if len(sample) >= self.n:
+                break
+            nodes = [(node_kind, self._recent[node_kind].get(row[field])) for field, node_kind in endpoints]
+            if all(node is not None for _, node in nodes):
+                sample.append(row)
+                for node_kind, node in nodes:
+                    self._pinned[node_kind][node["id"]] = node
+
+    @property
+    def samples(self) -> Dict[str, List[Row]]:
+        out: Dict[str, List[Row]] = dict(self._edges)
+        for kind, first in self._first.items():
+            pinned = self._pinned.get(kind, {})
+            rows = list(pinned.values())
+            rows += [r for r in first if r["id"] not in pinned][: max(self.n - len(rows), 0)]
+            out[kind] = rows
+        return out
+
+
+# ───────────────────────────── constraints ─────────────────────────────
+
+def ensure_constraints(session) -> List[Tuple[str, str, str]]:
+    """(label, property, status) per required constraint: "present", "created" or "failed: …"."""
+    present = set()
+    for rec in session.run("SHOW CONSTRAINTS YIELD type, labelsOrTypes, properties"):
+        if "UNIQUENESS" in rec["type"] or "KEY" in rec["type"]:
+            if len(rec["properties"] or []) == 1:
+                for label in rec["labelsOrTypes"] or []:
+                    present.add((label, rec["properties"][0]))
+    out = []
+    for label, prop, name in REQUIRED_CONSTRAINTS:
+        if (label, prop) in present:
+            out.append((label, prop, "present"))
+            continue
+        try:
+            session.run(f"CREATE CONSTRAINT {name} IF NOT EXISTS FOR (n:{label}) REQUIRE n.{prop} IS UNIQUE").consume()
+            out.append((label, prop, "created"))
+        except Exception as exc:        # e.g. duplicate ids already in the graph
+            out.append((label, prop, f"failed: {exc}"))
+    return out
+
+
+# ───────────────────────────── plans ─────────────────────────────
+
+def _operator(plan: Dict[str, Any]) -> str:
+    return re.sub(r"@.*$", "", plan.get("operatorType", "?"))
+
+
+def walk(plan: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    yield plan
+    for child in plan.get("children", ()):
+        yield from walk(child)
+
+
+def summarise(plan: Dict[str, Any]) -> Dict[str, Any]:
+    ops = Counter()
+    hits = Counter()
+    scans = []
+    for node in walk(plan):
+        op = _operator(node)
+        ops[op] += 1
+        hits[op] += node.get("dbHits", 0)
+        if op in SCAN_OPERATORS:
+            args = node.get("args", {})
+            scans.append(args.get("Details") or args.get("LegacyExpression") or op)
+    return {"db_hits": sum(hits.values()), "rows": plan.get("rows", 0), "operators": ops, "hits_by_operator": hits,
+            "scans": scans}
+
+
+def profile_statements(session, statements: Dict[str, str], samples: Dict[str, List[Row]],
+                       kinds: Sequence[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+    results: Dict[str, Optional[Dict[str, Any]]] = {}
+    tx = session.begin_transaction()
+    try:
+        for kind in kinds:
+            rows = samples.get(kind) or []
+            if not rows:
+                results[kind] = None
+                continue
+            summary = tx.run("PROFILE " + statements[kind], rows=rows).consume()
+            stats = summarise(summary.profile)
+            stats["sample"] = len(rows)
+            results[kind] = stats
+    finally:
+        tx.rollback()
+    return results
+
+
+# ───────────────────────────── report ─────────────────────────────
+
+def render(results: Dict[str, Optional[Dict[str, Any]]], constraints: List[Tuple[str, str, str]],
+           statements: Dict[str, str], seen: Dict[str, int]) -> str:
+    lines = [f"# Loader write-path profile ({datetime.datetime.utcnow():%Y-%m-%d %H:%M} UTC)", "",
+             "## Constraints", "", "| label | property | status |", "|---|---|---|"]
+    lines += [f"| {label} | {prop} | {status} |" for label, prop, status in constraints]
+    lines += ["", "## Statements", "",
+              "| kind | sample rows | db hits | db hits / row | label scans |", "|---|---|---|---|---|"]
+    for kind, r in results.items():
+        if r is None:
+            lines.append(f"| {kind} | 0 (none produced) | – | – | – |")
+        else:
+            lines.append(f"| {kind} | {r['sample']} of {seen.get(kind, 0)} | {r['db_hits']:,} | "
+                         f"{r['db_hits'] / r['sample']:.1f} | {'**YES**' if r['scans'] else 'no'} |")
+    for kind, r in results.items():
+        if r is None:
+            continue
+        lines += ["", f"### {kind}", "", "```cypher", statements[kind].strip(), "```", "",
+                  "| operator | count | db hits |", "|---|---|---|"]
+        by_hits = sorted(r["operators"].items(), key=lambda kv: -r["hits_by_operator"][kv[0]])
+        lines += [f"| {op} | {n} | {r['hits_by_operator'][op]:,} |" for op, n in by_hits]
+        if r["scans"]:
+            lines += ["", "**Label scans** (missing index / constraint?):", ""] + [f"- `{s}`" for s in r["scans"]]
+    return "\n".join(lines) + "\n"
+
+
+def run_profile(driver, statements: Dict[str, str], sink: SampleSink, kinds: Sequence[str], report: Path) -> str:
+    with driver.session() as session:
+        constraints = ensure_constraints(session)
+        results = profile_statements(session, statements, sink.samples, kinds)
+    report.write_text(render(results, constraints, statements, sink.seen), encoding="utf-8")
+    total = sum(r["db_hits"] for r in results.values() if r)
+    flagged = [k for k, r in results.items() if r and r["scans"]]
+    return (f"[INFO] Profiled {sum(1 for r in results.values() if r)} statements: {total:,} db hits; "
+            f"label scans in {', '.join(flagged) or 'none'}; constraints "
+            + ", ".join(f"{label}.{prop}={status.split(':')[0]}" for label, prop, status in constraints)
+            + f" — report: {report}")
@@ -31,12 +31,18 @@ Notes
 -----
 * Script uses the official Neo4j Python driver – works fine with Aura Free.
 * No APOC/GDS required.
-* Batched `UNWIND` writes keep query count low (default 100 rows per tx).
+* Batched `UNWIND` writes keep query count low.  `--batch` (default 100) is the
+  starting size; Neo4j/write_controller.py grows or shrinks it with commit
+  latency and splits batches that hit transient (throttling) errors.  Each
+  batch is one explicit transaction, so the driver does not retry on its own.
+  It is imported from the repo's Neo4j/ directory (found relative to this
+  file) only when writing; `--dry-run` does not need it.
 """
 from __future__ import annotations
 import argparse
 import csv
 import logging
+import sys
 from datetime import date, datetime
 from pathlib import Path
 from typing import Dict, List
@@ -54,6 +60,21 @@ logging.basicConfig(
 # Helpers
 # ---------------------------------------------------------------------------
 
+NEO4J_DIR = Path(__file__).resolve().parents[2] / "Neo4j"     # home of write_controller.py
+
+
+def _write_controller():
+    """The `write_controller` module, from the import path or the repo's Neo4j/ directory."""
+    try:
+        import write_controller
+    except ImportError:
+        sys.path.append(str(NEO4J_DIR))
+        try:
+            import write_controller
+        except ImportError as exc:
+            raise SystemExit(f"write_controller.py not found on the import path or in {NEO4J_DIR}") from exc
+    return write_controller
+
 def parse_net_worth(raw: str) -> int | None:
     """Convert strings like "+22.3B", "450M", "12,345,678" → integer USD."""
     if not raw:
@@ -146,7 +167,8 @@ def load_csv(path: Path) -> List[Dict]:
     logging.info("Loaded %d rows from CSV", len(rows))
     return rows
 
-def upsert_people(driver: Driver, people: List[Dict], batch_size: int = 100, dry_run: bool = False):
+def upsert_people(driver: Driver, people: List[Dict], batch_size: int = 100, dry_run: bool = False,
+                  target_latency: float = 2.0):
     if dry_run:
         logging.info("Dry run mode: No changes will be written to the database.")
         # In dry run, we need to know who already exists to simulate MERGE
@@ -161,11 +183,14 @@ def upsert_people(driver: Driver, people: List[Dict], batch_size: int = 100, dry
         return
 
     # Actual write operation
+    wc = _write_controller()
+    controller = wc.WriteController(initial=batch_size, min_size=1, max_size=max(batch_size * 10, 1000),
+                                 target_latency=target_latency)
     with driver.session() as session:
-        for i in range(0, len(people), batch_size):
-            batch = people[i:i + batch_size]
-            session.write_transaction(write_batch, batch)
+        controller.run(people, lambda batch: wc.run_in_transaction(session, lambda tx: write_batch(tx, list(batch))))
     logging.info("Upserted %d people into the database.", len(people))
+    logging.info("%d batches, final batch size %d, %.0f rows/s recent, %d transient errors (%d splits)",
+                 controller.batches, controller.size, controller.throughput, controller.errors, controller.splits)
 
 
 # ---------------------------------------------------------------------------
@@ -178,7 +203,8 @@ def parse_args():
     parser.add_argument("--neo4j-uri", required=True, help="bolt[s] or neo4j[s] URI for Aura Free")
     parser.add_argument("--neo4j-user", required=True)
     parser.add_argument("--neo4j-pass", required=True)
-    parser.add_argument("--batch", type=int, default=100, help="Batch size (default 100)")
+    parser.add_argument("--batch", type=int, default=100, help="Initial batch size (default 100); adapts to commit latency")
+    parser.add_argument("--target-latency", type=float, default=2.0, help="Commit latency per batch to aim for (seconds)")
     parser.add_argument("--dry-run", action="store_true", help="Log only, no writes")
     return parser.parse_args()
 
@@ -192,7 +218,7 @@ def main():
 
     driver = GraphDatabase.driver(args.neo4j_uri, auth=(args.neo4j_user, args.neo4j_pass))
     try:
-        upsert_people(driver, people, batch_size=args.batch, dry_run=args.dry_run)
+        upsert_people(driver, people, batch_size=args.batch, dry_run=args.dry_run, target_latency=args.target_latency)
     finally:
         driver.close()
 
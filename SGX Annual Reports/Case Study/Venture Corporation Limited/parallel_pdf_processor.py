@@ -13,6 +13,11 @@ import os
 from tqdm import tqdm
 import spacy
 
+# Personnel regexes are shared with the NER pipeline's chunk pre-screen (SGX Annual Reports/chunk_scorer.py)
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from chunk_scorer import ROLE_PATTERNS, RELATIONSHIP_PATTERNS, EXCLUDE_PATTERNS
+from board_locator import BKMK_PATTERNS, BoardLocator, outline_entries, outline_sections, section_pages
+
 # --- Logging Configuration ---
 def setup_logging():
     """Detects the environment and configures logging accordingly."""
@@ -53,35 +58,15 @@ except OSError:
     sys.exit(1)
 
 # --- Enhanced Regex Patterns ---
-BKMK_PATTERNS = re.compile(
-    r"(board\s+of\s+directors|directors'\s+profile|directors\b|management\s+team|key\s+management|executive\s+team|key\s+personnel|corporate\s+governance)",
-    re.IGNORECASE,
-)
-
-# Personnel role indicators
-ROLE_PATTERNS = re.compile(
-    r"\b(director|chairman|chairwoman|chairperson|ceo|cfo|coo|cto|president|vice\s+president|vp|executive|manager|head\s+of|chief|lead|senior|principal|partner)\b",
-    re.IGNORECASE
-)
-
-# Relationship indicators
-RELATIONSHIP_PATTERNS = re.compile(
-    r"\b(appointed|serves?\s+as|holds?\s+the\s+position|responsible\s+for|oversees|leads|manages|reports?\s+to|works?\s+with|joined|prior\s+to|previously|experience\s+at|worked\s+at|formerly)\b",
-    re.IGNORECASE
-)
-
-# Exclude patterns for irrelevant content
-EXCLUDE_PATTERNS = re.compile(
-    r"\b(financial\s+highlights|revenue|profit|loss|earnings|balance\s+sheet|cash\s+flow|dividend|share\s+price|market\s+cap|auditor|accounting|footnote|note\s+\d+|schedule|appendix|index|table\s+of\s+contents)\b",
-    re.IGNORECASE
-)
-
 YEAR_RE = re.compile(r"\b(20\d{2})\b")
 FY_YEAR_PATTERNS = [re.compile(r"financial\s+year\s+.*?(20\d{2})", re.I), re.compile(r"FY\s*(\d{2,4})", re.I)]
 
 # --- Heuristics for Confidence Scoring ---
 CONFIDENCE_RULES = {"annual report": 50, "financial statements": 20, "sgx": 15, "agm": 10, "interim report": -60, "prospectus": -50}
 
+# Bookmark / printed-TOC tiers only: this script never calls an LLM
+BOARD_LOCATOR = BoardLocator()
+
 # --- Enhanced Filtering Functions ---
 
 def extract_person_names(doc) -> Set[str]:
@@ -258,40 +243,26 @@ def extract_board_pages_and_content(reader: PdfReader, pdf_path: Path) -> tuple[
     pdf_name_for_logging = pdf_path.name
     candidate_pages = {}
 
-    # Step 1: Gather candidate pages from bookmarks and full-text search
-    all_bookmarks = []
-    def _flatten_bookmarks(items):
-        for item in items:
-            if isinstance(item, list): 
-                _flatten_bookmarks(item)
-            else:
-                try:
-                    page_num = reader.get_destination_page_number(item)
-                    title = getattr(item, "title", "")
-                    if title and page_num is not None: 
-                        all_bookmarks.append({'title': str(title), 'page': page_num})
+    # Step 1: Gather candidate pages from bookmarks, the printed TOC and full-text search
+    def _add_pages(start_page, end_page):
+        for page_idx in range(start_page, end_page):
+            if page_idx not in candidate_pages:
+                try: 
+                    candidate_pages[page_idx] = reader.pages[page_idx].extract_text() or ""
                 except Exception: 
                     pass
-    
-    try:
-        _flatten_bookmarks(reader.outline)
-        if all_bookmarks:
-            all_bookmarks.sort(key=lambda x: x['page'])
-            unique_bms = [bm for i, bm in enumerate(all_bookmarks) if i == 0 or bm['page'] != all_bookmarks[i-1]['page']]
-            for i, bm in enumerate(unique_bms):
-                if BKMK_PATTERNS.search(bm['title']):
-                    start_page = bm['page']
-                    end_page = unique_bms[i + 1]['page'] if i + 1 < len(unique_bms) else len(reader.pages)
-                    for page_idx in range(start_page, end_page):
-                        if page_idx not in candidate_pages:
-                            try: 
-                                candidate_pages[page_idx] = reader.pages[page_idx].extract_text() or ""
-                            except Exception: 
-                                pass
-    except Exception: 
-        pass
 
-    # Fallback: full-text search if no bookmarks found
+    for _, start_page, end_page in outline_sections(outline_entries(reader), len(reader.pages)):
+        _add_pages(start_page, end_page)
+
+    # No matching bookmarks: the board section's page from the printed table of contents
+    if not candidate_pages:
+        found = BOARD_LOCATOR.locate(lambda i: reader.pages[i].extract_text() or "", len(reader.pages))
+        if found:
+            logging.info(f"Board section of '{pdf_name_for_logging}' found via {found['tier']} at page {found['start'] + 1}.")
+            _add_pages(*section_pages(found, len(reader.pages)))
+
+    # Fallback: full-text search if neither bookmarks nor TOC found anything
     if not candidate_pages:
         for i, page in enumerate(reader.pages):
             try:
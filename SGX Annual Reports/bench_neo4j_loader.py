@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""bench_neo4j_loader.py — py2neo per-merge loading vs RelationLoader UNWIND batches
+
+Both paths write into the same in-memory stand-in for Neo4j, which charges a
+round trip per call plus a small per-row cost on a virtual clock (no time is
+slept, no database needed):
+
+* "py2neo merge" — the former `push_to_neo4j` loop, verbatim, against a stand-in
+  `Graph` / `Node` / `Relationship` with py2neo's `merge` signature;
+* "UNWIND"       — `RelationLoader` against a stand-in driver that applies
+  `MERGE_RELATIONS` row by row.
+
+The script checks that both produce the same persons, companies and
+HAS_ROLE_AT edges, then prints round trips and virtual load time.
+
+    python bench_neo4j_loader.py                              # 5000 relations, 30 ms round trips
+    python bench_neo4j_loader.py --relations 20000 --rtt 0.08 --batch-size 2000
+"""
+
+import argparse, random
+
+from neo4j_batch_loader import MERGE_RELATIONS, RelationLoader
+
+
+class MemoryNeo4j:
+    """Persons, companies and (person, role, company) edges, with a virtual clock."""
+
+    def __init__(self, rtt: float, per_row: float):
+        self.rtt = rtt
+        self.per_row = per_row
+        self.clock = 0.0
+        self.round_trips = 0
+        self.persons, self.companies, self.edges = set(), set(), set()
+
+    def charge(self, rows: int) -> None:
+        self.round_trips += 1
+        self.clock += self.rtt + self.per_row * rows
+
+    def snapshot(self):
+        return set(self.persons), set(self.companies), set(self.edges)
+
+
+# ─────────────────────── py2neo stand-in ───────────────────────
+
+class Node(dict):
+    def __init__(self, label, **props):
+        super().__init__(props)
+        self.label = label
+
+
+class Relationship:
+    def __init__(self, start, rel_type, end, **props):
+        self.start, self.type, self.end, self.props = start, rel_type, end, props
+
+
+class Graph:
+    def __init__(self, db: MemoryNeo4j):
+        self.db = db
+
+    def run(self, cypher):
+        self.db.charge(0)
+
+    def merge(self, obj, label=None, key=None):
+        self.db.charge(1)
+        if isinstance(obj, Relationship):
+            self.db.edges.add((obj.start["name"], obj.props["role"], obj.end["name"]))
+        elif label == "Person":
+            self.db.persons.add(obj[key])
+        else:
+            self.db.companies.add(obj[key])
+
+
+def push_to_neo4j_py2neo(relations, graph: Graph) -> None:
+    """The pre-UNWIND `push_to_neo4j` loop (minus connect / clear)."""
+    node_cache = {}  # (label, name) -> Node
+
+    for rel in relations:
+        person = rel.get("person")
+        role   = rel.get("role")
+        company= rel.get("company")
+
+        if not all((person, role, company)):
+            continue
+
+        key_person = ("Person", person)
+        key_comp   = ("Company", company)
+
+        if key_person not in node_cache:
+            node = Node("Person", name=person)
+            graph.merge(node, "Person", "name")
+            node_cache[key_person] = node
+
+        if key_comp not in node_cache:
+            node = Node("Company", name=company)
+            graph.merge(node, "Company", "name")
+            node_cache[key_comp] = node
+
+        rel_obj = Relationship(
+            node_cache[key_person],
+            "HAS_ROLE_AT",
+            node_cache[key_comp],
+            role=role
+        )
+        graph.merge(rel_obj)
+
+
+# ─────────────────────── driver stand-in ───────────────────────
+
+class FakeTx:
+    def __init__(self, db: MemoryNeo4j):
+        self.db = db
+
+    def run(self, cypher, rows=()):
+        assert cypher == MERGE_RELATIONS
+        self.db.charge(len(rows))
+        for row in rows:
+            self.db.persons.add(row["person"])
+            self.db.companies.add(row["company"])
+            self.db.edges.add((row["person"], row["role"], row["company"]))
+        return self
+
+    def consume(self):
+        return None
+
+
+class FakeSession:
+    def __init__(self, db: MemoryNeo4j):
+        self.db = db
+
+    def execute_write(self, fn):
+        return fn(FakeTx(self.db))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+class FakeDriver:
+    def __init__(self, db: MemoryNeo4j):
+        self.db = db
+
+    def session(self, database=None):
+        return FakeSession(self.db)
+
+
+def synthetic_relations(n: int, seed: int):
+    rng = random.Random(seed)
+    persons = [f"Person {i}" for i in range(max(n // 3, 1))]
+    companies = [f"Company {i} Ltd" for i in range(max(n // 20, 1))]
+    roles = ["director", "chairman", "chief executive officer", "independent director", "company secretary"]
+    for _ in range(n):
+        yield {"person": rng.choice(persons), "role": rng.choice(roles), "company": rng.choice(companies)}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Compare py2neo per-merge loading with RelationLoader batches")
+    ap.add_argument("--relations", type=int, default=5000)
+    ap.add_argument("--rtt", type=float, default=0.03, help="Seconds per round trip")
+    ap.add_argument("--per-row", type=float, default=0.0002, help="Server seconds per merged row")
+    ap.add_argument("--batch-size", type=int, default=1000)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    relations = list(synthetic_relations(args.relations, args.seed))
+
+    legacy = MemoryNeo4j(args.rtt, args.per_row)
+    push_to_neo4j_py2neo(relations, Graph(legacy))
+
+    batched = MemoryNeo4j(args.rtt, args.per_row)
+    loader = RelationLoader(FakeDriver(batched), args.batch_size)
+    loader.load(iter(relations))                        # streamed, as sgx_ner_to_neo4j feeds it
+
+    assert legacy.snapshot() == batched.snapshot(), "loaders produced different graphs"
+    p, c, e = legacy.snapshot()
+    print(f"{args.relations} relations → {len(p)} persons, {len(c)} companies, {len(e)} HAS_ROLE_AT edges")
+    for label, db in (("py2neo merge", legacy), (f"UNWIND ×{args.batch_size}", batched)):
+        print(f"{label:<14} | {db.round_trips:6} round trips | {db.clock:8.1f}s virtual | "
+              f"{args.relations / db.clock:8,.0f} relations/s")
+
+
+if __name__ == "__main__":
+    main()
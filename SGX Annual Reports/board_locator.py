@@ -0,0 +1,268 @@
+"""
+board_locator.py
+----------------
+
+Find the "Board of Directors" section of an annual report without an LLM
+whenever possible.
+
+`BoardLocator.locate` tries three tiers and records which one answered:
+
+1. **bookmark** — the PDF outline: the first entry whose title matches
+   `BOARD_PATTERNS`; the section ends where the next bookmark starts.
+2. **toc**      — the printed table of contents on the first `TOC_PAGE_LIMIT`
+   pages, parsed with regexes ("Board of Directors ..... 12" or
+   "12  Board of Directors").  Printed page numbers rarely equal PDF page
+   indices (covers and front matter are unnumbered), so the offset is
+   calibrated from the page numbers printed in page headers / footers and
+   checked against the section title near the top of the target page.
+3. **llm**      — only if both fail: the caller's `llm(toc_text)` returning
+   ``{"section_title": …, "start_page": <printed page>}`` (the notebook's
+   `TOC_SYSTEM_PROMPT` call); its page goes through the same calibration, and
+   when that cannot confirm it, is taken as-is (``start_page - 1``, as the
+   notebook did).
+
+Titles are matched with their whitespace ignored, so a title wrapped across
+lines or spaced differently in the PDF text still verifies its page.
+
+Results are dicts ``{"start": 0-based index, "end": exclusive index or None,
+"title": …, "tier": …, "offset": …}``.  `tiers` counts answers per tier, so
+`report()` shows how many LLM calls the first two tiers saved.
+
+`outline_entries` / `outline_sections` are the bookmark walk used by
+`parallel_pdf_processor.extract_board_pages_and_content`.
+"""
+
+from __future__ import annotations
+
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+TOC_PAGE_LIMIT = 10         # pages scanned for a printed table of contents
+DEFAULT_SECTION_PAGES = 6   # pages taken when the end of a located section is unknown
+SEARCH_WINDOW = 30          # max |PDF index − printed page| tried when verifying a TOC page
+HEAD_CHARS = 400            # a section title is looked for in this much text at the top of a page
+
+BKMK_PATTERNS = re.compile(
+    r"(board\s+of\s+directors|directors'\s+profile|directors\b|management\s+team|key\s+management|executive\s+team|key\s+personnel|corporate\s+governance)",
+    re.IGNORECASE,
+)
+
+# The board section proper (a subset of BKMK_PATTERNS' personnel sections)
+BOARD_PATTERNS = re.compile(
+    r"(board\s+of\s+directors|directors['’]?\s+profiles?|profiles?\s+of\s+(the\s+)?directors|"
+    r"information\s+on\s+directors|our\s+board)",
+    re.IGNORECASE,
+)
+
+# "Board of Directors ........ 12"   /   "12   Board of Directors"
+TOC_TRAILING_RE = re.compile(r"^\s*(?P<title>[A-Za-z][^\d]{2,80}?)[\s.·…_-]*\s(?P<page>\d{1,3})\s*$")
+TOC_LEADING_RE = re.compile(r"^\s*(?P<page>\d{1,3})\s+(?P<title>[A-Za-z][^\d]{2,80}?)\s*$")
+
+# A bare page number as the first / last line of a page, optionally next to a running title
+PAGE_NUMBER_RE = re.compile(r"^\s*(?:[A-Za-z][A-Za-z0-9 ,&'’-]{0,60}\s+)?(\d{1,3})\s*$|^\s*(\d{1,3})\s+[A-Za-z][A-Za-z0-9 ,&'’-]{0,60}$")
+
+Outline = Sequence[Tuple[str, int]]
+
+
+# --------------------------------------------------------------------------- #
+# ----------------------------  BOOKMARKS  ---------------------------------- #
+# --------------------------------------------------------------------------- #
+
+def outline_entries(reader) -> List[Tuple[str, int]]:
+    """(title, 0-based page) of every bookmark of a `pypdf.PdfReader`, by page, one per page."""
+    entries: List[Tuple[str, int]] = []
+
+    def _flatten(items):
+        for item in items:
+            if isinstance(item, list):
+                _flatten(item)
+            else:
+                try:
+                    page_num = reader.get_destination_page_number(item)
+                    title = getattr(item, "title", "")
+                    if title and page_num is not None:
+                        entries.append((str(title), page_num))
+                except Exception:
+                    pass
+
+    try:
+        _flatten(reader.outline)
+    except Exception:
+        return []
+    entries.sort(key=lambda e: e[1])
+    return [e for i, e in enumerate(entries) if i == 0 or e[1] != entries[i - 1][1]]
+
+
+def outline_sections(entries: Outline, n_pages: int, patterns=BKMK_PATTERNS) -> List[Tuple[str, int, int]]:
+    """(title, start, end) for every bookmark matching *patterns*; a section ends at the next bookmark."""
+    out = []
+    for i, (title, start) in enumerate(entries):
+        if patterns.search(title):
+            end = entries[i + 1][1] if i + 1 < len(entries) else n_pages
+            out.append((title, start, end))
+    return out
+
+
+def pypdf_outline(path: str) -> List[Tuple[str, int]]:
+    """Bookmarks of the PDF at *path*, or [] when pypdf is unavailable or the file has none."""
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        return []
+    try:
+        return outline_entries(PdfReader(path))
+    except Exception:
+        return []
+
+# --------------------------------------------------------------------------- #
+# ------------------------  PRINTED TOC  ------------------------------------ #
+# --------------------------------------------------------------------------- #
+
+def parse_toc(text: str) -> List[Tuple[str, int]]:
+    """(title, printed page) for every line of *text* shaped like a TOC entry."""
+    entries = []
+    for line in text.splitlines():
+        m = TOC_TRAILING_RE.match(line) or TOC_LEADING_RE.match(line)
+        if m:
+            entries.append((re.sub(r"[\s.·…_-]+$", "", m.group("title")).strip(), int(m.group("page"))))
+    return entries
+
+
+def printed_page_number(text: str) -> Optional[int]:
+    """The page number printed in the first or last line of a page, if any."""
+    lines = [ln for ln in text.splitlines() if ln.strip()]
+    for line in (lines[:1] + lines[-1:]) if lines else ():
+        m = PAGE_NUMBER_RE.match(line)
+        if m:
+            return int(m.group(1) or m.group(2))
+    return None
+
+
+def calibrate_offset(page_text: Callable[[int], str], n_pages: int, start: int, probes: int = 12) -> Optional[int]:
+    """Most common (PDF index − printed page + 1) over *probes* pages from *start*; None without a clear majority."""
+    votes = Counter()
+    for idx in range(start, min(n_pages, start + probes)):
+        printed = printed_page_number(page_text(idx))
+        if printed is not None:
+            votes[idx - printed + 1] += 1
+    if not votes:
+        return None
+    offset, n = votes.most_common(1)[0]
+    return offset if n >= 3 and n * 2 > sum(votes.values()) else None
+
+
+def resolve_printed_page(printed: int, title_re, page_text: Callable[[int], str], n_pages: int,
+                         offset: Optional[int], first: int = 0) -> Tuple[Optional[int], Optional[int]]:
+    """(PDF index, offset) of printed page *printed*: the calibrated offset if its page shows the
+    title near the top, else the nearest offset within `SEARCH_WINDOW` that does; (None, None) if none."""
+    deltas = sorted(range(-SEARCH_WINDOW, SEARCH_WINDOW + 1), key=lambda d: (abs(d), d < 0))
+    if offset is not None:
+        deltas.insert(0, offset)
+    for d in deltas:
+        idx = printed - 1 + d
+        if first <= idx < n_pages and title_re.search(page_text(idx)[:HEAD_CHARS]):
+            return idx, d
+    if offset is not None and first <= printed - 1 + offset < n_pages:
+        return printed - 1 + offset, offset                   # calibrated, but the title was not found
+    return None, None
+
+def title_pattern(title: str):
+    """*title* as a case-insensitive regex that ignores how its words are spaced or wrapped."""
+    return re.compile(r"\s+".join(map(re.escape, title.split())), re.IGNORECASE)
+
+# --------------------------------------------------------------------------- #
+# -----------------------------  LOCATOR  ----------------------------------- #
+# --------------------------------------------------------------------------- #
+
+class BoardLocator:
+    def __init__(self, llm: Optional[Callable[[str], Optional[Dict]]] = None, toc_page_limit: int = TOC_PAGE_LIMIT,
+                 patterns=BOARD_PATTERNS):
+        self.llm = llm
+        self.toc_page_limit = toc_page_limit
+        self.patterns = patterns
+        self.tiers: Counter = Counter()
+
+    def locate(self, page_text: Callable[[int], str], n_pages: int, outline: Outline = ()) -> Optional[Dict]:
+        """Board section of a document whose page *i* (0-based) has text `page_text(i)`."""
+        page_text = lru_cache(maxsize=None)(page_text)
+        found = self._from_outline(outline, n_pages) or self._from_toc(page_text, n_pages) \
+            or self._from_llm(page_text, n_pages)
+        self.tiers[found["tier"] if found else "none"] += 1
+        return found
+
+    def _from_outline(self, outline: Outline, n_pages: int) -> Optional[Dict]:
+        sections = outline_sections(outline, n_pages, self.patterns)
+        if not sections:
+            return None
+        title, start, end = sections[0]
+        return {"start": start, "end": end, "title": title, "tier": "bookmark", "offset": 0}
+
+    def _toc_text(self, page_text: Callable[[int], str], n_pages: int) -> str:
+        return "\n".join(page_text(i) for i in range(min(self.toc_page_limit, n_pages)))
+
+    def _body_start(self, page_text: Callable[[int], str], n_pages: int) -> int:
+        """First page after the printed TOC (pages with ≥ 3 TOC-shaped lines); 1 if there is none."""
+        toc_pages = [i for i in range(min(self.toc_page_limit, n_pages)) if len(parse_toc(page_text(i))) >= 3]
+        return toc_pages[-1] + 1 if toc_pages else 1
+
+    def _from_toc(self, page_text: Callable[[int], str], n_pages: int) -> Optional[Dict]:
+        entries = parse_toc(self._toc_text(page_text, n_pages))
+        for i, (title, printed) in enumerate(entries):
+            if not self.patterns.search(title):
+                continue
+            found = self._place(title, printed, page_text, n_pages, "toc")
+            if found is None:
+                continue
+            later = [p for _, p in entries[i + 1:] if p > printed]
+            if later and found["offset"] is not None:
+                found["end"] = min(n_pages, min(later) - 1 + found["offset"])
+            return found
+        return None
+
+    def _from_llm(self, page_text: Callable[[int], str], n_pages: int) -> Optional[Dict]:
+        if self.llm is None:
+            return None
+        answer = self.llm(self._toc_text(page_text, n_pages)) or {}
+        printed = answer.get("start_page")
+        if not isinstance(printed, int):
+            return None
+        title = answer.get("section_title") or ""
+        found = self._place(title, printed, page_text, n_pages, "llm")
+        if found is None and 0 < printed <= n_pages:
+            # Unverified: trust the printed page as a PDF page, like the notebook did.
+            found = {"start": printed - 1, "end": None, "title": title, "tier": "llm", "offset": None}
+        return found
+
+    def _place(self, title: str, printed: int, page_text: Callable[[int], str], n_pages: int, tier: str) -> Optional[Dict]:
+        offset = calibrate_offset(page_text, n_pages, min(self.toc_page_limit, n_pages))
+        title_re = title_pattern(title) if title else self.patterns
+        # Skip the TOC pages themselves: they mention every title near the top.
+        idx, offset = resolve_printed_page(printed, title_re, page_text, n_pages, offset,
+                                           first=self._body_start(page_text, n_pages))
+        if idx is None:
+            return None
+        return {"start": idx, "end": None, "title": title, "tier": tier, "offset": offset}
+
+    def report(self) -> str:
+        t = self.tiers
+        total = sum(t.values())
+        return (f"board section located in {total - t['none']} of {total} reports — bookmark {t['bookmark']}, "
+                f"printed TOC {t['toc']}, LLM {t['llm']}, not found {t['none']}; "
+                f"{t['bookmark'] + t['toc']} LLM calls saved")
+
+
+def section_pages(found: Dict, n_pages: int) -> Tuple[int, int]:
+    """(start, end) page range of a `locate` result, taking `DEFAULT_SECTION_PAGES` when its end is unknown."""
+    end = found["end"] if found["end"] is not None else found["start"] + DEFAULT_SECTION_PAGES
+    return found["start"], min(max(end, found["start"] + 1), n_pages)
+
+
+def locate_in_pdf(locator: BoardLocator, path: str, pdf=None) -> Optional[Dict]:
+    """`locator.locate` on a PDF file: outline via pypdf (if installed), text via an open pdfplumber *pdf*."""
+    if pdf is None:
+        import pdfplumber
+        with pdfplumber.open(path) as pdf:
+            return locate_in_pdf(locator, path, pdf)
+    return locator.locate(lambda i: pdf.pages[i].extract_text() or "", len(pdf.pages), pypdf_outline(path))
@@ -0,0 +1,178 @@
+"""
+chunk_packer.py
+---------------
+
+Pack report pages into as few LLM requests as the token budget allows.
+
+`chunk_text` (3000 characters, 250 overlap) turns a report into hundreds of
+small requests, each resending the system prompt, and pays for about 8% of
+the text twice because of the overlap.  `ChunkPacker` instead measures each
+page by (estimated) tokens and fills a request with consecutive pages until
+the next page would exceed `max_tokens`, then starts a new one:
+
+    [[PAGE 41]]
+    …page 41 text…
+    [[PAGE 42]]
+    …page 42 text…
+
+Pages keep their order, so packing stays streaming (a request is emitted as
+soon as it is full) and, for pages much smaller than the budget — the normal
+case — next-fit is within a request of optimal.  A page larger than the
+budget is split on its own, without overlap, each piece keeping its marker.
+`PACKED_PROMPT_SUFFIX` asks the model to report the page of each relation
+from the nearest preceding marker.
+
+The budget (`input_budget`) is the context window less the system prompt and
+the output reserved for the answer, capped so that the expected answer
+(`output_per_input` tokens per input token) still fits in the output budget,
+and by `max_input`.  That last cap is the one that normally applies: a few
+thousand tokens (a handful of pages) per request keeps answers short and gives
+the concurrent NER stage enough requests to overlap, where the context window
+alone would put a whole report into one or two requests.
+
+When an answer is cut off anyway, `split_request` halves the request on page
+markers (or inside a single page, repeating its marker) for `NerStage` to retry.
+
+`report()` compares the packed requests with what `chunk_text` would have
+sent for the same pages.
+"""
+
+from __future__ import annotations
+
+import math
+import re
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+from ner_stage import estimate_tokens, halve
+
+PAGE_MARKER = "[[PAGE {page}]]"
+
+PAGE_MARKER_RE = re.compile(r"^\[\[PAGE \d+\]\]$", re.MULTILINE)
+
+PACKED_PROMPT_SUFFIX = """The text contains page markers such as [[PAGE 12]].
+Add to every relation the key
+    page     : integer (number of the nearest marker above the sentence)
+"""
+
+
+def input_budget(context_tokens: int, output_tokens: int, prompt_tokens: int, output_per_input: float,
+                 max_input: Optional[int] = None) -> int:
+    """Input tokens one request may carry."""
+    room = context_tokens - output_tokens - prompt_tokens
+    if output_per_input > 0:
+        room = min(room, int(output_tokens / output_per_input))
+    if max_input:
+        room = min(room, max_input)
+    if room <= 0:
+        raise ValueError("no room for input: the prompt and output budget exceed the context window")
+    return room
+
+
+class ChunkPacker:
+    """Next-fit packing of `(page_number, text)` into requests of at most `max_tokens`.
+
+    *split(text, max_chars)* breaks an oversized page (e.g. `chunk_text` with
+    no overlap); by default pages are cut on paragraph, then line boundaries.
+    """
+
+    def __init__(self, max_tokens: int, prompt_tokens: int = 0,
+                 split: Optional[Callable[[str, int], List[str]]] = None,
+                 count: Callable[[str], int] = estimate_tokens):
+        self.max_tokens = max_tokens
+        self.prompt_tokens = prompt_tokens
+        self.split = split or _split_lines
+        self.count = count
+        self.pages = 0
+        self.chars = 0
+        self.requests = 0
+        self.input_tokens = 0
+
+    def _sections(self, page: int, text: str) -> Iterator[Tuple[str, int]]:
+        marker = PAGE_MARKER.format(page=page)
+        section = f"{marker}\n{text}"
+        tokens = self.count(section)
+        if tokens <= self.max_tokens:
+            yield section, tokens
+            return
+        room = self.max_tokens - self.count(marker) - 1
+        for piece in self.split(text, max(room * 4, 1)):                # ~4 characters per token
+            section = f"{marker}\n{piece}"
+            yield section, self.count(section)
+
+    def pack(self, pages: Iterable[Tuple[int, str]]) -> Iterator[str]:
+        parts: List[str] = []
+        used = 0
+        for page, text in pages:
+            self.pages += 1
+            self.chars += len(text)
+            if not text.strip():
+                continue
+            for section, tokens in self._sections(page, text):
+                if parts and used + tokens > self.max_tokens:
+                    yield self._emit(parts, used)
+                    parts, used = [], 0
+                parts.append(section)
+                used += tokens
+        if parts:
+            yield self._emit(parts, used)
+
+    def _emit(self, parts: List[str], tokens: int) -> str:
+        self.requests += 1
+        self.input_tokens += tokens
+        return "\n".join(parts)
+
+    def baseline(self, chunk_size: int, overlap: int) -> Tuple[int, int]:
+        """Estimated (requests, tokens incl. prompt) had the same pages gone through `chunk_text`."""
+        if not self.chars:
+            return 0, 0
+        requests = max(1, math.ceil((self.chars - overlap) / max(chunk_size - overlap, 1)))
+        text_tokens = (self.chars + (requests - 1) * overlap) // 4
+        return requests, requests * self.prompt_tokens + text_tokens
+
+    def report(self, chunk_size: int, overlap: int) -> str:
+        b_requests, b_tokens = self.baseline(chunk_size, overlap)
+        tokens = self.input_tokens + self.requests * self.prompt_tokens
+        return (f"packing {self.pages} pages: {self.requests} requests / ~{tokens:,} input tokens "
+                f"(vs ~{b_requests} requests / ~{b_tokens:,} tokens with {chunk_size}/{overlap}-char chunks; "
+                f"budget {self.max_tokens:,} tokens per request)")
+
+
+def _split_lines(text: str, max_chars: int) -> List[str]:
+    """Greedy split on blank lines, then lines, then hard cuts, into pieces of at most *max_chars*."""
+    pieces: List[str] = []
+    current = ""
+    for block in re.split(r"(\n\n|\n)", text):
+        while len(block) > max_chars:                   # a single enormous line
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(block[:max_chars])
+            block = block[max_chars:]
+        if len(current) + len(block) > max_chars:
+            pieces.append(current)
+            current = ""
+        current += block
+    if current.strip():
+        pieces.append(current)
+    return [p for p in pieces if p.strip()]
+
+
+def split_request(text: str) -> List[str]:
+    """Two halves of a packed request: between its middle pages, or — for a single page —
+    at the line nearest its middle, both halves keeping the page marker.  [] if too short to split."""
+    starts = [m.start() for m in PAGE_MARKER_RE.finditer(text)]
+    if len(starts) >= 2:
+        mid = starts[len(starts) // 2]
+        return [text[:mid].rstrip("\n"), text[mid:]]
+    m = PAGE_MARKER_RE.match(text)
+    if m is None:
+        return halve(text)
+    return [f"{m.group(0)}\n{half}" for half in halve(text[m.end():].lstrip("\n"))]
+
+
+def page_of(relation: dict) -> Optional[int]:
+    """The relation's page as reported by the model, or None."""
+    try:
+        return int(relation.get("page"))
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,102 @@
+"""
+chunk_scorer.py
+---------------
+
+Regex pre-screen for personnel content, shared by `parallel_pdf_processor.py`
+(page filtering) and `sgx_ner_to_neo4j.py` (which chunks go to the LLM).
+
+Most of an annual report — financial statements, auditor's report, notes —
+has no person–role–company relation, yet every chunk of it costs an LLM call
+that returns `{}`.  `score_chunk` counts cheap signals instead:
+
+    + role words          (ROLE_PATTERNS: director, chairman, ceo, …)
+    + relationship verbs  (RELATIONSHIP_PATTERNS: appointed, serves as, joined, …)
+    + 2 × honorifics      (HONORIFIC_PATTERNS: Mr, Ms, Dr, Mdm, …)
+    − financial terms     (EXCLUDE_PATTERNS: revenue, balance sheet, note 12, …)
+
+`ChunkScreen` drops (or, with `mode="defer"`, sends last) chunks scoring below
+`threshold`.  Keep the threshold low: a skipped chunk is a relation that is
+never extracted, whereas a kept one only costs a call.  `threshold=None`
+disables the screen.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Callable, Iterable, Iterator, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Personnel role indicators
+ROLE_PATTERNS = re.compile(
+    r"\b(director|chairman|chairwoman|chairperson|ceo|cfo|coo|cto|president|vice\s+president|vp|executive|manager|head\s+of|chief|lead|senior|principal|partner)\b",
+    re.IGNORECASE
+)
+
+# Relationship indicators
+RELATIONSHIP_PATTERNS = re.compile(
+    r"\b(appointed|serves?\s+as|holds?\s+the\s+position|responsible\s+for|oversees|leads|manages|reports?\s+to|works?\s+with|joined|prior\s+to|previously|experience\s+at|worked\s+at|formerly)\b",
+    re.IGNORECASE
+)
+
+# Exclude patterns for irrelevant content
+EXCLUDE_PATTERNS = re.compile(
+    r"\b(financial\s+highlights|revenue|profit|loss|earnings|balance\s+sheet|cash\s+flow|dividend|share\s+price|market\s+cap|auditor|accounting|footnote|note\s+\d+|schedule|appendix|index|table\s+of\s+contents)\b",
+    re.IGNORECASE
+)
+
+# Titles in front of a name ("Mr Tan", "Dr. Lim", "Mdm Wong") — the strongest cheap cue for a profile
+HONORIFIC_PATTERNS = re.compile(r"\b(mr|mrs|ms|mdm|madam|dr|prof|professor|tan\s+sri|dato'?|datuk|sir)\b\.?\s+[A-Z]")
+
+HONORIFIC_WEIGHT = 2.0
+EXCLUDE_WEIGHT = 1.0
+
+
+def score_chunk(text: str) -> float:
+    """Personnel signal of *text*: positive cues minus financial-statement cues."""
+    return (len(ROLE_PATTERNS.findall(text))
+            + len(RELATIONSHIP_PATTERNS.findall(text))
+            + HONORIFIC_WEIGHT * len(HONORIFIC_PATTERNS.findall(text))
+            - EXCLUDE_WEIGHT * len(EXCLUDE_PATTERNS.findall(text)))
+
+
+class ChunkScreen:
+    """Filter a chunk stream by `score_chunk`.
+
+    `mode="skip"` drops low-signal chunks; `mode="defer"` holds them back and
+    yields them after every high-signal chunk, so they are processed only if
+    the run gets that far.  Items need not be strings: *key* maps an item
+    (e.g. a `(page, text)` pair) to the text to score.
+    """
+
+    def __init__(self, threshold: Optional[float] = 3.0, mode: str = "skip"):
+        if mode not in ("skip", "defer"):
+            raise ValueError(f"unknown mode {mode!r}")
+        self.threshold = threshold
+        self.mode = mode
+        self.seen = 0
+        self.kept = 0
+        self.low = 0
+
+    def keep(self, text: str) -> bool:
+        return self.threshold is None or score_chunk(text) >= self.threshold
+
+    def filter(self, chunks: Iterable[T], key: Optional[Callable[[T], str]] = None) -> Iterator[T]:
+        deferred: List[T] = []
+        for chunk in chunks:
+            self.seen += 1
+            if self.keep(key(chunk) if key else chunk):
+                self.kept += 1
+                yield chunk
+            else:
+                self.low += 1
+                if self.mode == "defer":
+                    deferred.append(chunk)
+        yield from deferred
+
+    def report(self) -> str:
+        if self.threshold is None:
+            return f"pre-screen off ({self.seen} chunks)"
+        action = "skipped" if self.mode == "skip" else "deferred"
+        return (f"pre-screen kept {self.kept} of {self.seen} chunks, {action} {self.low} "
+                f"({self.low / max(self.seen, 1):.0%}) scoring below {self.threshold:g}")
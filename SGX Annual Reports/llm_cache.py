@@ -0,0 +1,128 @@
+"""
+llm_cache.py
+------------
+
+Content-addressed on-disk cache of LLM responses.
+
+A response is stored under the BLAKE2b hash of everything that determines it —
+model name, system prompt, the chunk text and the generation parameters — so
+a rerun after a fix that does not touch the prompt (or the PDF) replays every
+answer from disk and makes no model call, while any change to one of those
+inputs misses and goes to the model.
+
+Entries live in one SQLite file (`LLM_CACHE_PATH`, default `llm_cache.sqlite`
+next to this module), zlib-compressed.  The file is bounded to `max_bytes` of
+response data: when a write pushes it over, the least recently used entries
+are evicted.  `stats()` / `report()` give hits, misses, stores and evictions.
+
+    cache = ResponseCache()
+    key = cache.key(MODEL_NAME, SYSTEM_PROMPT, chunk, {"temperature": 0})
+    text = cache.get(key)
+    if text is None:
+        text = model.generate_content(chunk).text
+        cache.put(key, text)
+
+`NerStage` (ner_stage.py) does this itself when given `cache=`.  The cache is
+safe to share between threads.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+DEFAULT_PATH = Path(os.getenv("LLM_CACHE_PATH", Path(__file__).with_name("llm_cache.sqlite")))
+DEFAULT_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_MB", 256)) * 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key       BLOB PRIMARY KEY,
+    value     BLOB NOT NULL,
+    size      INTEGER NOT NULL,
+    last_used REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS responses_lru ON responses(last_used);
+"""
+
+
+class ResponseCache:
+    def __init__(self, path: Path = DEFAULT_PATH, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._bytes = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        self.hits = self.misses = self.stores = self.evictions = 0
+
+    @staticmethod
+    def key(model: str, system_prompt: str, text: str, params: Optional[Dict[str, Any]] = None) -> bytes:
+        payload = json.dumps([model, system_prompt, text, params or {}], sort_keys=True, ensure_ascii=False)
+        return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).digest()
+
+    def get(self, key: bytes) -> Optional[str]:
+        with self._lock:
+            row = self.db.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            with self.db:
+                self.db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+        return zlib.decompress(row[0]).decode("utf-8")
+
+    def put(self, key: bytes, text: str) -> None:
+        value = zlib.compress(text.encode("utf-8"))
+        with self._lock, self.db:
+            old = self.db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self.db.execute(
+                "INSERT INTO responses(key, value, size, last_used) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, size = excluded.size, last_used = excluded.last_used",
+                (key, value, len(value), time.time()),
+            )
+            self._bytes += len(value) - (old[0] if old else 0)
+            self.stores += 1
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until the store is back under 90% of `max_bytes`."""
+        target = self.max_bytes * 0.9
+        victims = []
+        for key, size in self.db.execute("SELECT key, size FROM responses ORDER BY last_used"):
+            if self._bytes <= target:
+                break
+            victims.append((key,))
+            self._bytes -= size
+        self.db.executemany("DELETE FROM responses WHERE key = ?", victims)
+        self.evictions += len(victims)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self), "bytes": self._bytes, "hits": self.hits, "misses": self.misses,
+                "stores": self.stores, "evictions": self.evictions}
+
+    def report(self) -> str:
+        s = self.stats()
+        lookups = s["hits"] + s["misses"]
+        return (f"LLM cache {self.path.name}: {s['hits']}/{lookups} hits ({s['hits'] / max(lookups, 1):.0%}), "
+                f"{s['stores']} stored, {s['evictions']} evicted; {s['entries']} entries, "
+                f"{s['bytes'] / 1048576:.1f} of {self.max_bytes / 1048576:.0f} MiB")
+
+    def clear(self) -> None:
+        with self._lock, self.db:
+            self.db.execute("DELETE FROM responses")
+            self._bytes = 0
+
+    def close(self) -> None:
+        self.db.close()
@@ -0,0 +1,352 @@
+"""
+ner_stage.py
+------------
+
+Concurrent, rate-limited LLM NER for `sgx_ner_to_neo4j.py`.
+
+`NerStage.run(chunks)` sends up to `concurrency` chunks to the model at once
+and yields one result per chunk **in input order**, whatever order the calls
+finish in.  Before each call it takes one request and the chunk's estimated
+tokens from two token buckets (requests / tokens per minute), so a run stays
+inside the model quota instead of bouncing off 429s.  Calls that fail with a
+transient error (429, 5xx, timeouts) are retried with full-jitter exponential
+backoff.
+
+With a `ResponseCache` (llm_cache.py) each chunk is looked up by
+(model, system prompt, chunk, generation params) first; a hit costs neither a
+model call nor rate-limit budget.
+
+An answer cut off at the output limit (`TruncatedResponse`) is not an error of
+the run: the chunk is split in two with `split` and each half sent on its own,
+down to chunks that cannot be split, whose complete lines are kept.  An answer
+with no text at all (`EmptyResponse`: blocked, recitation, no candidate) fails
+that chunk only — it yields no relations and is counted in `report()`.
+
+The model sits behind a tiny client interface — `generate(system, user) -> str`
+(raising the two exceptions above) plus `model_name` and `params` for the
+cache key — so `GeminiClient` can be
+swapped for `StubClient` (canned responses, simulated latency and throttling,
+no network) in benchmarks and tests:
+
+    stage = NerStage(StubClient(latency=0.5), SYSTEM_PROMPT, parse_relations, concurrency=8)
+    for relations in stage.run(chunks): ...
+"""
+
+from __future__ import annotations
+
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Status codes / exception names the Gemini SDK (google.api_core) uses for retryable failures.
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+RETRYABLE_NAMES = {"ResourceExhausted", "ServiceUnavailable", "DeadlineExceeded", "InternalServerError",
+                   "TooManyRequests", "GatewayTimeout", "TransientError"}
+
+
+MIN_SPLIT_CHARS = 400        # `halve` leaves chunks shorter than this whole
+
+
+class TruncatedResponse(Exception):
+    """The model stopped at its output-token limit; `text` is what it produced until then."""
+
+    def __init__(self, text: str, reason: str = "MAX_TOKENS"):
+        super().__init__(f"answer truncated ({reason}, {len(text)} characters)")
+        self.text = text
+
+
+class EmptyResponse(Exception):
+    """The model returned no usable text (no candidate, or one without parts)."""
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English prose)."""
+    return len(text) // 4 + 1
+
+
+def parse_relations(text: str) -> List[Dict[str, str]]:
+    """Parse the model's JSON Lines answer, skipping `{}` and salvaging wrapped lines."""
+    relations = []
+    for line in text.strip().splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            obj = json.loads(line)
+            if obj:
+                relations.append(obj)
+        except json.JSONDecodeError:
+            # try to salvage with a greedy regex
+            match = re.search(r"{.*}", line)
+            if match:
+                try:
+                    relations.append(json.loads(match.group(0)))
+                except Exception:
+                    pass
+    return relations
+
+
+def halve(text: str) -> List[str]:
+    """Two halves of *text* cut at the line break (else the space) nearest its middle; [] if too short."""
+    if len(text) < MIN_SPLIT_CHARS:
+        return []
+    mid = len(text) // 2
+    for sep in ("\n", " "):
+        before, after = text.rfind(sep, 0, mid), text.find(sep, mid)
+        cuts = [c for c in (before, after) if c > 0]
+        if cuts:
+            cut = min(cuts, key=lambda c: abs(c - mid))
+            return [text[:cut], text[cut + 1:]]
+    return [text[:mid], text[mid:]]
+
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    status = getattr(exc, "code", None) or getattr(exc, "status_code", None)
+    if isinstance(status, int) and status in RETRYABLE_STATUS:
+        return True
+    return type(exc).__name__ in RETRYABLE_NAMES
+
+# --------------------------------------------------------------------------- #
+# ---------------------------  RATE LIMITING  ------------------------------- #
+# --------------------------------------------------------------------------- #
+
+class TokenBucket:
+    """`per_minute` units refilled continuously, at most `per_minute` banked."""
+
+    def __init__(self, per_minute: float, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.clock = clock
+        self.sleep = sleep
+        self._stamp = clock()
+        self._lock = threading.Lock()
+        self.waited = 0.0
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self.level = min(self.capacity, self.level + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def acquire(self, n: float = 1.0) -> None:
+        """Block until *n* units are available, then take them (a request larger than the bucket takes it all)."""
+        n = min(n, self.capacity)
+        while True:
+            with self._lock:
+                self._refill()
+                if self.level >= n:
+                    self.level -= n
+                    return
+                wait = (n - self.level) / self.rate
+                self.waited += wait
+            self.sleep(wait)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute buckets; `None` disables a limit."""
+
+    def __init__(self, rpm: Optional[float] = None, tpm: Optional[float] = None, **bucket_kw):
+        self.requests = TokenBucket(rpm, **bucket_kw) if rpm else None
+        self.tokens = TokenBucket(tpm, **bucket_kw) if tpm else None
+
+    def acquire(self, tokens: int) -> None:
+        if self.requests is not None:
+            self.requests.acquire(1)
+        if self.tokens is not None:
+            self.tokens.acquire(tokens)
+
+    @property
+    def waited(self) -> float:
+        return sum(b.waited for b in (self.requests, self.tokens) if b is not None)
+
+# --------------------------------------------------------------------------- #
+# ------------------------------  CLIENTS  ---------------------------------- #
+# --------------------------------------------------------------------------- #
+
+class GeminiClient:
+    """`google.generativeai` model, called the way `ner_chunk` always has."""
+
+    def __init__(self, model, params: Optional[Dict] = None):
+        self.model = model
+        self.model_name = getattr(model, "model_name", str(model))
+        self.params = dict(params or {})            # generation_config
+
+    def generate(self, system: str, user: str) -> str:
+        response = self.model.generate_content(
+            contents=[{"role": "system", "parts": [system]},
+                      {"role": "user",   "parts": [user]}],
+            **({"generation_config": self.params} if self.params else {})
+        )
+        # `response.text` raises ValueError when the candidate has no parts, and
+        # hides a cut-off answer; look at the candidate itself.
+        if not response.candidates:
+            raise EmptyResponse(f"no candidate ({getattr(response, 'prompt_feedback', None)})")
+        candidate = response.candidates[0]
+        reason = getattr(candidate.finish_reason, "name", candidate.finish_reason)
+        parts = candidate.content.parts if candidate.content else []
+        text = "".join(getattr(part, "text", "") for part in parts)
+        if reason in ("MAX_TOKENS", 2):
+            raise TruncatedResponse(text)
+        if not text:
+            raise EmptyResponse(f"empty candidate (finish reason {reason})")
+        return text
+
+
+class StubThrottled(Exception):
+    code = 429
+
+
+class StubClient:
+    """Offline stand-in for a model endpoint.
+
+    Sleeps `latency` (± `jitter`) seconds per call, fails `error_rate` of calls
+    with a retryable 429, and answers with `respond(user)` — by default
+    `{}` — so benchmarks exercise the real concurrency, limiter and retry paths.
+    """
+
+    model_name = "stub"
+    params: Dict = {}
+
+    def __init__(self, latency: float = 0.2, jitter: float = 0.5, error_rate: float = 0.0,
+                 respond: Optional[Callable[[str], str]] = None, seed: Optional[int] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.respond = respond or (lambda user: "{}")
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def generate(self, system: str, user: str) -> str:
+        with self._lock:
+            self.calls += 1
+            delay = self.latency * self._rng.uniform(1 - self.jitter, 1 + self.jitter)
+            fail = self._rng.random() < self.error_rate
+        time.sleep(delay)
+        if fail:
+            raise StubThrottled("429 stub quota exceeded")
+        return self.respond(user)
+
+# --------------------------------------------------------------------------- #
+# ------------------------------  STAGE  ------------------------------------ #
+# --------------------------------------------------------------------------- #
+
+class NerStage:
+    """Run `parse(client.generate(system_prompt, chunk))` over chunks, concurrently and in order.
+
+    At most `concurrency` calls are in flight and at most `2 × concurrency`
+    chunks are pulled from the input ahead of the consumer, so `chunks` may be
+    a lazy iterator.  A chunk that still fails after `max_retries` retries (or
+    fails with a non-retryable error) raises from `run`.
+
+    *split(chunk)* cuts a chunk whose answer was truncated (default `halve`);
+    the halves' results are concatenated, so *parse* must return a list.
+    """
+
+    def __init__(self, client, system_prompt: str, parse: Callable[[str], T] = parse_relations,
+                 concurrency: int = 4, rpm: Optional[float] = None, tpm: Optional[float] = None,
+                 max_retries: int = 5, base_delay: float = 1.0, max_delay: float = 60.0,
+                 output_tokens: int = 512, retryable: Callable[[BaseException], bool] = is_retryable,
+                 cache=None, split: Callable[[str], List[str]] = halve):
+        self.client = client
+        self.system_prompt = system_prompt
+        self.parse = parse
+        self.concurrency = max(1, concurrency)
+        self.limiter = RateLimiter(rpm, tpm)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.output_tokens = output_tokens          # reserved per call against the TPM budget
+        self.retryable = retryable
+        self.cache = cache
+        self.split = split
+        self._prompt_tokens = estimate_tokens(system_prompt)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.splits = 0
+        self.truncated = 0
+        self.failed = 0
+        self.tokens = 0
+        self.seconds = 0.0
+
+    def call(self, chunk: str) -> T:
+        """One chunk — from the cache, or rate-limited and retried; safe to call from several threads."""
+        try:
+            return self.parse(self._generate(chunk))
+        except TruncatedResponse as exc:
+            pieces = self.split(chunk)
+            if len(pieces) < 2:
+                with self._lock:
+                    self.truncated += 1
+                print(f"\n⚠️  NER answer truncated on an unsplittable chunk ({len(chunk)} chars); keeping its complete lines")
+                return self.parse(exc.text)
+            with self._lock:
+                self.splits += 1
+            return [item for piece in pieces for item in self.call(piece)]
+        except EmptyResponse as exc:
+            with self._lock:
+                self.failed += 1
+            print(f"\n⚠️  NER request skipped ({len(chunk)} chars): {exc}")
+            return self.parse("")
+
+    def _generate(self, chunk: str) -> str:
+        key = None
+        if self.cache is not None:
+            key = self.cache.key(self.client.model_name, self.system_prompt, chunk, getattr(self.client, "params", None))
+            text = self.cache.get(key)
+            if text is not None:
+                return text
+        tokens = self._prompt_tokens + estimate_tokens(chunk) + self.output_tokens
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire(tokens)
+            with self._lock:
+                self.calls += 1
+                self.tokens += tokens
+            try:
+                text = self.client.generate(self.system_prompt, chunk)
+            except Exception as exc:
+                if attempt == self.max_retries or not self.retryable(exc):
+                    raise
+                with self._lock:
+                    self.retries += 1
+                # Full jitter: concurrent workers that failed together do not retry together.
+                time.sleep(random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt)))
+                continue
+            if key is not None:
+                self.cache.put(key, text)
+            return text
+        raise AssertionError("unreachable")
+
+    def run(self, chunks: Iterable[str]) -> Iterator[T]:
+        t0 = time.monotonic()
+        window = 2 * self.concurrency
+        pending: Deque[Future] = deque()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="ner") as pool:
+            try:
+                for chunk in chunks:
+                    pending.append(pool.submit(self.call, chunk))
+                    if len(pending) >= window:
+                        yield pending.popleft().result()
+                while pending:
+                    yield pending.popleft().result()
+            finally:
+                for fut in pending:
+                    fut.cancel()
+                self.seconds += time.monotonic() - t0
+
+    def report(self) -> str:
+        return (f"{self.calls} model calls ({self.retries} retries, {self.splits} truncated answers split, "
+                f"{self.truncated} kept truncated, {self.failed} empty) on {self.concurrency} workers, "
+                f"~{self.tokens:,} tokens, {self.seconds:.1f}s, {self.limiter.waited:.1f}s throttled by the rate limiter"
+                + (f"; {self.cache.report()}" if self.cache is not None else ""))
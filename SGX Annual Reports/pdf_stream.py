@@ -0,0 +1,95 @@
+"""
+pdf_stream.py
+-------------
+
+Streaming PDF → text chunks for `sgx_ner_to_neo4j.py`.
+
+    pages  = prefetch(iter_pdf_pages(path))         # parsed on a background thread
+    chunks = iter_chunks(pages, chunk_text)         # emitted as soon as they are complete
+    for relations in ner.run(chunks): ...           # NER overlaps with parsing
+
+`iter_pdf_pages` yields each page's text as `pdfplumber` extracts it.
+`iter_chunks` keeps only a small text buffer: pages are appended (joined with
+"\\n", as the old whole-document extraction did) until the buffer holds
+`flush_at` characters; the buffer is then split and every chunk but the last
+is emitted.  The last chunk stays in the buffer and the split continues from
+its start once more text arrives, so chunks still flow across page boundaries
+and keep the splitter's overlap.  Memory is bounded by `flush_at` plus the
+prefetch queue, not by the report.
+
+`prefetch` runs a generator on a daemon thread behind a bounded queue, so the
+next pages are parsed while the consumer waits on the model.
+"""
+
+from __future__ import annotations
+
+import queue
+import threading
+from typing import Callable, Iterable, Iterator, List, TypeVar
+
+import pdfplumber
+
+T = TypeVar("T")
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, exc: BaseException):
+        self.exc = exc
+
+
+def iter_pdf_pages(path: str) -> Iterator[str]:
+    """Text of each page (empty string for image-only pages), in page order."""
+    with pdfplumber.open(path) as pdf:
+        for page in pdf.pages:
+            yield page.extract_text() or ""
+            page.flush_cache()                  # drop the parsed layout objects of finished pages
+
+
+def iter_chunks(pages: Iterable[str], split: Callable[[str], List[str]], flush_at: int = 20_000) -> Iterator[str]:
+    """Chunks of the concatenated *pages*, produced incrementally by *split* (e.g. `chunk_text`)."""
+    buffer = None
+    for text in pages:
+        buffer = text if buffer is None else buffer + "\n" + text
+        if len(buffer) < flush_at:
+            continue
+        chunks = split(buffer)
+        yield from chunks[:-1]
+        buffer = chunks[-1] if chunks else ""
+    if buffer:
+        yield from split(buffer)
+
+
+def prefetch(items: Iterable[T], maxsize: int = 8) -> Iterator[T]:
+    """Iterate *items* on a background thread, at most *maxsize* ahead of the consumer.
+
+    Exceptions raised by *items* are re-raised in the consumer.
+    """
+    q: "queue.Queue" = queue.Queue(maxsize)
+    stop = threading.Event()
+
+    def produce() -> None:
+        try:
+            for item in items:
+                if stop.is_set():
+                    return
+                q.put(item)
+        except BaseException as exc:            # hand it to the consumer
+            q.put(_Failure(exc))
+            return
+        q.put(_DONE)
+
+    threading.Thread(target=produce, name="prefetch", daemon=True).start()
+    try:
+        while True:
+            item = q.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.exc
+            yield item
+    finally:
+        stop.set()
+        while not q.empty():                    # unblock a producer waiting on a full queue
+            q.get_nowait()
@@ -0,0 +1,131 @@
+"""
+relation_dedup.py
+-----------------
+
+Streaming normalisation and de-duplication of person–role–company relations.
+
+Overlapping chunks and repeated mentions make the NER stage return the same
+triple many times ("Mr Tan Ah Kow / Chairman / Venture Corporation Limited"
+on the profile page, the governance report, the AGM notice…).
+`RelationDeduper.stream(relations)` normalises each relation as it arrives
+and passes on only the first occurrence of every triple, so the loader gets a
+compact unique set and memory grows with the number of *unique* relations,
+not with the length of the report.
+
+Normalisation (`normalise`):
+
+* whitespace is trimmed and collapsed, honorifics dropped from person names
+  ("Mr", "Dr.", "Mdm" …), trailing punctuation stripped;
+* the role is lower-cased and mapped to a canonical title (`ROLE_SYNONYMS`:
+  "ceo" → "chief executive officer", "chairwoman" → "chairman", …);
+* the de-duplication key case-folds all three fields; the names passed on
+  keep the casing of their first occurrence.
+
+Every triple keeps a count of how often it was seen and the pages it was
+reported on (when the relation carries a `page`), for provenance.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Set, Tuple
+
+Triple = Tuple[str, str, str]
+
+_SPACE_RE = re.compile(r"\s+")
+_HONORIFIC_RE = re.compile(r"^(mr|mrs|ms|mdm|madam|dr|prof|professor|sir)\.?\s+", re.IGNORECASE)
+_TRAILING_RE = re.compile(r"[\s,;:.]+$")
+
+ROLE_SYNONYMS: Dict[str, str] = {
+    "ceo": "chief executive officer",
+    "group ceo": "group chief executive officer",
+    "cfo": "chief financial officer",
+    "group cfo": "group chief financial officer",
+    "coo": "chief operating officer",
+    "cto": "chief technology officer",
+    "md": "managing director",
+    "chairwoman": "chairman",
+    "chairperson": "chairman",
+    "chair": "chairman",
+    "chairman of the board": "chairman",
+    "board chairman": "chairman",
+    "ned": "non-executive director",
+    "non executive director": "non-executive director",
+    "independent non executive director": "independent non-executive director",
+    "joint company secretary": "company secretary",
+    "vp": "vice president",
+    "svp": "senior vice president",
+    "evp": "executive vice president",
+}
+
+
+def clean(text: str) -> str:
+    return _TRAILING_RE.sub("", _SPACE_RE.sub(" ", text).strip())
+
+
+def canonical_role(role: str) -> str:
+    role = clean(role).lower().replace("–", "-")
+    return ROLE_SYNONYMS.get(role, role)
+
+
+def normalise(rel: Dict) -> Optional[Dict]:
+    """Normalised copy of *rel*, or None when person, role or company is missing."""
+    person, role, company = (rel.get(k) for k in ("person", "role", "company"))
+    if not all(isinstance(v, str) and v.strip() for v in (person, role, company)):
+        return None
+    person = _HONORIFIC_RE.sub("", clean(person))
+    out = dict(rel)
+    out.update(person=person, role=canonical_role(role), company=clean(company))
+    return out
+
+
+def triple_key(rel: Dict) -> Triple:
+    return rel["person"].casefold(), rel["role"], rel["company"].casefold()
+
+
+class RelationDeduper:
+    def __init__(self):
+        self.counts: Counter = Counter()                     # triple → mentions
+        self.pages: Dict[Triple, Set[int]] = {}
+        self.seen = 0
+        self.dropped = 0                                     # incomplete relations
+
+    def add(self, rel: Dict) -> Optional[Dict]:
+        """Normalise and count *rel*; returns it only if its triple is new."""
+        self.seen += 1
+        rel = normalise(rel)
+        if rel is None:
+            self.dropped += 1
+            return None
+        key = triple_key(rel)
+        first = key not in self.counts
+        self.counts[key] += 1
+        if rel.get("page") is not None:
+            self.pages.setdefault(key, set()).add(rel["page"])
+        return rel if first else None
+
+    def stream(self, relations: Iterable[Dict]) -> Iterator[Dict]:
+        for rel in relations:
+            rel = self.add(rel)
+            if rel is not None:
+                yield rel
+
+    def provenance(self) -> Iterator[Dict]:
+        """One record per unique triple: its (case-folded) key, mention count and pages."""
+        for (person, role, company), n in self.counts.items():
+            yield {"person": person, "role": role, "company": company, "mentions": n,
+                   "pages": sorted(self.pages.get((person, role, company), ()))}
+
+    def save(self, path: Path) -> None:
+        with Path(path).open("w", encoding="utf-8") as fh:
+            for record in self.provenance():
+                fh.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def report(self) -> str:
+        top = ", ".join(f"{p} / {r} / {c} ×{n}" for (p, r, c), n in self.counts.most_common(3) if n > 1)
+        return (f"{self.seen} relations in, {len(self.counts)} unique triples out"
+                f" ({self.seen - len(self.counts) - self.dropped} duplicates, {self.dropped} incomplete)"
+                + (f"; most repeated: {top}" if top else ""))
@@ -8,7 +8,7 @@ annual‑report PDF and push them into Neo4j Aura using Google Gemini 2.5 Pro
 NER.
 
 ⚙️  Requirements
-    pip install google-generativeai pdfplumber python-dotenv langchain py2neo
+    pip install google-generativeai pdfplumber python-dotenv langchain neo4j
 
 The script expects these **environment variables** (e.g. in a `.env` file):
 
@@ -17,21 +17,50 @@ The script expects these **environment variables** (e.g. in a `.env` file):
     NEO4J_USERNAME      # neo4j
     NEO4J_PASSWORD      # 40‑char secret from Aura
     PDF_PATH            # path to local annual‑report PDF
+
+Optional tuning (see `ner_stage.py`):
+
+    NER_CONCURRENCY     # chunks sent to Gemini at once (default 4)
+    GEMINI_RPM          # requests-per-minute quota (default 60)
+    GEMINI_TPM          # tokens-per-minute quota (default 1000000)
+    NER_CLIENT          # "gemini" (default) or "stub" — offline, no API key needed
+    LLM_CACHE           # "false" disables the response cache (see `llm_cache.py`)
+    LLM_CACHE_PATH      # default llm_cache.sqlite next to this script
+    LLM_CACHE_MAX_MB    # LRU size bound (default 256)
+    NER_MIN_SCORE       # chunks scoring below this skip the LLM (default 3, "off" sends all; see `chunk_scorer.py`)
+    NER_SCREEN_MODE     # "skip" (default) or "defer" low-scoring chunks to the end of the run
+    PACK_CHUNKS         # "true" (default): pack whole pages into token-budgeted requests (`chunk_packer.py`)
+                        # instead of CHUNK_SIZE / CHUNK_OVERLAP chunks
+    PACK_MAX_TOKENS     # input tokens per packed request (default 4000, a handful of pages)
+    MODEL_CONTEXT_TOKENS, OUTPUT_BUDGET_TOKENS, OUTPUT_PER_INPUT
+                        # further packing caps (defaults 1048576, 8192 answer tokens, 0.1 output per input token)
+    THINKING_BUDGET_TOKENS
+                        # output tokens reserved for the model's thinking on top of the answer (default 16384);
+                        # max_output_tokens = OUTPUT_BUDGET_TOKENS + THINKING_BUDGET_TOKENS
+    RELATIONS_OUT       # optional JSONL of the unique triples with mention counts and pages
+    NEO4J_BATCH_SIZE    # relations per UNWIND transaction (default 1000; see `neo4j_batch_loader.py`)
+    NEO4J_CLEAR         # "true" wipes the graph before loading — only once NER has finished
+                        # (relations are held in memory instead of streamed into Neo4j)
 """
 
 from __future__ import annotations
 
-import json
 import os
-import re
-from collections import defaultdict
-from typing import Dict, List
+from itertools import chain
+from typing import Dict, Iterable, List
 
-import pdfplumber                         # PDF text extraction
 from dotenv import load_dotenv            # env helper
 from google import generativeai as genai  # Gemini 2.5 API
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from py2neo import Graph, Node, Relationship
+from neo4j import GraphDatabase
+
+from chunk_packer import PACKED_PROMPT_SUFFIX, ChunkPacker, input_budget, page_of, split_request
+from chunk_scorer import ChunkScreen
+from llm_cache import ResponseCache
+from neo4j_batch_loader import RelationLoader
+from ner_stage import GeminiClient, NerStage, StubClient, estimate_tokens, halve, parse_relations
+from pdf_stream import iter_chunks, iter_pdf_pages, prefetch
+from relation_dedup import RelationDeduper
 
 # --------------------------------------------------------------------------- #
 # ----------------------------  CONFIGURATION  ------------------------------ #
@@ -49,26 +78,44 @@ NEO4J_URI      = os.getenv("NEO4J_URI")
 NEO4J_USERNAME = os.getenv("NEO4J_USERNAME", "neo4j")
 NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
 NEO4J_CLEAR    = os.getenv("NEO4J_CLEAR", "false").lower() == "true"
+NEO4J_BATCH_SIZE = int(os.getenv("NEO4J_BATCH_SIZE", 1000))
+
+NER_CONCURRENCY = int(os.getenv("NER_CONCURRENCY", 4))
+GEMINI_RPM      = float(os.getenv("GEMINI_RPM", 60))
+GEMINI_TPM      = float(os.getenv("GEMINI_TPM", 1_000_000))
+NER_CLIENT      = os.getenv("NER_CLIENT", "gemini").lower()
+LLM_CACHE       = os.getenv("LLM_CACHE", "true").lower() == "true"
+NER_MIN_SCORE   = os.getenv("NER_MIN_SCORE", "3")
+NER_MIN_SCORE   = None if NER_MIN_SCORE.lower() in ("", "off", "none") else float(NER_MIN_SCORE)
+NER_SCREEN_MODE = os.getenv("NER_SCREEN_MODE", "skip").lower()
+
+PACK_CHUNKS          = os.getenv("PACK_CHUNKS", "true").lower() == "true"
+PACK_MAX_TOKENS      = int(os.getenv("PACK_MAX_TOKENS", 4000))
+MODEL_CONTEXT_TOKENS = int(os.getenv("MODEL_CONTEXT_TOKENS", 1_048_576))
+OUTPUT_BUDGET_TOKENS = int(os.getenv("OUTPUT_BUDGET_TOKENS", 8192))
+THINKING_BUDGET_TOKENS = int(os.getenv("THINKING_BUDGET_TOKENS", 16384))
+OUTPUT_PER_INPUT     = float(os.getenv("OUTPUT_PER_INPUT", 0.1))
+RELATIONS_OUT        = os.getenv("RELATIONS_OUT")
 
 for var in ("GOOGLE_API_KEY", "NEO4J_URI", "NEO4J_PASSWORD"):
-    if not globals()[var]:
+    if not globals()[var] and not (var == "GOOGLE_API_KEY" and NER_CLIENT == "stub"):
         raise EnvironmentError(f"Missing required env var: {var}")
 
-genai.configure(api_key=GOOGLE_API_KEY)
-gemini = genai.GenerativeModel(MODEL_NAME)
+if NER_CLIENT == "stub":
+    llm = StubClient()
+else:
+    genai.configure(api_key=GOOGLE_API_KEY)
+    # gemini-2.5 counts its thinking against max_output_tokens, so the answer budget alone would cut answers short.
+    llm = GeminiClient(genai.GenerativeModel(MODEL_NAME),
+                       {"max_output_tokens": OUTPUT_BUDGET_TOKENS + THINKING_BUDGET_TOKENS} if PACK_CHUNKS else None)
 
 # --------------------------------------------------------------------------- #
 # ---------------------------  PDF HELPERS  --------------------------------- #
 # --------------------------------------------------------------------------- #
 
 def extract_text_from_pdf(path: str) -> str:
-    """Return concatenated text from every page of a PDF."""
-    text_parts = []
-    with pdfplumber.open(path) as pdf:
-        for page in pdf.pages:
-            page_text = page.extract_text() or ""
-            text_parts.append(page_text)
-    return "\n".join(text_parts)
+    """Return concatenated text from every page of a PDF (`main` streams pages instead)."""
+    return "\n".join(iter_pdf_pages(path))
 
 
 def chunk_text(text: str,
@@ -96,97 +143,89 @@ If none found, return an empty JSON object {{}} on one line.
 Do NOT output anything else.
 """
 
+NER_PROMPT = SYSTEM_PROMPT + PACKED_PROMPT_SUFFIX if PACK_CHUNKS else SYSTEM_PROMPT
+
+ner = NerStage(llm, NER_PROMPT, parse_relations, concurrency=NER_CONCURRENCY, rpm=GEMINI_RPM, tpm=GEMINI_TPM,
+               cache=ResponseCache() if LLM_CACHE else None, split=split_request if PACK_CHUNKS else halve)
+screen = ChunkScreen(NER_MIN_SCORE, NER_SCREEN_MODE)
+packer = ChunkPacker(
+    input_budget(MODEL_CONTEXT_TOKENS - THINKING_BUDGET_TOKENS, OUTPUT_BUDGET_TOKENS, estimate_tokens(NER_PROMPT),
+                 OUTPUT_PER_INPUT, PACK_MAX_TOKENS),
+    estimate_tokens(NER_PROMPT),
+    split=lambda text, max_chars: chunk_text(text, max_chars, 0),
+)
+
+
 def ner_chunk(chunk: str) -> List[Dict[str, str]]:
-    response = gemini.generate_content(
-        contents=[{"role": "system", "parts": [SYSTEM_PROMPT]},
-                  {"role": "user",   "parts": [chunk]}]
-    )
-    # Model returns a blob of lines; filter and parse JSON
-    relations = []
-    for line in response.text.strip().splitlines():
-        line = line.strip()
-        if not line:
-            continue
-        try:
-            obj = json.loads(line)
-            if obj:
-                relations.append(obj)
-        except json.JSONDecodeError:
-            # try to salvage with a greedy regex
-            match = re.search(r"{.*}", line)
-            if match:
-                try:
-                    relations.append(json.loads(match.group(0)))
-                except Exception:
-                    pass
-    return relations
+    """NER on a single chunk (cached, rate-limited and retried); `main` uses `ner.run` for whole reports."""
+    return ner.call(chunk)
 
 # --------------------------------------------------------------------------- #
 # ------------------------  NEO4J  LOADER  ---------------------------------- #
 # --------------------------------------------------------------------------- #
 
-def push_to_neo4j(relations: List[Dict[str, str]]) -> None:
-    graph = Graph(NEO4J_URI, auth=(NEO4J_USERNAME, NEO4J_PASSWORD))
+def push_to_neo4j(relations: Iterable[Dict[str, str]]) -> int:
+    """Merge *relations* (a list or a stream) into Neo4j in UNWIND batches; returns how many were read.
 
+    Nothing is opened until the first relation arrives, so a report without
+    relations never touches (or clears) the database.  With `NEO4J_CLEAR` the
+    stream is drained first: a NER or quota failure mid-report must not leave
+    a wiped, half-loaded graph behind.
+    """
     if NEO4J_CLEAR:
-        graph.run("MATCH (n) DETACH DELETE n")
-
-    node_cache = {}  # (label, name) -> Node
-
-    for rel in relations:
-        person = rel.get("person")
-        role   = rel.get("role")
-        company= rel.get("company")
-
-        if not all((person, role, company)):
-            continue
-
-        key_person = ("Person", person)
-        key_comp   = ("Company", company)
-
-        if key_person not in node_cache:
-            node = Node("Person", name=person)
-            graph.merge(node, "Person", "name")
-            node_cache[key_person] = node
-
-        if key_comp not in node_cache:
-            node = Node("Company", name=company)
-            graph.merge(node, "Company", "name")
-            node_cache[key_comp] = node
-
-        rel_obj = Relationship(
-            node_cache[key_person],
-            "HAS_ROLE_AT",
-            node_cache[key_comp],
-            role=role
-        )
-        graph.merge(rel_obj)
+        relations = list(relations)
+    relations = iter(relations)
+    first = next(relations, None)
+    if first is None:
+        return 0
+    with GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USERNAME, NEO4J_PASSWORD)) as driver:
+        loader = RelationLoader(driver, NEO4J_BATCH_SIZE)
+        n = loader.load(chain([first], relations), clear=NEO4J_CLEAR)
+    print("\n🚚 Neo4j:", loader.report())
+    return n
 
 # --------------------------------------------------------------------------- #
 # ------------------------------  MAIN  ------------------------------------- #
 # --------------------------------------------------------------------------- #
 
+def stream_relations(pdf_path: str) -> Iterable[Dict[str, str]]:
+    """PDF pages → chunks → NER → relations, as one lazy pipeline.
+
+    Pages are parsed on a background thread and packed (or chunked)
+    incrementally, so NER on the first requests runs while later pages are
+    still being extracted.  Pages or chunks without personnel signal are
+    screened out before they reach the LLM.  Packed relations carry the
+    `page` they were found on.
+    """
+    pages = prefetch(iter_pdf_pages(pdf_path))
+    if PACK_CHUNKS:
+        requests = packer.pack(screen.filter(enumerate(pages, 1), key=lambda page: page[1]))
+    else:
+        requests = screen.filter(iter_chunks(pages, chunk_text))
+    for i, rels in enumerate(ner.run(requests), 1):     # results arrive in request order
+        print(f"🧠  Gemini NER on request {i}", end="\r")
+        for rel in rels:
+            if PACK_CHUNKS:
+                rel["page"] = page_of(rel)
+            yield rel
+
+
 def main() -> None:
-    print("📖 Extracting text from", PDF_PATH)
-    raw_text = extract_text_from_pdf(PDF_PATH)
-
-    print("✂️  Splitting into chunks ...")
-    chunks = chunk_text(raw_text)
-    print(f"   → {len(chunks)} chunks to process")
-
-    all_relations: List[Dict[str, str]] = []
-    for i, chunk in enumerate(chunks, 1):
-        print(f"🧠  Gemini NER on chunk {i}/{len(chunks)}", end="\r")
-        rels = ner_chunk(chunk)
-        all_relations.extend(rels)
-
-    print("\n🔗 Extracted", len(all_relations), "person–company relations")
-    if not all_relations:
-        return
-
-    print("🚚 Loading into Neo4j ...")
-    push_to_neo4j(all_relations)
-    print("✅ Done. View graph at", NEO4J_URI)
+    print("📖 Streaming", PDF_PATH, "through extraction → chunking → NER → Neo4j ...")
+    dedup = RelationDeduper()
+    n = push_to_neo4j(dedup.stream(stream_relations(PDF_PATH)))
+
+    print("\n🔎 NER:", screen.report())
+    if PACK_CHUNKS:
+        print("📦 NER:", packer.report(CHUNK_SIZE, CHUNK_OVERLAP))
+    print("🧠 NER:", ner.report())
+    print("🧹 Dedup:", dedup.report())
+    if RELATIONS_OUT:
+        dedup.save(RELATIONS_OUT)
+        print("🧾 Triple counts written to", RELATIONS_OUT)
+    print("🔗 Extracted", n, "unique person–company relations")
+    if n:
+        print("✅ Done. View graph at", NEO4J_URI)
 
 if __name__ == "__main__":
     main()